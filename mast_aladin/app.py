@@ -1,10 +1,27 @@
+import json
+import pathlib
+import weakref
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+from astropy.table import Table
 from ipyaladin import Aladin
 from mast_aladin.aida import AID
 from mast_aladin.table import MastTable
 from mast_aladin.mixins import DelayUntilRendered
 from mast_aladin.overlay.overlay_manager import OverlayManager
 from mast_aladin.overlay.mast_overlay import MastOverlay
-import io
+from mast_aladin.overlay.batch import coalesce_messages
+from mast_aladin.overlay.clustering import Clustering
+from mast_aladin.overlay.culling import Viewport, ViewportCulling
+from mast_aladin.overlay.lod import LevelOfDetail
+from mast_aladin.overlay.mirror import OverlayMirror
+from mast_aladin.overlay.records import MarkerColumns
+from mast_aladin.overlay.region_converter import region_geometries
+from mast_aladin.overlay.serialize import get_votable_cache
+from mast_aladin.overlay.spatial_index import SpatialIndex
+from mast_aladin.overlay.stcs import frame_names, shape_names
 from ipyaladin.elements.error_shape import (
     CircleError,
     EllipseError,
@@ -29,8 +46,44 @@ __all__ = [
 _latest_instantiated_app = None
 
 
+def _publish_added(method):
+    """
+    Tell the listeners of the overlay manager about
+    the overlay that is added by ``method``.
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        overlay_info = method(self, *args, **kwargs)
+        self._overlays_dict.publish("add", overlay_info)
+        return overlay_info
+
+    return wrapper
+
+
 class MastAladin(Aladin, DelayUntilRendered):
 
+    # the front end of ipyaladin, wrapped to handle the events that
+    # MastAladin sends in addition to those of ipyaladin:
+    _esm = (
+        f"const ipyaladinSource = {json.dumps(str(Aladin._esm))};\n"
+        + (pathlib.Path(__file__).parent / "static" / "widget.js").read_text()
+    )
+
+    # events handled by the front end in addition to those of ipyaladin.
+    # With "set_overlay_options", `MastOverlay.update` restyles overlays
+    # in place, without sending their data again. With "batch", messages queued by
+    # `batch` are sent as one message. With "add_footprints", STC-S
+    # footprints are sent as flat binary arrays, and with
+    # "add_marker_columns", so are marker positions:
+    _frontend_events = frozenset(
+        {"add_footprints", "add_marker_columns", "batch", "set_overlay_options"}
+    )
+
+    # messages queued within `batch`, and the depth of nested batches:
+    _batched_messages = None
+    _batch_depth = 0
+
     def __init__(self, *args, **kwargs):
         # set ICRSd as the default visible coordinate system
         # in aladin-lite:
@@ -47,23 +100,95 @@ class MastAladin(Aladin, DelayUntilRendered):
 
         self._overlays_dict = OverlayManager(self)
 
+        self.observe(self._on_viewport_change, names=["_fov", "_target", "_rotation"])
+
+    def _handle_custom_message(self, widget, message, buffers):
+        # the front end couldn't restyle an overlay in place, since Aladin Lite
+        # can't change some of its options, so the overlay is sent again:
+        if message.get("event_type") == "restyle_failed":
+            name = message["overlay_name"]
+            if name in self._overlays_dict:
+                overlay = self._overlays_dict[name]
+                overlay._add_again(dict(overlay.options))
+            return
+
+        super()._handle_custom_message(widget, message, buffers)
+
+    def send(self, content, buffers=None):
+        """Send a message to the front end, or queue it within `batch`."""
+        if self._batched_messages is not None:
+            self._batched_messages.append((content, buffers))
+            return
+
+        super().send(content, buffers=buffers)
+
+    @contextmanager
+    def batch(self):
+        """Queue messages to the front end, and send them together on exit.
+
+        Overlays that are added and removed within the batch are never sent,
+        see `~mast_aladin.overlay.batch.coalesce_messages`. The overlay
+        manager is updated immediately, so overlays added within the batch
+        can be inspected, updated and removed before the batch is sent.
+        Nested batches are sent when the outermost batch exits.
+        """
+        if self._batch_depth == 0:
+            self._batched_messages = []
+
+        self._batch_depth += 1
+
+        try:
+            yield self
+
+        finally:
+            self._batch_depth -= 1
+
+            if self._batch_depth == 0:
+                messages = coalesce_messages(self._batched_messages)
+                self._batched_messages = None
+                self._send_batch(messages)
+
+    def _send_batch(self, messages):
+        if "batch" not in self._frontend_events or len(messages) < 2:
+            for content, buffers in messages:
+                self.send(content, buffers=buffers)
+            return
+
+        # send all messages at once, with each message listing
+        # the indices of its own binary buffers:
+        contents = []
+        all_buffers = []
+        for content, buffers in messages:
+            buffers = buffers or []
+            contents.append({
+                **content,
+                "buffer_indices": list(range(len(all_buffers), len(all_buffers) + len(buffers))),
+            })
+            all_buffers.extend(buffers)
+
+        self.send({"event_name": "batch", "messages": contents}, buffers=all_buffers)
+
     def load_table(
         self,
         table,
         load_footprints=True,
         update_viewport=True,
-        unique_column=None
+        unique_column=None,
+        windowed=False,
+        lod=False,
+        cull=False
     ):
         table_widget = MastTable(
             table,
             app=self,
             unique_column=unique_column,
-            update_viewport=update_viewport
+            update_viewport=update_viewport,
+            windowed=windowed
         )
 
         if load_footprints:
             if 's_region' in table.colnames:
-                self.add_graphic_overlay_from_stcs(table['s_region'])
+                self.add_graphic_overlay_from_stcs(table['s_region'], lod=lod, cull=cull)
             else:
                 raise ValueError(
                     "The table does not contain an `s_region` column, so no "
@@ -73,15 +198,71 @@ class MastAladin(Aladin, DelayUntilRendered):
         return table_widget
 
     def add_markers(
-        self, markers, **catalog_options
+        self, markers, cull=False, cluster=False, **catalog_options
     ):
         """Wraps add_markers in ipyaladin to add overlay handling.
 
-        See ipyaladin for definitions of parameters.
+        If ``cull`` is `True`, only the markers within the viewport and a
+        margin around it are sent, and the visible markers are sent again
+        as the view moves, see `~mast_aladin.overlay.culling.ViewportCulling`.
+        If ``cluster`` is `True`, nearby markers are drawn as one marker with
+        their count until the view is zoomed in far enough to separate them,
+        see `~mast_aladin.overlay.clustering.Clustering`.
+
+        See ipyaladin for definitions of other parameters.
         """
         if not isinstance(markers, list):
             markers = [markers]
 
+        return self._add_marker_columns(
+            MarkerColumns.from_markers(markers), cull, cluster, catalog_options
+        )
+
+    def add_markers_from_arrays(
+        self,
+        coordinates,
+        dec=None,
+        title="",
+        description="",
+        cull=False,
+        cluster=False,
+        **catalog_options,
+    ):
+        """Add markers from arrays of positions and labels.
+
+        This is equivalent to `add_markers`, without creating a
+        `~ipyaladin.Marker` for each marker.
+
+        Parameters
+        ----------
+        coordinates : `~astropy.coordinates.SkyCoord` or array-like
+            The positions of the markers, or their right ascensions
+            if ``dec`` is given, in degrees unless they are quantities.
+        dec : array-like, optional
+            The declinations of the markers, in degrees unless they are quantities.
+        title, description : str or array-like, optional
+            The title and description of all markers, or of each marker.
+        cull : bool, optional
+            Only send the markers near the viewport, see `add_markers`.
+        cluster : bool, optional
+            Draw nearby markers as clusters when zoomed out, see `add_markers`.
+        **catalog_options
+            See ipyaladin's ``add_markers``.
+
+        Returns
+        -------
+        overlay_info
+            The `~mast_aladin.overlay.mast_overlay.MastOverlay` of the markers.
+        """
+        return self._add_marker_columns(
+            MarkerColumns.from_arrays(coordinates, dec, title, description),
+            cull,
+            cluster,
+            catalog_options,
+        )
+
+    @_publish_added
+    def _add_marker_columns(self, marker_columns, cull, cluster, catalog_options):
         catalog_options = self._overlays_dict.common_overlay_handling(
             catalog_options, "catalog_python"
         )
@@ -89,16 +270,45 @@ class MastAladin(Aladin, DelayUntilRendered):
         overlay_info = self._overlays_dict.add_overlay(
             {
                 "type": "marker",
-                "markers": [marker.__dict__ for marker in markers],
-                "update_info": markers,
+                "marker_columns": marker_columns,
                 "options": catalog_options,
             }
         )
 
-        super().add_markers(markers, **catalog_options)
+        if cull or cluster:
+            self._add_viewport_handling(overlay_info, overlay_info.spatial_index, cull, cluster)
+            self._send_viewport_overlay(overlay_info)
+            return overlay_info
+
+        self._send_markers(overlay_info.options, marker_columns)
 
         return overlay_info
 
+    def _send_markers(self, options, marker_columns):
+        """Send markers to the front end."""
+        if "add_marker_columns" in self._frontend_events:
+            # send positions and label codes as binary arrays,
+            # and each distinct label once:
+            self.send(
+                {
+                    "event_name": "add_marker_columns",
+                    "titles": marker_columns.title.values,
+                    "descriptions": marker_columns.description.values,
+                    "options": options,
+                },
+                buffers=marker_columns.to_buffers(),
+            )
+            return
+
+        self.send(
+            {
+                "event_name": "add_marker",
+                "markers": marker_columns.to_dicts(),
+                "options": options,
+            }
+        )
+
+    @_publish_added
     def add_catalog_from_URL(
         self, votable_URL, votable_options
     ):
@@ -121,20 +331,40 @@ class MastAladin(Aladin, DelayUntilRendered):
             }
         )
 
-        super().add_catalog_from_URL(votable_URL, votable_options)
+        self.send(
+            {
+                "event_name": "add_catalog_from_URL",
+                "votable_URL": votable_URL,
+                "options": votable_options,
+            }
+        )
 
         return overlay_info
 
+    @_publish_added
     def add_table(
         self,
         table,
         *,
         shape="cross",
+        cull=False,
+        cluster=False,
+        weak_table=False,
         **table_options,
     ):
         """Wraps add_table in ipyaladin to add overlay handling.
 
-        See ipyaladin for definitions of parameters.
+        If ``cull`` is `True`, only the rows within the viewport and a
+        margin around it are sent, and the visible rows are sent again
+        as the view moves, see `~mast_aladin.overlay.culling.ViewportCulling`.
+        If ``cluster`` is `True`, nearby rows are drawn as one source with
+        an ``n_sources`` count until the view is zoomed in far enough to
+        separate them, see `~mast_aladin.overlay.clustering.Clustering`.
+        If ``weak_table`` is `True`, the overlay only holds a weak reference
+        to ``table``, so that the table can be freed once it is deleted
+        elsewhere, after which the overlay can no longer be updated.
+
+        See ipyaladin for definitions of other parameters.
         """
         if isinstance(shape, CircleError):
             table_options["circle_error"] = {
@@ -162,8 +392,12 @@ class MastAladin(Aladin, DelayUntilRendered):
             table_options["shape"] = shape.default_shape
         else:
             table_options["shape"] = shape
-        table_bytes = io.BytesIO()
-        table.write(table_bytes, format="votable")
+
+        if cull or cluster:
+            # find the coordinate columns before the overlay is added:
+            spatial_index = SpatialIndex.from_table(
+                table, table_options.get("ra_field"), table_options.get("dec_field")
+            )
 
         table_options = self._overlays_dict.common_overlay_handling(
             table_options, "catalog_python"
@@ -172,24 +406,60 @@ class MastAladin(Aladin, DelayUntilRendered):
         overlay_info = self._overlays_dict.add_overlay(
             {
                 "type": "table",
-                "table": table,
+                **({"table_ref": weakref.ref(table)} if weak_table else {"table": table}),
                 "options": table_options,
             }
         )
         shape = table_options.pop("shape", None)
+        overlay_info["shape"] = shape
+
+        if cull or cluster:
+            overlay_info.spatial_index = spatial_index
+            self._add_viewport_handling(overlay_info, spatial_index, cull, cluster)
+            self._send_viewport_overlay(overlay_info)
+            return overlay_info
 
-        super().add_table(table, shape=shape, **table_options)
+        self._send_table(table, {**table_options, "shape": shape})
 
         return overlay_info
 
+    def _add_viewport_handling(self, overlay_info, spatial_index, cull, cluster):
+        # the clusters and culled region are chosen when the overlay is sent:
+        if cluster:
+            # the clusters are a few pixels across in a view of this height:
+            overlay_info["clustering"] = Clustering(spatial_index, pixels=self._height)
+
+        if cull:
+            culling = ViewportCulling()
+            culling.index = spatial_index
+            overlay_info["culling"] = culling
+
+    def _send_table(self, table, options):
+        """Send a table overlay to the front end."""
+        # tables are only serialized once, and re-added or restyled
+        # tables reuse the cached VOTable. The VOTable is sent directly,
+        # since `super().add_table` would serialize the table again:
+        self.send(
+            {"event_name": "add_table", "options": options},
+            buffers=[get_votable_cache().get(table)],
+        )
+
     def add_graphic_overlay_from_region(
         self,
         region,
+        processes=None,
         **graphic_options,
     ):
         """Wraps add_graphic_overlay_from_region in ipyaladin to add overlay handling.
 
-        See ipyaladin for definitions of parameters.
+        The regions of each type are converted together, and their converted
+        geometry is stored with the overlay, so that updating the overlay
+        only converts the region visuals again. For very large collections
+        of regions, ``processes`` splits the conversion between that many
+        worker processes, see
+        `~mast_aladin.overlay.region_converter.region_geometries`.
+
+        See ipyaladin for definitions of other parameters.
         """
         if Region is None:
             raise ModuleNotFoundError(
@@ -206,7 +476,6 @@ class MastAladin(Aladin, DelayUntilRendered):
         else:
             region_list = region
 
-        regions_infos = []
         for region_element in region_list:
             if not isinstance(region_element, Region):
                 raise ValueError(
@@ -214,11 +483,16 @@ class MastAladin(Aladin, DelayUntilRendered):
                     "See the documentation for the supported region types."
                 )
 
-            from ipyaladin.utils._region_converter import RegionInfos
+        # convert the regions before the overlay is added, since
+        # unsupported region types raise an error:
+        geometries = region_geometries(region_list, processes=processes)
 
-            # Define behavior for each region type
-            regions_infos.append(RegionInfos(region_element).to_clean_dict())
+        return self._add_region_overlay(
+            {"update_info": region_list, "region_geometries": geometries}, graphic_options
+        )
 
+    @_publish_added
+    def _add_region_overlay(self, region_data, graphic_options):
         graphic_options = self._overlays_dict.common_overlay_handling(
             graphic_options, "overlay_python"
         )
@@ -226,51 +500,221 @@ class MastAladin(Aladin, DelayUntilRendered):
         overlay_info = self._overlays_dict.add_overlay(
             {
                 "type": "overlay_region",
-                "regions_infos": regions_infos,
-                "update_info": region_list,
+                **region_data,
                 "options": graphic_options,
             }
         )
 
-        super().add_graphic_overlay_from_region(region, **graphic_options)
+        self.send(
+            {
+                "event_name": "add_overlay",
+                "regions_infos": overlay_info["regions_infos"],
+                "graphic_options": graphic_options,
+            }
+        )
 
         return overlay_info
 
     def add_graphic_overlay_from_stcs(
-        self, stc_string, **overlay_options
+        self, stc_string, lod=False, cull=False, **overlay_options
     ):
         """Wraps add_graphic_overlay_from_stcs in ipyaladin to add overlay handling.
 
-        See ipyaladin for definitions of parameters.
+        The footprints are parsed into flat arrays, see
+        `~mast_aladin.overlay.stcs.parse_stcs`, which are sent to the front
+        end as binary buffers. Strings with shapes that are not parsed, like
+        ellipses, are sent as strings for Aladin Lite to parse.
+        If ``lod`` is `True`, the footprints are drawn at a level of detail
+        for the current field of view, which is refined as the view zooms in,
+        see `~mast_aladin.overlay.lod.LevelOfDetail`. If ``cull`` is `True`,
+        only the footprints within the viewport and a margin around it are
+        sent, see `~mast_aladin.overlay.culling.ViewportCulling`.
+
+        See ipyaladin for definitions of other parameters.
         """
 
+        # the strings and options are stored once for the overlay, and
+        # per-footprint region infos are only created if they are used:
+        region_list = [stc_string] if isinstance(stc_string, str) else stc_string
+
+        return self._add_stcs_overlay({"update_info": region_list}, lod, cull, overlay_options)
+
+    @_publish_added
+    def _add_stcs_overlay(self, stcs_data, lod, cull, overlay_options):
         overlay_options = self._overlays_dict.common_overlay_handling(
             overlay_options, "overlay_python"
         )
 
-        region_list = [stc_string] if isinstance(stc_string, str) else stc_string
-        regions_infos = [
-            {
-                "region_type": "stcs",
-                "infos": {"stcs": region_element},
-                "options": overlay_options,
-            }
-            for region_element in region_list
-        ]
-
         overlay_info = self._overlays_dict.add_overlay(
             {
                 "type": "overlay_stcs",
-                "regions_infos": regions_infos,
-                "update_info": region_list,
+                **stcs_data,
                 "options": overlay_options,
             }
         )
 
-        super().add_graphic_overlay_from_stcs(stc_string, **overlay_options)
+        if lod:
+            overlay_info["lod"] = LevelOfDetail(overlay_info["footprints"], pixels=self._height)
+        if cull:
+            overlay_info["culling"] = ViewportCulling()
+        if lod or cull:
+            self._send_viewport_overlay(overlay_info)
+            return overlay_info
+
+        if "add_footprints" in self._frontend_events:
+            try:
+                footprints = overlay_info["footprints"]
+            except ValueError:
+                # strings with shapes that are not parsed here, like
+                # ellipses, are sent for Aladin Lite to parse:
+                footprints = None
+
+            if footprints is not None:
+                self._send_footprints(overlay_info, footprints)
+                return overlay_info
+
+        self.send(
+            {
+                "event_name": "add_overlay",
+                "regions_infos": overlay_info["regions_infos"],
+                "graphic_options": overlay_options,
+            }
+        )
 
         return overlay_info
 
+    def _send_footprints(self, overlay_info, footprints):
+        """Send footprints for an STC-S overlay to the front end."""
+        options = overlay_info.options
+
+        if "add_footprints" in self._frontend_events:
+            # send the footprints as flat binary arrays,
+            # see `~mast_aladin.overlay.stcs.parse_stcs`:
+            self.send(
+                {
+                    "event_name": "add_footprints",
+                    "shape_names": shape_names,
+                    "frame_names": frame_names,
+                    "options": options,
+                },
+                buffers=footprints.to_buffers(),
+            )
+            return
+
+        self.send(
+            {
+                "event_name": "add_overlay",
+                "regions_infos": [
+                    {"region_type": "stcs", "infos": {"stcs": stcs}, "options": options}
+                    for stcs in footprints.to_stcs()
+                ],
+                "graphic_options": options,
+            }
+        )
+
+    def _viewport(self):
+        """Return the current viewport of the widget."""
+        lon, lat = (float(value) for value in self._target.split())
+        width = self._fov_xy.get("x", self._fov)
+        height = self._fov_xy.get("y", self._fov)
+
+        return Viewport(lon, lat, width, height, self._rotation)
+
+    def _send_viewport_overlay(self, overlay_info):
+        """Send an overlay's visible items or footprints if they have changed.
+
+        Overlays with a level of detail or clusters are sent again when
+        their level changes, and culled overlays when the view leaves the
+        region of the sky that was last sent.
+        """
+        level_of_detail = overlay_info.get("lod", overlay_info.get("clustering"))
+        culling = overlay_info.get("culling")
+
+        sent = (
+            (level_of_detail is not None and level_of_detail.sent_key is not None)
+            or (culling is not None and culling.region is not None)
+        )
+        changed = False
+
+        # footprints at a level of detail, or clusters of markers or rows:
+        level = None
+        if level_of_detail is not None:
+            key, level = level_of_detail.for_fov(self._fov)
+            changed = key != level_of_detail.sent_key
+            level_of_detail.sent_key = key
+
+        if culling is not None:
+            changed = culling.update(self._viewport()) or changed
+
+        if not changed:
+            return
+
+        with self.batch():
+            if sent:
+                self.send(
+                    {"event_name": "remove_overlay", "overlay_names": [overlay_info.name]}
+                )
+
+            if overlay_info.type == "overlay_stcs":
+                footprints = overlay_info["footprints"] if level is None else level
+                if culling is not None:
+                    index = (
+                        overlay_info.spatial_index
+                        if footprints is overlay_info["footprints"]
+                        else culling.footprint_index(footprints)
+                    )
+                    footprints = footprints.take(culling.visible(index))
+                self._send_footprints(overlay_info, footprints)
+
+            elif level is not None:
+                visible = None if culling is None else culling.visible(level.spatial_index)
+                self._send_clusters(overlay_info, level, visible)
+
+            elif overlay_info.type == "marker":
+                marker_columns = overlay_info["marker_columns"]
+                if culling is not None:
+                    marker_columns = marker_columns.take(culling.visible())
+                self._send_markers(overlay_info.options, marker_columns)
+
+            elif overlay_info.type == "table":
+                table = overlay_info["table"]
+                if culling is not None:
+                    table = table[culling.visible()]
+                self._send_table(table, {**overlay_info.options, "shape": overlay_info["shape"]})
+
+    def _send_clusters(self, overlay_info, clusters, indices=None):
+        """Send one symbol per cluster of markers or table rows, with its count."""
+        lon, lat, count = clusters.lon, clusters.lat, clusters.count
+        if indices is not None:
+            lon, lat, count = lon[indices], lat[indices], count[indices]
+
+        if overlay_info.type == "marker":
+            self._send_markers(
+                overlay_info.options,
+                MarkerColumns.from_arrays(
+                    lon, lat, title=np.char.add(count.astype(str), " markers")
+                ),
+            )
+            return
+
+        # clusters are sent as a table, without the columns of the
+        # overlay's table, which the error shape options refer to:
+        options = {
+            key: value for key, value in overlay_info.options.items()
+            if key not in ("ra_field", "dec_field", "circle_error", "ellipse_error")
+        }
+        self._send_table(
+            Table({"ra": lon, "dec": lat, "n_sources": count}),
+            {**options, "shape": overlay_info["shape"]},
+        )
+
+    def _on_viewport_change(self, change):
+        # refine footprints with a level of detail and clusters as the view
+        # zooms, and send the visible items of culled overlays as the view moves:
+        for _, overlay_info in list(self._overlays_dict.items()):
+            if any(key in overlay_info for key in ("lod", "clustering", "culling")):
+                self._send_viewport_overlay(overlay_info)
+
     def remove_overlay(self, overlay):
         """Wraps remove_overlay in ipyaladin to add overlay handling.
 
@@ -302,16 +746,102 @@ class MastAladin(Aladin, DelayUntilRendered):
                 "overlay must be a str, MastOverlay, or iterable of these."
             )
 
-        super().remove_overlay(overlay_names)
-
         for name in overlay_names:
             if name not in self._overlays_dict:
                 raise ValueError(
-                    f"Cannot remove overlayer `{name}` since this layer does not exist."
+                    f"Cannot remove overlay `{name}` since this overlay does not exist."
                 )
 
+        # overlays are tracked in `_overlays_dict` rather than by ipyaladin,
+        # so the front end is told to remove them directly:
+        self.send({"event_name": "remove_overlay", "overlay_names": overlay_names})
+
+        for name in overlay_names:
             self._overlays_dict.pop(name)
 
+        if isinstance(self._overlays_dict, OverlayManager):
+            self._overlays_dict.publish("remove", overlay_names)
+
+    def remove_overlays(self, overlay_type=None, prefix=None):
+        """Remove all overlays of a type, or with names that start with a prefix.
+
+        Parameters
+        ----------
+        overlay_type : str or `~mast_aladin.overlay.mast_overlay.MastOverlayType`, optional
+            Remove overlays of this type, like ``"marker"`` or ``"overlay_stcs"``.
+        prefix : str, optional
+            Remove overlays with names that start with ``prefix``.
+
+        Returns
+        -------
+        overlay_names
+            The names of the removed overlays.
+        """
+        overlay_names = self._overlays_dict.names(overlay_type=overlay_type, prefix=prefix)
+
+        if overlay_names:
+            self.remove_overlay(overlay_names)
+
+        return overlay_names
+
+    def save_overlays(self, file, compress=False):
+        """Save all overlays to a snapshot file, which `load_overlays` restores.
+
+        Parameters
+        ----------
+        file : str, `~pathlib.Path` or file-like
+            The ``.npz`` file to write.
+        compress : bool, optional
+            Compress the snapshot, which makes it smaller and slower to write and read.
+        """
+        self._overlays_dict.save_snapshot(file, compress=compress)
+
+    def load_overlays(self, file, tables=None):
+        """Add the overlays in a snapshot file saved by `save_overlays`.
+
+        The overlays are restored from the stored arrays, without repeating
+        the conversions of the methods that added them, and are sent to
+        the front end together.
+
+        Parameters
+        ----------
+        file : str, `~pathlib.Path` or file-like
+            The ``.npz`` file to read.
+        tables : dict, optional
+            Tables by overlay name, which overlays added with
+            ``weak_table=True`` hold weakly again, see `add_table`.
+
+        Returns
+        -------
+        overlays
+            The restored `~mast_aladin.overlay.mast_overlay.MastOverlay` objects.
+        """
+        return self._overlays_dict.restore_snapshot(file, tables=tables)
+
+    def mirror_overlays(self, viewer, copy_existing=True):
+        """Mirror the overlays of this widget in another widget.
+
+        Overlays that are added to this widget are added to ``viewer``,
+        reusing the data that was converted for this widget, and overlays
+        that are removed or updated here are removed or updated there.
+        Widgets can mirror each other, and changes made to ``viewer``
+        directly are not mirrored back.
+
+        Parameters
+        ----------
+        viewer : `~mast_aladin.MastAladin`
+            The widget that mirrors the overlays.
+        copy_existing : bool, optional
+            Copy the overlays that this widget already has.
+
+        Returns
+        -------
+        mirror
+            The `~mast_aladin.overlay.mirror.OverlayMirror`,
+            which stops mirroring with ``mirror.stop()``.
+        """
+        return OverlayMirror(self, viewer, copy_existing=copy_existing)
+
 
 def gca():
     """
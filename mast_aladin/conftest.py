@@ -1,4 +1,5 @@
 import os
+import numpy as np
 import pytest
 from astropy.table import Table
 from mast_aladin import MastAladin
@@ -30,3 +31,57 @@ def mast_observation_table():
         os.path.dirname(__file__), "tests", "data", "mm_jwst_M4.ecsv"
     )
     return Table.read(path)
+
+
+@pytest.fixture
+def sent_messages():
+    """
+    Return a function that lists the ``(content, buffers)`` of the messages
+    sent to a mocked ``send``, with each batch split into its messages.
+    """
+    def sent_messages(mock_send):
+        messages = []
+        for call in mock_send.call_args_list:
+            content = call.args[0]
+            buffers = call.kwargs.get("buffers") or []
+            if content["event_name"] != "batch":
+                messages.append((content, buffers))
+                continue
+
+            for message in content["messages"]:
+                message = dict(message)
+                indices = message.pop("buffer_indices")
+                messages.append((message, [buffers[index] for index in indices]))
+
+        return messages
+
+    return sent_messages
+
+
+@pytest.fixture
+def sent_markers():
+    """
+    Return a function that lists the markers of an ``add_marker`` or
+    ``add_marker_columns`` message, as the front end draws them.
+    """
+    def sent_markers(content, buffers):
+        if content["event_name"] == "add_marker":
+            return content["markers"]
+
+        lon, lat = (np.frombuffer(buffer, dtype="<f8") for buffer in buffers[:2])
+        title_codes, description_codes = (
+            np.frombuffer(buffer, dtype="<i4") for buffer in buffers[2:]
+        )
+        return [
+            {
+                "title": content["titles"][title_code],
+                "description": content["descriptions"][description_code],
+                "lon": lon,
+                "lat": lat,
+            }
+            for title_code, description_code, lon, lat in zip(
+                title_codes.tolist(), description_codes.tolist(), lon.tolist(), lat.tolist()
+            )
+        ]
+
+    return sent_markers
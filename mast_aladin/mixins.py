@@ -1,9 +1,35 @@
+import warnings
 from functools import wraps
 
 
+def _argument_key(value):
+    """
+    Return ``value`` if it can be compared by hash, or its identity otherwise,
+    so that calls with the same arrays or tables are recognized as duplicates.
+    """
+    try:
+        hash(value)
+    except TypeError:
+        return ('id', id(value))
+
+    return value
+
+
+def _call_key(name, args, kwargs):
+    return (
+        name,
+        tuple(_argument_key(arg) for arg in args),
+        tuple(sorted((key, _argument_key(value)) for key, value in kwargs.items())),
+    )
+
+
 def delay_until_rendered(function, attr='_wcs'):
     """
     Delay a call on `function` until `attr` updates.
+
+    Calls made before the widget is rendered are added to the widget's queue
+    of pending operations, see `DelayUntilRendered`, and repeated calls with
+    the same arguments are only run once.
     """
 
     @wraps(function)
@@ -25,36 +51,115 @@ def delay_until_rendered(function, attr='_wcs'):
             The result of the function if the widget is ready.
 
         """
+        key = _call_key(function.__name__, args, kwargs)
 
-        # when the app is first constructed but not shown,
-        # the default attr `_wcs`` will be an empty dict,
-        # so `rendered` will be False. If `len(attr) > 0`,
-        # rendered will be True.
-        rendered = bool(min(len(getattr(self, attr)), 1))
+        return self._delay(function, args, kwargs, key, attr=attr)
 
-        def inner_func(change, rendered=rendered):
-            # if the app is not rendered:
+    return wrapper
 
-            if not rendered:
-                # we reach this block on first render. now that
-                # the widget is available, unobserve the traitlet, and
-                # call the delayed function
-                rendered = True
 
-                self.unobserve(inner_func, attr)
-                return function(self, *args, **kwargs)
+class DelayUntilRendered:
+    """
+    Queue operations on a widget until it is rendered.
+
+    When the app is first constructed but not shown, the default attr
+    ``_wcs`` will be an empty dict. Operations are queued in the order they
+    are called, with one observer of ``_wcs`` for the whole queue, and the
+    queue is run once, in order, when the widget is first rendered.
+
+    Each operation has a key, and an operation replaces any earlier
+    operation with the same key: repeated calls with the same arguments
+    are only run once, in the position of the latest call, and delayed
+    viewport changes replace earlier changes to the same property.
+
+    The messages of the queued operations are sent together in one
+    batch, if the widget supports batching. Delayed viewport changes are
+    not messages but synced traits, which can't be part of the batch, so
+    they are applied first, before the other operations run and before
+    their batch is sent. Otherwise, operations run in the order they are
+    called.
+    """
 
-        if not rendered:
-            # on construction and before render, observe the traitlet
-            self.observe(inner_func, attr)
-        else:
-            # if already rendered, run the function:
-            function(self, *args, **kwargs)
+    _pending_operations = None
 
-    return wrapper
+    def _delay(self, function, args, kwargs, key, attr='_wcs'):
+        """
+        Run ``function`` now if the widget is rendered, or add it to the queue.
+        """
+        # if `len(attr) > 0`, the widget is rendered:
+        if getattr(self, attr):
+            return function(self, *args, **kwargs)
 
+        if self._pending_operations is None:
+            self._pending_operations = dict()
 
-class DelayUntilRendered:
+        if attr not in self._pending_operations:
+            # on construction and before render, observe the traitlet
+            # once for all of the operations that are delayed on it:
+            self._pending_operations[attr] = dict()
+            self.observe(self._run_pending_operations, attr)
+
+        operations = self._pending_operations[attr]
+
+        # remove duplicate or superseded operations, so that the
+        # latest one runs, in the order that it was called:
+        operations.pop(key, None)
+        operations[key] = (function, args, kwargs)
+
+    def _run_pending_operations(self, change):
+        # wait until the traitlet is set to a non-empty value:
+        if not change['new']:
+            return
+
+        # we reach this block on first render. now that the widget is
+        # available, unobserve the traitlet, and run the operations:
+        attr = change['name']
+        self.unobserve(self._run_pending_operations, attr)
+        operations = self._pending_operations.pop(attr)
+
+        # viewport changes update synced traits, which are sent right
+        # away rather than with the batch, so they always go first:
+        operations = dict(sorted(
+            operations.items(), key=lambda item: item[0][0] != 'delayed_set_viewport'
+        ))
+
+        # send the messages of all the operations together,
+        # if the widget supports batching:
+        batch = getattr(self, 'batch', None)
+        if batch is None:
+            self._run_operations(operations)
+            return
+
+        with batch():
+            self._run_operations(operations)
+
+    def _run_operations(self, operations):
+        """
+        Run ``operations`` in order. An operation that raises doesn't stop
+        the operations after it, and the first error is raised once all of
+        the operations have run.
+        """
+        error = None
+        for function, args, kwargs in operations.values():
+            try:
+                function(self, *args, **kwargs)
+            except Exception as e:
+                if error is None:
+                    error = e
+
+        if error is not None:
+            raise error
+
+    @property
+    def pending_operations(self):
+        """
+        The names of the operations that are waiting for the widget to render.
+        """
+        return [
+            key[0]
+            for operations in (self._pending_operations or {}).values()
+            for key in operations
+        ]
 
     @delay_until_rendered
     def delayed_add_fits(self, *args, **kwargs):
@@ -81,5 +186,39 @@ class DelayUntilRendered:
         self.add_catalog_from_URL(*args, **kwargs)
 
     @delay_until_rendered
-    def delayed_delayed_add_moc(self, *args, **kwargs):
+    def delayed_add_moc(self, *args, **kwargs):
         self.add_moc(*args, **kwargs)
+
+    def delayed_delayed_add_moc(self, *args, **kwargs):
+        """
+        Deprecated alias of `delayed_add_moc`.
+        """
+        warnings.warn(
+            "`delayed_delayed_add_moc` is deprecated, use `delayed_add_moc` instead.",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        self.delayed_add_moc(*args, **kwargs)
+
+    def delayed_set_viewport(self, target=None, fov=None, rotation=None):
+        """
+        Set the target, field of view or rotation of the view once the
+        widget is rendered. Each property keeps its latest delayed value,
+        and is set before the other delayed operations run.
+
+        Parameters
+        ----------
+        target : str, `~astropy.coordinates.SkyCoord` or tuple, optional
+            The center of the view, see ``Aladin.target``.
+        fov : float, `~astropy.coordinates.Angle` or `~astropy.units.Quantity`, optional
+            The field of view, see ``Aladin.fov``.
+        rotation : float, `~astropy.coordinates.Angle` or `~astropy.units.Quantity`, optional
+            The rotation of the view, see ``Aladin.rotation``.
+        """
+        for name, value in [('target', target), ('fov', fov), ('rotation', rotation)]:
+            if value is not None:
+                self._delay(_set_viewport, (name, value), {}, ('delayed_set_viewport', name))
+
+
+def _set_viewport(widget, name, value):
+    setattr(widget, name, value)
@@ -0,0 +1,82 @@
+__all__ = [
+    'coalesce_messages',
+]
+
+# events that add a named overlay layer in the front end:
+add_overlay_events = {
+    "add_marker",
+    "add_marker_columns",
+    "add_catalog_from_URL",
+    "add_table",
+    "add_overlay",
+    "add_footprints",
+}
+
+
+def _overlay_name(content):
+    """
+    Return the name of the overlay added by a message.
+    """
+    options = content.get("graphic_options", content.get("options")) or {}
+
+    return options.get("name")
+
+
+def coalesce_messages(messages):
+    """
+    Drop queued messages that cancel each other out.
+
+    Overlays that are added and then removed within the same batch are never
+    sent, and neither are style updates for overlays that are later removed.
+    All other messages keep their order.
+
+    Parameters
+    ----------
+    messages : list of tuple
+        The ``(content, buffers)`` of each queued message, in the order sent.
+
+    Returns
+    -------
+    messages : list of tuple
+        The ``(content, buffers)`` of the messages to send.
+    """
+    result = []
+
+    # indices in `result` of queued messages that only affect one overlay,
+    # and the names of overlays added within the batch:
+    queued_for_overlay = dict()
+    added = set()
+
+    for content, buffers in messages:
+        event_name = content.get("event_name")
+
+        if event_name in add_overlay_events:
+            name = _overlay_name(content)
+            queued_for_overlay.setdefault(name, []).append(len(result))
+            added.add(name)
+
+        elif event_name == "set_overlay_options":
+            name = content["overlay_name"]
+            queued_for_overlay.setdefault(name, []).append(len(result))
+
+        elif event_name == "remove_overlay":
+            overlay_names = []
+
+            for name in content["overlay_names"]:
+                for index in queued_for_overlay.pop(name, []):
+                    result[index] = None
+
+                if name in added:
+                    # the overlay never reached the front end:
+                    added.remove(name)
+                else:
+                    overlay_names.append(name)
+
+            if not overlay_names:
+                continue
+
+            content = {**content, "overlay_names": overlay_names}
+
+        result.append((content, buffers))
+
+    return [message for message in result if message is not None]
@@ -0,0 +1,190 @@
+"""
+Clustering of markers and table rows for zoomed out views.
+
+Sources are binned into HEALPix cells that are a few screen pixels across at
+the current field of view, and each occupied cell is drawn as one symbol at
+the mean position of its sources, with their count. The cells of each source
+come from the sorted cells of a `~mast_aladin.overlay.spatial_index.SpatialIndex`,
+so the clusters at each HEALPix order are found in one pass over the sources.
+Clusters are cached by the fingerprint of the source positions and the order,
+so overlays of the same sources, like a table that is added again or restored
+from a snapshot, reuse the clusters instead of computing them again.
+"""
+from collections import OrderedDict
+
+import numpy as np
+from astropy.table import Table
+
+from mast_aladin.overlay.serialize import table_fingerprint
+from mast_aladin.overlay.spatial_index import SpatialIndex, index_order
+
+__all__ = [
+    'Clustering',
+    'Clusters',
+]
+
+# the approximate width in degrees of cells at order 0:
+_order_zero_size = np.degrees(np.sqrt(4 * np.pi / 12))
+
+# clusters of all `Clustering` instances, keyed on the fingerprint of the
+# source positions and the order, with the least recently used first:
+_cluster_cache = OrderedDict()
+
+# the largest total number of cached clusters:
+max_cached_clusters = 10 ** 7
+
+
+class Clusters:
+    """
+    The mean position in degrees and the number of sources in each cluster.
+    """
+
+    __slots__ = ('lon', 'lat', 'count', '_spatial_index')
+
+    def __init__(self, lon, lat, count):
+        self.lon = lon
+        self.lat = lat
+        self.count = count
+        self._spatial_index = None
+
+    def __len__(self):
+        return len(self.count)
+
+    @property
+    def spatial_index(self):
+        """
+        `~mast_aladin.overlay.spatial_index.SpatialIndex` of the clusters,
+        which is created on first use.
+        """
+        if self._spatial_index is None:
+            self._spatial_index = SpatialIndex(self.lon, self.lat)
+
+        return self._spatial_index
+
+
+class Clustering:
+    """
+    Sources clustered at the resolution of each field of view.
+    """
+
+    def __init__(self, spatial_index, pixels=500, cluster_pixels=20, min_fraction=0.5):
+        """
+        Parameters
+        ----------
+        spatial_index : `~mast_aladin.overlay.spatial_index.SpatialIndex`
+            The index of the sources.
+
+        pixels : int (optional, default is 500)
+            The approximate number of screen pixels across the field of view.
+
+        cluster_pixels : float (optional, default is 20)
+            The approximate size of each cluster in screen pixels.
+
+        min_fraction : float (optional, default is 0.5)
+            Sources are sent individually once the number of
+            clusters is at least this fraction of the sources.
+        """
+        self.spatial_index = spatial_index
+        self.pixels = pixels
+        self.cluster_pixels = cluster_pixels
+        self.min_fraction = min_fraction
+
+        # the key of the clusters that were last sent to the front end:
+        self.sent_key = None
+
+        self._xyz = None
+        self._fingerprint = None
+
+    @property
+    def fingerprint(self):
+        """
+        Hash of the source positions, which is computed on first use,
+        see `~mast_aladin.overlay.serialize.table_fingerprint`.
+        """
+        if self._fingerprint is None:
+            index = self.spatial_index
+            self._fingerprint = table_fingerprint(Table({'lon': index.lon, 'lat': index.lat}))
+
+        return self._fingerprint
+
+    def order(self, fov):
+        """
+        Return the HEALPix order of the clusters for a field of view in degrees.
+        """
+        cell_size = self.cluster_pixels * fov / self.pixels
+        order = int(np.floor(np.log2(_order_zero_size / cell_size)))
+
+        return min(max(order, 0), index_order)
+
+    def clusters(self, order):
+        """
+        Return the `Clusters` of the sources in each cell at a HEALPix ``order``.
+        """
+        key = (self.fingerprint, order)
+
+        if key in _cluster_cache:
+            _cluster_cache.move_to_end(key)
+
+        else:
+            index = self.spatial_index
+
+            if self._xyz is None:
+                # unit vectors of the sources, sorted by their cells:
+                lon = np.radians(index.lon[index._items])
+                lat = np.radians(index.lat[index._items])
+                self._xyz = np.column_stack([
+                    np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)
+                ])
+
+            cells = index._cells >> (2 * (index_order - order))
+            starts = np.flatnonzero(np.diff(cells, prepend=-1)) if len(cells) else cells
+
+            x, y, z = np.add.reduceat(self._xyz, starts).T if len(cells) else np.zeros((3, 0))
+            _cache_clusters(key, Clusters(
+                np.degrees(np.arctan2(y, x)) % 360,
+                np.degrees(np.arctan2(z, np.hypot(x, y))),
+                np.diff(np.append(starts, len(cells))),
+            ))
+
+        return _cluster_cache[key]
+
+    def for_fov(self, fov):
+        """
+        Return the clusters to draw at a field of view.
+
+        Parameters
+        ----------
+        fov : float
+            The field of view in degrees.
+
+        Returns
+        -------
+        key : tuple
+            ``('clusters', order)`` for clusters at a HEALPix order, or
+            ``('full',)`` once the sources are sent individually. The
+            sources only need to be sent again when this key changes.
+
+        clusters : `Clusters` or `None`
+            The clusters, or `None` if the sources are sent individually.
+        """
+        order = self.order(fov)
+        clusters = self.clusters(order)
+
+        if len(clusters) >= self.min_fraction * len(self.spatial_index._items):
+            return ('full',), None
+
+        return ('clusters', order), clusters
+
+
+def _cache_clusters(key, clusters):
+    """
+    Add ``clusters`` to the cache, dropping the least recently used clusters
+    once the cache holds more than ``max_cached_clusters`` clusters.
+    """
+    _cluster_cache[key] = clusters
+
+    # always keep the latest clusters, even if they exceed the limit:
+    n_clusters = sum(len(cached) for cached in _cluster_cache.values())
+    while n_clusters > max_cached_clusters and len(_cluster_cache) > 1:
+        _, dropped = _cluster_cache.popitem(last=False)
+        n_clusters -= len(dropped)
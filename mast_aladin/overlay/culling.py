@@ -0,0 +1,240 @@
+"""
+Viewport culling for overlays.
+
+Items near the viewport are found with a spatial index, and are projected
+onto the plane tangent to the sky at the center of the viewport (the gnomonic
+projection), rotated with the view, so that the viewport is a rectangle.
+Culled overlays are sent for a region that is larger than the viewport by a
+margin, and are only sent again once the viewport is no longer inside that
+region.
+"""
+import numpy as np
+
+__all__ = [
+    'Viewport',
+    'ViewportCulling',
+    'project',
+]
+
+# regions wider than this (in degrees) are not culled,
+# since the tangent plane projection diverges at 90 degrees:
+max_culled_width = 120
+
+
+def project(lon, lat, lon0, lat0, rotation=0):
+    """
+    Project sky coordinates onto the plane tangent to the sky at
+    ``(lon0, lat0)``, rotated by ``rotation``, all in degrees.
+
+    Returns
+    -------
+    x, y : `~numpy.ndarray`
+        Coordinates on the tangent plane, where the angle ``theta``
+        from the center is ``tan(theta)``. Points more than 90 degrees
+        from the center are infinitely far away.
+    """
+    lon, lat, lon0, lat0, rotation = (
+        np.radians(value) for value in (lon, lat, lon0, lat0, rotation)
+    )
+    delta_lon = lon - lon0
+
+    cos_lat = np.cos(lat)
+    cos_c = np.sin(lat0) * np.sin(lat) + np.cos(lat0) * cos_lat * np.cos(delta_lon)
+    behind = cos_c <= 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = cos_lat * np.sin(delta_lon) / cos_c
+        y = (np.cos(lat0) * np.sin(lat) - np.sin(lat0) * cos_lat * np.cos(delta_lon)) / cos_c
+
+    x = np.where(behind, np.inf, x)
+    y = np.where(behind, np.inf, y)
+
+    cos_rotation, sin_rotation = np.cos(rotation), np.sin(rotation)
+
+    return (
+        x * cos_rotation + y * sin_rotation,
+        y * cos_rotation - x * sin_rotation,
+    )
+
+
+def deproject(x, y, lon0, lat0, rotation=0):
+    """
+    Return the sky coordinates in degrees of points on the tangent
+    plane, the inverse of `project`.
+    """
+    lon0, lat0, rotation = np.radians(lon0), np.radians(lat0), np.radians(rotation)
+    cos_rotation, sin_rotation = np.cos(rotation), np.sin(rotation)
+    x, y = x * cos_rotation - y * sin_rotation, y * cos_rotation + x * sin_rotation
+
+    rho = np.hypot(x, y)
+    c = np.arctan(rho)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lat = np.arcsin(
+            np.cos(c) * np.sin(lat0) + np.where(rho > 0, y * np.sin(c) / rho, 0) * np.cos(lat0)
+        )
+    lon = lon0 + np.arctan2(
+        x * np.sin(c), rho * np.cos(lat0) * np.cos(c) - y * np.sin(lat0) * np.sin(c)
+    )
+
+    return np.degrees(lon) % 360, np.degrees(lat)
+
+
+class Viewport:
+    """
+    A rectangular region of the sky, with a center, a size and a rotation in degrees.
+    """
+
+    def __init__(self, lon, lat, width, height, rotation=0):
+        self.lon = lon
+        self.lat = lat
+        self.width = width
+        self.height = height
+        self.rotation = rotation
+
+    def __repr__(self):
+        return (
+            f'<Viewport lon={self.lon} lat={self.lat} width={self.width} '
+            f'height={self.height} rotation={self.rotation}>'
+        )
+
+    def expand(self, margin):
+        """
+        Return a viewport larger than this one by a ``margin``
+        fraction of its size on each side.
+        """
+        return Viewport(
+            self.lon, self.lat,
+            self.width * (1 + 2 * margin), self.height * (1 + 2 * margin),
+            self.rotation,
+        )
+
+    @property
+    def all_sky(self):
+        return max(self.width, self.height) >= max_culled_width
+
+    def half_sizes(self):
+        """
+        Return the half width and height of the viewport on its tangent plane.
+        """
+        return (
+            np.tan(np.radians(self.width / 2)),
+            np.tan(np.radians(self.height / 2)),
+        )
+
+    def corners(self):
+        """
+        Return the sky coordinates of the corners of the viewport.
+        """
+        half_width, half_height = self.half_sizes()
+
+        return deproject(
+            np.array([-1, 1, 1, -1]) * half_width,
+            np.array([-1, -1, 1, 1]) * half_height,
+            self.lon, self.lat, self.rotation,
+        )
+
+    def contains(self, lon, lat, radius=0):
+        """
+        Return a boolean mask of the points within the viewport,
+        or within ``radius`` degrees of the viewport.
+        """
+        if self.all_sky:
+            return np.ones(np.shape(lon), dtype=bool)
+
+        x, y = project(lon, lat, self.lon, self.lat, self.rotation)
+        half_width, half_height = self.half_sizes()
+        radius = np.tan(np.radians(radius))
+
+        return (np.abs(x) <= half_width + radius) & (np.abs(y) <= half_height + radius)
+
+    def covers(self, viewport):
+        """
+        Check whether ``viewport`` is entirely within this viewport.
+        """
+        if self.all_sky:
+            return True
+
+        if viewport.all_sky:
+            return False
+
+        return bool(np.all(self.contains(*viewport.corners())))
+
+
+class ViewportCulling:
+    """
+    Track the region of the sky that was last sent for a culled overlay.
+    """
+
+    # a new region is sent when the region is this many times larger than
+    # the viewport, so that zooming in doesn't keep sending a large region:
+    max_zoom = 4
+
+    def __init__(self, margin=0.5):
+        """
+        Parameters
+        ----------
+        margin : float (optional, default is 0.5)
+            The fraction of the viewport size added on each
+            side of the viewport, when a new region is sent.
+        """
+        self.margin = margin
+        self.region = None
+
+        # incremented each time the region changes:
+        self.region_id = 0
+
+        # the spatial index of the items, which is set by the overlay
+        # or created for each set of footprints:
+        self.index = None
+        self._footprint_indices = dict()
+
+    def update(self, viewport):
+        """
+        Update the region to send for the current ``viewport``.
+
+        Returns
+        -------
+        changed : bool
+            `True` if the viewport left the last region, or zoomed in
+            so far that most of the region is no longer visible, so
+            that a new region needs to be sent.
+        """
+        if (
+            self.region is not None
+            and self.region.covers(viewport)
+            and max(self.region.width, self.region.height)
+            <= self.max_zoom * max(viewport.width, viewport.height)
+        ):
+            return False
+
+        self.region = viewport.expand(self.margin)
+        self.region_id += 1
+
+        return True
+
+    def visible(self, index=None):
+        """
+        Return the indices of the items within the current region.
+
+        Parameters
+        ----------
+        index : `~mast_aladin.overlay.spatial_index.SpatialIndex` (optional)
+            The index of the items. If `None`, use the ``index`` of the overlay.
+        """
+        return (self.index if index is None else index).viewport(self.region)
+
+    def footprint_index(self, footprints):
+        """
+        Return the spatial index of ``footprints``, which
+        is created once for each set of footprints.
+        """
+        from mast_aladin.overlay.spatial_index import SpatialIndex
+
+        key = id(footprints)
+        cached = self._footprint_indices.get(key)
+
+        if cached is None or cached[0] is not footprints:
+            cached = (footprints, SpatialIndex.from_footprints(footprints))
+            self._footprint_indices[key] = cached
+
+        return cached[1]
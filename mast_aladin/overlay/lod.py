@@ -0,0 +1,304 @@
+"""
+Level of detail for footprint overlays.
+
+Footprints are simplified to a tolerance that matches the size of one screen
+pixel at the current field of view, by snapping their vertices to a grid of
+that size and dropping repeated vertices. When the footprints are only a few
+pixels across, they are merged into boxes that cover the cells of a coarser
+grid. Levels are powers of two in degrees, so that each level is computed once
+and zooming only sends new footprints when the level changes.
+"""
+import numpy as np
+
+from mast_aladin.overlay.stcs import Footprints, shape_names
+
+__all__ = [
+    'LevelOfDetail',
+    'coverage',
+    'shape_centers',
+    'simplify',
+]
+
+POLYGON = shape_names.index('polygon')
+CIRCLE = shape_names.index('circle')
+BOX = shape_names.index('box')
+
+
+def _lon_scale(lat):
+    """
+    Return the degrees of longitude per degree on the sky at latitude ``lat``.
+    """
+    return 1 / np.maximum(np.cos(np.radians(lat)), 1e-2)
+
+
+def shape_centers(footprints):
+    """
+    Return the center longitude, latitude and size of each shape.
+
+    Parameters
+    ----------
+    footprints : `~mast_aladin.overlay.stcs.Footprints`
+        The shapes.
+
+    Returns
+    -------
+    lon, lat, size : `~numpy.ndarray`
+        The center of each shape, and the larger of its width
+        and height on the sky, all in degrees.
+    """
+    starts = footprints.offsets[:-1]
+    values = footprints.values
+    types = footprints.shape_types
+
+    lon = values[starts].copy() if len(starts) else np.zeros(0)
+    lat = values[starts + 1].copy() if len(starts) else np.zeros(0)
+    size = np.zeros(len(footprints))
+
+    circles = types == CIRCLE
+    size[circles] = 2 * values[starts[circles] + 2]
+
+    boxes = types == BOX
+    size[boxes] = np.maximum(
+        values[starts[boxes] + 2] / _lon_scale(lat[boxes]), values[starts[boxes] + 3]
+    )
+
+    polygons = np.flatnonzero(types == POLYGON)
+    if len(polygons):
+        vertices, vertex_offsets = footprints.polygon_vertices()
+        first = vertex_offsets[:-1]
+
+        # longitudes are unwrapped around the first vertex of each polygon,
+        # so that polygons which cross longitude 0 have the right extent:
+        first_lon = np.repeat(vertices[first, 0], np.diff(vertex_offsets))
+        offset = vertices[:, 0] - first_lon
+        vertices[:, 0] -= 360 * np.round(offset / 360)
+
+        lon_min, lat_min = np.minimum.reduceat(vertices, first).T
+        lon_max, lat_max = np.maximum.reduceat(vertices, first).T
+
+        lon[polygons] = ((lon_min + lon_max) / 2) % 360
+        lat[polygons] = (lat_min + lat_max) / 2
+        size[polygons] = np.maximum(
+            (lon_max - lon_min) / _lon_scale(lat[polygons]), lat_max - lat_min
+        )
+
+    return lon, lat, size
+
+
+def simplify(footprints, tolerance):
+    """
+    Simplify polygons by snapping their vertices to a grid.
+
+    Consecutive vertices that snap to the same grid point are merged,
+    and polygons with fewer than three distinct vertices are replaced
+    by circles. Circles and boxes are unchanged.
+
+    Parameters
+    ----------
+    footprints : `~mast_aladin.overlay.stcs.Footprints`
+        The shapes to simplify.
+
+    tolerance : float
+        The grid spacing on the sky, in degrees.
+
+    Returns
+    -------
+    footprints : `~mast_aladin.overlay.stcs.Footprints`
+        The simplified shapes, with polygons first.
+    """
+    types = footprints.shape_types
+    polygons = np.flatnonzero(types == POLYGON)
+    others = footprints.take(np.flatnonzero(types != POLYGON))
+
+    if not len(polygons):
+        return others
+
+    vertices, vertex_offsets = footprints.polygon_vertices()
+    counts = np.diff(vertex_offsets)
+    first = vertex_offsets[:-1]
+    polygon_id = np.repeat(np.arange(len(polygons)), counts)
+
+    # snap longitudes with the spacing of the grid at each polygon's latitude:
+    spacing = np.column_stack([
+        tolerance * _lon_scale(vertices[first, 1])[polygon_id],
+        np.full(len(vertices), tolerance),
+    ])
+    snapped = np.round(vertices / spacing) * spacing
+
+    same_as_first = np.all(snapped == snapped[first][polygon_id], axis=1)
+    same_as_first[first] = False
+
+    keep = ~same_as_first
+    keep[1:] &= (
+        np.any(snapped[1:] != snapped[:-1], axis=1) | (polygon_id[1:] != polygon_id[:-1])
+    )
+
+    n_kept = np.bincount(polygon_id[keep], minlength=len(polygons))
+    kept = n_kept >= 3
+    keep &= kept[polygon_id]
+
+    simplified = Footprints(
+        types[polygons[kept]],
+        footprints.shape_rows[polygons[kept]],
+        snapped[keep].ravel(),
+        np.concatenate([[0], np.cumsum(2 * n_kept[kept])]),
+        footprints.n_rows,
+        footprints.shape_frames[polygons[kept]],
+    )
+
+    # polygons that collapsed to a point or a line become small circles:
+    collapsed = polygons[~kept]
+    lon, lat, size = shape_centers(footprints.take(collapsed))
+    circles = Footprints(
+        np.full(len(collapsed), CIRCLE, dtype=np.uint8),
+        footprints.shape_rows[collapsed],
+        np.column_stack([lon, lat, np.maximum(size, tolerance) / 2]).ravel(),
+        np.arange(len(collapsed) + 1) * 3,
+        footprints.n_rows,
+        footprints.shape_frames[collapsed],
+    )
+
+    return Footprints.concatenate([simplified, circles, others])
+
+
+def coverage(footprints, cell_size):
+    """
+    Merge shapes into boxes covering the grid cells that contain their centers.
+
+    Adjacent cells at the same latitude are merged into one box. Shapes in
+    different frames are merged separately, and each box has the frame of
+    its shapes.
+
+    Parameters
+    ----------
+    footprints : `~mast_aladin.overlay.stcs.Footprints`
+        The shapes to merge.
+
+    cell_size : float
+        The size of each grid cell on the sky, in degrees.
+
+    Returns
+    -------
+    coverage : `~mast_aladin.overlay.stcs.Footprints`
+        Boxes, which are not associated with any STC-S string,
+        so their row is -1.
+    """
+    frames = np.unique(footprints.shape_frames)
+    if len(frames) > 1:
+        return Footprints.concatenate([
+            coverage(footprints.take(np.flatnonzero(footprints.shape_frames == frame)), cell_size)
+            for frame in frames
+        ])
+
+    lon, lat, _ = shape_centers(footprints)
+
+    cell_lat = np.floor(lat / cell_size).astype(np.int64)
+    lon_spacing = cell_size * _lon_scale((cell_lat + 0.5) * cell_size)
+    cell_lon = np.floor(lon / lon_spacing).astype(np.int64)
+
+    # unique cells, sorted by latitude and then longitude:
+    cells = np.unique(np.column_stack([cell_lat, cell_lon]), axis=0)
+    cell_lat, cell_lon = cells.T if len(cells) else (cell_lat, cell_lon)
+
+    new_run = np.ones(len(cells), dtype=bool)
+    new_run[1:] = (cell_lat[1:] != cell_lat[:-1]) | (cell_lon[1:] != cell_lon[:-1] + 1)
+    run_lengths = np.diff(np.append(np.flatnonzero(new_run), len(cells)))
+
+    run_lat = cell_lat[new_run]
+    lon_spacing = cell_size * _lon_scale((run_lat + 0.5) * cell_size)
+
+    boxes = np.column_stack([
+        ((cell_lon[new_run] + run_lengths / 2) * lon_spacing) % 360,
+        (run_lat + 0.5) * cell_size,
+        run_lengths * lon_spacing,
+        np.full(len(run_lat), cell_size),
+    ])
+
+    return Footprints(
+        np.full(len(boxes), BOX, dtype=np.uint8),
+        np.full(len(boxes), -1, dtype=np.int64),
+        boxes.ravel(),
+        np.arange(len(boxes) + 1) * 4,
+        footprints.n_rows,
+        np.full(len(boxes), frames[0] if len(frames) else 0, dtype=np.uint8),
+    )
+
+
+class LevelOfDetail:
+    """
+    Footprints at the level of detail for each field of view.
+    """
+
+    def __init__(self, footprints, pixels=500, coverage_pixels=2):
+        """
+        Parameters
+        ----------
+        footprints : `~mast_aladin.overlay.stcs.Footprints`
+            The footprints at full detail.
+
+        pixels : int (optional, default is 500)
+            The approximate number of screen pixels across the field of view.
+
+        coverage_pixels : float (optional, default is 2)
+            Footprints are merged into coverage boxes when the median
+            footprint is smaller than this number of pixels.
+        """
+        self.footprints = footprints
+        self.pixels = pixels
+        self.coverage_pixels = coverage_pixels
+
+        # the key of the footprints that were last sent to the front end:
+        self.sent_key = None
+
+        self._median_size = None
+        self._levels = dict()
+
+    def level(self, fov):
+        """
+        Return the level for a field of view in degrees, where the
+        tolerance of each level is ``2 ** level`` degrees.
+        """
+        return int(np.floor(np.log2(fov / self.pixels)))
+
+    def for_fov(self, fov):
+        """
+        Return the footprints to draw at a field of view.
+
+        Parameters
+        ----------
+        fov : float
+            The field of view in degrees.
+
+        Returns
+        -------
+        key : tuple
+            ``('full',)`` for the full detail footprints, otherwise
+            ``('simplified', level)`` or ``('coverage', level)``. The
+            footprints only need to be sent again when this key changes.
+
+        footprints : `~mast_aladin.overlay.stcs.Footprints`
+            The footprints at this level of detail.
+        """
+        level = self.level(fov)
+
+        if level not in self._levels:
+            tolerance = 2.0 ** level
+
+            if self._median_size is None:
+                sizes = shape_centers(self.footprints)[2]
+                self._median_size = np.median(sizes) if len(sizes) else np.inf
+
+            if self._median_size < self.coverage_pixels * tolerance:
+                result = ('coverage', level), coverage(
+                    self.footprints, self.coverage_pixels * tolerance
+                )
+            else:
+                simplified = simplify(self.footprints, tolerance)
+                if len(simplified.values) == len(self.footprints.values):
+                    result = ('full',), self.footprints
+                else:
+                    result = ('simplified', level), simplified
+
+            self._levels[level] = result
+
+        return self._levels[level]
@@ -1,5 +1,13 @@
 from enum import Enum
 
+from mast_aladin.overlay.region_converter import (
+    geometry_regions,
+    region_geometries,
+    regions_infos,
+)
+from mast_aladin.overlay.spatial_index import SpatialIndex
+from mast_aladin.overlay.stcs import parse_stcs
+
 
 class MastOverlayType(Enum):
     MARKER = "marker"
@@ -9,9 +17,19 @@ class MastOverlayType(Enum):
     OVERLAY_STCS = "overlay_stcs"
 
 
+# options that change which layer is drawn or where its
+# shapes are drawn, which require sending the overlay data again:
+data_options = {"name", "ra_field", "dec_field", "circle_error", "ellipse_error"}
+
+
 class MastOverlay(dict):
+    # overlays only store each piece of their data once, and derive
+    # other representations of it when they're used, see `__missing__`:
+    __slots__ = ("app", "_spatial_index")
+
     def __init__(self, overlay_info, mast_aladin):
         self.app = mast_aladin
+        self._spatial_index = None
         overlay_type = overlay_info.get("type")
         if overlay_type not in {t.value for t in MastOverlayType}:
             raise ValueError(
@@ -20,6 +38,111 @@ class MastOverlay(dict):
             )
         super().__init__(overlay_info)
 
+    def __contains__(self, key):
+        # keys that are derived from the stored data are available like
+        # the stored keys, see `_derived_keys`, but aren't iterated over:
+        return self._is_stored(key) or key in self._derived_keys()
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def _is_stored(self, key):
+        return super().__contains__(key)
+
+    def _derived_keys(self):
+        """The keys that `__missing__` derives from the stored data."""
+        stored = self._is_stored
+
+        if self.type == MastOverlayType.MARKER.value:
+            return {"markers", "update_info"} if stored("marker_columns") else set()
+
+        if self.type == MastOverlayType.TABLE.value:
+            return {"table"} if stored("table_ref") else set()
+
+        if self.type == MastOverlayType.OVERLAY_REGION.value:
+            keys = set()
+            if stored("update_info"):
+                keys.add("region_geometries")
+            if stored("region_visuals"):
+                keys.add("update_info")
+            if keys or stored("region_geometries"):
+                keys.add("regions_infos")
+            return keys
+
+        if self.type == MastOverlayType.OVERLAY_STCS.value:
+            return {"footprints", "regions_infos"} if stored("update_info") else set()
+
+        return set()
+
+    def __missing__(self, key):
+        if self.type == MastOverlayType.MARKER.value:
+            # markers are stored in columns, see `~mast_aladin.overlay.records`:
+            if key == "markers":
+                return self["marker_columns"].to_dicts()
+
+            if key == "update_info":
+                return self["marker_columns"].to_markers()
+
+        if (
+            self.type == MastOverlayType.TABLE.value
+            and key == "table" and self._is_stored("table_ref")
+        ):
+            table = self["table_ref"]()
+            if table is None:
+                raise ValueError(
+                    f"The table of overlay `{self.name}` is no longer available, "
+                    "since it was only held weakly and has been deleted."
+                )
+            return table
+
+        # region overlays convert the geometry of their regions once, and
+        # the region infos with their current visuals when they're used:
+        if self.type == MastOverlayType.OVERLAY_REGION.value:
+            if key == "region_geometries":
+                self[key] = region_geometries(self["update_info"])
+                return self[key]
+
+            # overlays restored from a snapshot only store the geometry and
+            # visuals, and create their regions when they're first used:
+            if key == "update_info" and self._is_stored("region_visuals"):
+                self[key] = geometry_regions(self["region_geometries"], self["region_visuals"])
+                return self[key]
+
+            if key == "regions_infos":
+                visuals = (
+                    [region.visual for region in self["update_info"]]
+                    if self._is_stored("update_info") else self["region_visuals"]
+                )
+                infos = regions_infos(visuals, self["region_geometries"])
+
+                # options of restyled overlays override the visuals of each region:
+                for info in infos:
+                    info["options"].update(self.get("style_options", {}))
+
+                return infos
+
+        # STC-S overlays only store their strings and options, and parse
+        # the footprints when they're first used:
+        if self.type == MastOverlayType.OVERLAY_STCS.value:
+            if key == "footprints":
+                self[key] = parse_stcs(self["update_info"])
+                return self[key]
+
+            if key == "regions_infos":
+                return [
+                    {
+                        "region_type": "stcs",
+                        "infos": {"stcs": region_element},
+                        "options": self.options,
+                    }
+                    for region_element in self["update_info"]
+                ]
+
+        raise KeyError(key)
+
     @property
     def type(self):
         return self.get("type")
@@ -32,45 +155,162 @@ class MastOverlay(dict):
     def name(self):
         return self.options.get("name")
 
+    @property
+    def spatial_index(self):
+        """
+        `~mast_aladin.overlay.spatial_index.SpatialIndex` of the markers,
+        table rows or footprints of this overlay, which is created on first use.
+        """
+        if self._spatial_index is None:
+            self._spatial_index = self._make_spatial_index()
+
+        return self._spatial_index
+
+    @spatial_index.setter
+    def spatial_index(self, spatial_index):
+        self._spatial_index = spatial_index
+
+    def _make_spatial_index(self):
+        if self.type == MastOverlayType.MARKER.value:
+            marker_columns = self["marker_columns"]
+            return SpatialIndex(marker_columns.lon, marker_columns.lat)
+
+        if self.type == MastOverlayType.TABLE.value:
+            return SpatialIndex.from_table(
+                self["table"], self.options.get("ra_field"), self.options.get("dec_field")
+            )
+
+        if self.type == MastOverlayType.OVERLAY_STCS.value:
+            return SpatialIndex.from_footprints(self["footprints"])
+
+        raise ValueError(f"Overlays of type '{self.type}' have no spatial index.")
+
     @property
     def data(self):
         ignored = ["type", "options"]
         return {key: value for key, value in self.items() if key not in ignored}
 
+    def _can_restyle(self, changed_options):
+        """
+        Check whether the front end can be sent ``changed_options``
+        for the existing layer, without sending its data again, see
+        ``mast_aladin/static/widget.js``.
+        """
+        frontend_events = getattr(self.app, "_frontend_events", ())
+
+        return (
+            "set_overlay_options" in frontend_events
+            and not (changed_options.keys() & data_options)
+        )
+
+    def _restyle(self, updated_options, changed_options):
+        """
+        Send only the changed style options for the existing layer, and
+        keep this overlay in the overlay manager with its updated options.
+
+        The front end restyles the Aladin Lite layer in place. Options that
+        Aladin Lite can't change on an existing layer are reported back, and
+        the overlay is then sent again with `_add_again`.
+        """
+        self.app.send(
+            {
+                "event_name": "set_overlay_options",
+                "overlay_name": self.name,
+                "options": changed_options,
+            }
+        )
+
+        self["options"] = updated_options
+
+        # the front end applies the changed options to each region:
+        if self.type == MastOverlayType.OVERLAY_REGION.value:
+            self["style_options"] = {**self.get("style_options", {}), **changed_options}
+
+        return self
+
     def update(self, **new_options):
         if not new_options:
             raise ValueError(
-                f"Cannot update overlayer `{self.name}` since no options to "
+                f"Cannot update overlay `{self.name}` since no options to "
                 "update were provided."
             )
 
-        self.app.remove_overlay(self)
         updated_options = {**self.options, **new_options}
+        changed_options = {
+            key: value for key, value in updated_options.items()
+            if key not in self.options or self.options[key] != value
+        }
 
-        if self.type == MastOverlayType.MARKER.value:
-            markers = self.get("update_info")
-            overlay_info = self.app.add_markers(markers, **updated_options)
-        elif self.type == MastOverlayType.CATALOG.value:
-            overlay_info = self.app.add_catalog_from_URL(self["votable_URL"], updated_options)
-        elif self.type == MastOverlayType.TABLE.value:
-            overlay_info = self.app.add_table(
-                self["table"],
-                shape=self.options.get("shape", "cross"),
-                **updated_options
-            )
-        elif self.type == MastOverlayType.OVERLAY_REGION.value:
-            regions = self["update_info"]
-            new_regions = []
-            for region in regions:
-                style = self.options.copy()
-                if "color" in style:
-                    style["edgecolor"] = style["color"]
-                style.pop("name", None)
-                region.visual.update(style)
-                new_regions.append(region)
-            overlay_info = self.app.add_graphic_overlay_from_region(regions, **updated_options)
-        elif self.type == MastOverlayType.OVERLAY_STCS.value:
-            update_info = self["update_info"]
-            overlay_info = self.app.add_graphic_overlay_from_stcs(update_info, **updated_options)
+        if not changed_options:
+            return self
+
+        overlays = self.app._overlays_dict
+
+        if self._can_restyle(changed_options):
+            overlay_info = self._restyle(updated_options, changed_options)
+        else:
+            overlay_info = self._add_again(updated_options)
+
+        overlays.publish("update", self.name, overlay_info, new_options)
+
+        return overlay_info
+
+    def _add_again(self, updated_options):
+        """
+        Remove this overlay, and add it again with ``updated_options``,
+        reusing the data that was already converted.
+        """
+        overlays = self.app._overlays_dict
+
+        # culled and clustered overlays stay culled and clustered:
+        cull = "culling" in self
+        cluster = "clustering" in self
+
+        # check that a weakly held table still exists before removing the overlay:
+        if self.type == MastOverlayType.TABLE.value:
+            table = self["table"]
+
+        # send the removal and the re-added overlay together, and only
+        # tell the overlay manager's listeners about the update:
+        with self.app.batch(), overlays.suspend_listeners():
+            self.app.remove_overlay(self)
+
+            if self.type == MastOverlayType.MARKER.value:
+                # markers are re-added from their columns, without Marker objects:
+                overlay_info = self.app._add_marker_columns(
+                    self["marker_columns"], cull, cluster, updated_options
+                )
+            elif self.type == MastOverlayType.CATALOG.value:
+                overlay_info = self.app.add_catalog_from_URL(self["votable_URL"], updated_options)
+            elif self.type == MastOverlayType.TABLE.value:
+                shape = updated_options.pop("shape", self.get("shape", "cross"))
+                overlay_info = self.app.add_table(
+                    table, shape=shape, cull=cull, cluster=cluster,
+                    weak_table=self._is_stored("table_ref"), **updated_options
+                )
+            elif self.type == MastOverlayType.OVERLAY_REGION.value:
+                regions = self["update_info"]
+                new_regions = []
+                for region in regions:
+                    style = self.options.copy()
+                    if "color" in style:
+                        style["edgecolor"] = style["color"]
+                    style.pop("name", None)
+                    region.visual.update(style)
+                    new_regions.append(region)
+                region_data = {
+                    "update_info": regions, "region_geometries": self["region_geometries"]
+                }
+                if self._is_stored("style_options"):
+                    region_data["style_options"] = self["style_options"]
+                overlay_info = self.app._add_region_overlay(region_data, updated_options)
+            elif self.type == MastOverlayType.OVERLAY_STCS.value:
+                # footprints that were already parsed are reused:
+                stcs_data = {"update_info": self["update_info"]}
+                if self._is_stored("footprints"):
+                    stcs_data["footprints"] = self["footprints"]
+                overlay_info = self.app._add_stcs_overlay(
+                    stcs_data, "lod" in self, cull, updated_options
+                )
 
         return overlay_info
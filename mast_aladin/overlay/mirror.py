@@ -0,0 +1,110 @@
+"""
+Mirroring of overlays from one MastAladin widget to others.
+
+The overlay manager of the source widget publishes the overlays that are
+added, removed and updated, see
+`~mast_aladin.overlay.overlay_manager.OverlayManager.subscribe`. Added
+overlays are copied to each target widget with the data that was already
+converted for the source, and later changes are only mirrored as the
+names of removed overlays and the updated options.
+"""
+
+__all__ = [
+    'OverlayMirror',
+]
+
+
+class OverlayMirror:
+    """
+    Mirror the overlays of a source widget in a target widget.
+    """
+
+    def __init__(self, source, target, copy_existing=True):
+        """
+        Parameters
+        ----------
+        source : `~mast_aladin.MastAladin`
+            The widget whose overlays are mirrored.
+
+        target : `~mast_aladin.MastAladin`
+            The widget that mirrors the overlays.
+
+        copy_existing : bool (optional, default is `True`)
+            Copy the overlays that the source already has to the target.
+        """
+        self.source = source
+        self.target = target
+
+        # the names of the mirrored overlays in the target, by their names
+        # in the source, which differ if the names are in use in the target:
+        self.names = dict()
+
+        # overlays that a mirror in the other direction copied
+        # from the target to the source are already paired:
+        for listener in target._overlays_dict._listeners:
+            if isinstance(listener, OverlayMirror) and listener.target is source:
+                self.names.update(
+                    (name, target_name) for target_name, name in listener.names.items()
+                )
+
+        if copy_existing:
+            # like later changes, the copies are not published by the target:
+            with target.batch(), target._overlays_dict.suspend_listeners():
+                for name, overlay in list(source._overlays_dict.items()):
+                    if name not in self.names:
+                        self._add(overlay)
+
+        source._overlays_dict.subscribe(self)
+
+    def __call__(self, change, *details):
+        # changes made here are not published by the target, so
+        # that widgets that mirror each other don't loop:
+        with self.target._overlays_dict.suspend_listeners():
+            if change == "add":
+                self._add(*details)
+
+            elif change == "remove":
+                names = [self.names.pop(name) for name in details[0] if name in self.names]
+                names = [name for name in names if name in self.target._overlays_dict]
+                if names:
+                    self.target.remove_overlay(names)
+                    self._unpair(names)
+
+            elif change == "update":
+                name, overlay, new_options = details
+                target_name = self.names.pop(name, None)
+                self._unpair([target_name])
+                if target_name in self.target._overlays_dict:
+                    # renamed overlays take the name they have in the source:
+                    new_options = dict(new_options)
+                    if "name" in new_options:
+                        new_options["name"] = overlay.name
+                    updated = self.target._overlays_dict[target_name].update(**new_options)
+                    self._pair(overlay.name, updated.name)
+
+    def _add(self, overlay):
+        copy = self.target._overlays_dict.add_copy(overlay)
+        self._pair(overlay.name, copy.name)
+
+    def _pair(self, name, target_name):
+        """
+        Record that the overlay ``name`` in the source is ``target_name``
+        in the target, for this mirror and mirrors in the other direction.
+        """
+        self.names[name] = target_name
+
+        for listener in self.target._overlays_dict._listeners:
+            if isinstance(listener, OverlayMirror) and listener.target is self.source:
+                listener.names[target_name] = name
+
+    def _unpair(self, target_names):
+        for listener in self.target._overlays_dict._listeners:
+            if isinstance(listener, OverlayMirror) and listener.target is self.source:
+                for target_name in target_names:
+                    listener.names.pop(target_name, None)
+
+    def stop(self):
+        """
+        Stop mirroring changes. The mirrored overlays stay in the target.
+        """
+        self.source._overlays_dict.unsubscribe(self)
@@ -1,5 +1,20 @@
+import heapq
 import warnings
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+
 from mast_aladin.overlay.mast_overlay import MastOverlay
+from mast_aladin.overlay.snapshot import load_snapshot, save_snapshot
+
+
+def _split_suffix(name):
+    """Split a name like ``catalog_python_2`` into its base name and suffix."""
+    base, _, suffix = name.rpartition("_")
+
+    if base and suffix.isdigit() and not suffix.startswith("0"):
+        return base, int(suffix)
+
+    return name, None
 
 
 class OverlayManager:
@@ -7,27 +22,133 @@ class OverlayManager:
         self.app = mast_aladin
         self._overlays_dict = {}
 
+        # the next unused suffix for each base name, and the suffixes
+        # below it that are free, so that names are made in O(1). Both
+        # are kept up to date as overlays are added and removed:
+        self._next_suffix = {}
+        self._free_suffixes = {}
+
+        # overlay names by overlay type, and all names in sorted
+        # order, for listing overlays by type or name prefix:
+        self._names_by_type = {}
+        self._sorted_names = []
+
+        # listeners for added, removed and updated overlays, see
+        # `subscribe`, which aren't told about changes while suspended:
+        self._listeners = []
+        self._suspend_depth = 0
+
     def __setitem__(self, key, value):
+        if key in self._overlays_dict:
+            self._unindex(key)
+        else:
+            self._reserve_suffix(key)
+
         self._overlays_dict[key] = value
 
+        self._names_by_type.setdefault(value.get("type"), {})[key] = None
+        insort(self._sorted_names, key)
+
     def __getitem__(self, key):
         return self._overlays_dict[key]
 
     def __contains__(self, key):
         return key in self._overlays_dict
 
+    def __len__(self):
+        return len(self._overlays_dict)
+
     def items(self):
         return self._overlays_dict.items()
 
     def pop(self, key):
-        self._overlays_dict.pop(key)
+        self._unindex(key)
+        overlay = self._overlays_dict.pop(key)
+
+        # the name's suffix can be used again:
+        base, suffix = _split_suffix(key)
+        if suffix is not None and suffix < self._next_suffix.get(base, 1):
+            heapq.heappush(self._free_suffixes.setdefault(base, []), suffix)
+
+        return overlay
+
+    def _reserve_suffix(self, key):
+        """Mark the suffix of a name that is being added as used."""
+        base, suffix = _split_suffix(key)
+        if suffix is None:
+            return
+
+        free_suffixes = self._free_suffixes.get(base)
+        if free_suffixes and free_suffixes[0] == suffix:
+            heapq.heappop(free_suffixes)
+        elif free_suffixes and suffix in free_suffixes:
+            # a freed suffix that was taken by a layer with an explicit name:
+            free_suffixes.remove(suffix)
+            heapq.heapify(free_suffixes)
+
+        next_suffix = self._next_suffix.get(base, 1)
+        if suffix == next_suffix:
+            next_suffix += 1
+            while f"{base}_{next_suffix}" in self._overlays_dict:
+                next_suffix += 1
+            self._next_suffix[base] = next_suffix
 
     def keys(self):
         return self._overlays_dict.keys()
 
+    def _unindex(self, key):
+        overlay_type = self._overlays_dict[key].get("type")
+        names = self._names_by_type[overlay_type]
+        del names[key]
+        if not names:
+            del self._names_by_type[overlay_type]
+
+        del self._sorted_names[bisect_left(self._sorted_names, key)]
+
+    def names(self, overlay_type=None, prefix=None):
+        """List overlay names by type or prefix, without checking every overlay.
+
+        Parameters
+        ----------
+        overlay_type : str or `~mast_aladin.overlay.mast_overlay.MastOverlayType`, optional
+            Only list overlays of this type.
+        prefix : str, optional
+            Only list overlays with names that start with ``prefix``.
+
+        Returns
+        -------
+        names
+            A list of overlay names, in the order they were added when
+            ``overlay_type`` is given, or in sorted order otherwise.
+        """
+        if prefix is not None:
+            start = bisect_left(self._sorted_names, prefix)
+            stop = start
+            while stop < len(self._sorted_names) and self._sorted_names[stop].startswith(prefix):
+                stop += 1
+            names = self._sorted_names[start:stop]
+        else:
+            names = None
+
+        if overlay_type is None:
+            return list(self._sorted_names) if names is None else names
+
+        overlay_type = getattr(overlay_type, "value", overlay_type)
+        names_of_type = self._names_by_type.get(overlay_type, {})
+
+        if names is None:
+            return list(names_of_type)
+
+        return [name for name in names if name in names_of_type]
+
     def make_unique_name(self, name):
         """Create a unique layer name.
 
+        Names that are in use get the lowest free numbered suffix, like
+        ``name_1``. Suffixes are tracked for each name, so that making
+        a name takes constant time however many layers share it. The
+        suffix is only taken when a layer with the name is added.
+
         Parameters
         ----------
         name : str
@@ -38,14 +159,15 @@ class OverlayManager:
         unique_name
             A string that is a unique name for the layer being added.
         """
-        unique_name = name
-        i = 1
+        if name not in self._overlays_dict:
+            return name
 
-        while unique_name in self._overlays_dict:
-            unique_name = f"{name}_{i}"
-            i += 1
+        # freed suffixes are reused first:
+        free_suffixes = self._free_suffixes.get(name)
+        if free_suffixes:
+            return f"{name}_{free_suffixes[0]}"
 
-        return unique_name
+        return f"{name}_{self._next_suffix.get(name, 1)}"
 
     def common_overlay_handling(self, overlay_options, default_name):
         """Handle common functionality across added overlay methods.
@@ -63,11 +185,13 @@ class OverlayManager:
             The updated dictionary of overlay options for the layer being added
             to the widget.
         """
+        requested = "name" in overlay_options
         name = overlay_options.get("name", default_name)
         unique_name = self.make_unique_name(name=name)
         overlay_options["name"] = unique_name
 
-        if unique_name != name:
+        # only warn when a name that was asked for is replaced:
+        if unique_name != name and requested:
             warnings.warn(
                 f"Overlayer name `{name}` is already in use. Name `{unique_name}` "
                 "will be used instead.",
@@ -96,3 +220,162 @@ class OverlayManager:
         self[overlay_info["options"]["name"]] = overlay_info
 
         return overlay_info
+
+    def save_snapshot(self, file, compress=False):
+        """Save all overlays to a snapshot file.
+
+        See `~mast_aladin.overlay.snapshot.save_snapshot`.
+        """
+        save_snapshot(list(self._overlays_dict.values()), file, compress=compress)
+
+    def restore_snapshot(self, file, tables=None):
+        """Add the overlays in a snapshot file, and send them in one batch.
+
+        Overlays keep their names, unless the names are already in use.
+
+        Parameters
+        ----------
+        file : str, `~pathlib.Path` or file-like
+            The snapshot file, see `~mast_aladin.overlay.snapshot.save_snapshot`.
+        tables : dict, optional
+            Tables by the saved name of their overlay, for overlays that held
+            their table weakly, which hold these tables weakly again. Other
+            overlays hold the tables restored from the snapshot, since nothing
+            else refers to them.
+
+        Returns
+        -------
+        overlays
+            The restored `~mast_aladin.overlay.mast_overlay.MastOverlay` objects.
+        """
+        overlays = []
+        tables = tables or {}
+
+        with self.app.batch():
+            for record in load_snapshot(file):
+                overlay_type = record["type"]
+
+                if overlay_type == "catalog":
+                    data = record["votable_URL"]
+                elif overlay_type == "table":
+                    name = record["options"]["name"]
+                    weak_table = record.get("weak_table", False) and name in tables
+                    table = tables[name] if weak_table else record["data"]
+                    data = (table, record["shape"], weak_table)
+                elif overlay_type == "overlay_region":
+                    geometries, visuals = record["data"]
+                    data = {"region_geometries": geometries, "region_visuals": visuals}
+                    if record.get("style_options"):
+                        data["style_options"] = record["style_options"]
+                elif overlay_type == "overlay_stcs":
+                    stcs, footprints = record["data"]
+                    data = {"update_info": stcs, "footprints": footprints}
+                else:
+                    data = record["data"]
+
+                overlays.append(self._add_overlay_data(
+                    overlay_type, data, record["options"],
+                    lod=record["lod"], cull=record["cull"], cluster=record["cluster"],
+                ))
+
+        return overlays
+
+    def add_copy(self, overlay):
+        """Add an overlay of another widget, sharing its data.
+
+        The data that was converted for ``overlay``, like marker columns,
+        tables, parsed footprints and region geometries, is reused rather
+        than converted again.
+
+        Parameters
+        ----------
+        overlay : `~mast_aladin.overlay.mast_overlay.MastOverlay`
+            The overlay to copy.
+
+        Returns
+        -------
+        overlay_info
+            The added `~mast_aladin.overlay.mast_overlay.MastOverlay`.
+        """
+        overlay_type = overlay.type
+
+        if overlay_type == "marker":
+            data = overlay["marker_columns"]
+        elif overlay_type == "catalog":
+            data = overlay["votable_URL"]
+        elif overlay_type == "table":
+            data = (
+                overlay["table"], overlay.get("shape", "cross"), overlay._is_stored("table_ref")
+            )
+        elif overlay_type == "overlay_region":
+            regions_key = (
+                "update_info" if overlay._is_stored("update_info") else "region_visuals"
+            )
+            data = {
+                "region_geometries": overlay["region_geometries"],
+                regions_key: overlay[regions_key],
+            }
+            if "style_options" in overlay:
+                data["style_options"] = dict(overlay["style_options"])
+        else:
+            data = {"update_info": overlay["update_info"], "footprints": overlay["footprints"]}
+
+        return self._add_overlay_data(
+            overlay_type, data, dict(overlay.options),
+            lod="lod" in overlay, cull="culling" in overlay, cluster="clustering" in overlay,
+        )
+
+    def _add_overlay_data(self, overlay_type, data, options, lod=False, cull=False, cluster=False):
+        """Add an overlay from data that was already converted, and send it."""
+        app = self.app
+
+        if overlay_type == "marker":
+            return app._add_marker_columns(data, cull, cluster, options)
+
+        if overlay_type == "catalog":
+            return app.add_catalog_from_URL(data, options)
+
+        if overlay_type == "table":
+            table, shape, weak_table = data
+            return app.add_table(
+                table, shape=shape, cull=cull, cluster=cluster, weak_table=weak_table, **options
+            )
+
+        if overlay_type == "overlay_region":
+            return app._add_region_overlay(data, options)
+
+        return app._add_stcs_overlay(data, lod, cull, options)
+
+    def subscribe(self, listener):
+        """Call ``listener`` when overlays are added, removed or updated.
+
+        The listener is called with the name of the change and its details:
+        ``("add", overlay)`` with the added
+        `~mast_aladin.overlay.mast_overlay.MastOverlay`,
+        ``("remove", names)`` with the list of removed overlay names, and
+        ``("update", name, overlay, new_options)`` with the name of the
+        updated overlay, the updated overlay and the options that were passed
+        to `~mast_aladin.overlay.mast_overlay.MastOverlay.update`.
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        """Stop calling a listener that was added with `subscribe`."""
+        self._listeners.remove(listener)
+
+    def publish(self, change, *details):
+        """Tell the listeners about a change, unless they're suspended."""
+        if self._suspend_depth == 0:
+            for listener in list(self._listeners):
+                listener(change, *details)
+
+    @contextmanager
+    def suspend_listeners(self):
+        """Don't tell listeners about changes within this context."""
+        self._suspend_depth += 1
+
+        try:
+            yield self
+
+        finally:
+            self._suspend_depth -= 1
@@ -0,0 +1,227 @@
+"""
+Compact storage for overlay data.
+
+Markers are stored as columns of NumPy arrays rather than as one Python object
+per marker, and repeated labels are stored once, with an integer code per marker.
+The marker dictionaries sent to the front end and the `~ipyaladin.Marker`
+objects are recreated from the columns when they are needed.
+"""
+import numpy as np
+import astropy.units as u
+from astropy.coordinates import SkyCoord
+from ipyaladin import Marker
+
+__all__ = [
+    'LabelColumn',
+    'MarkerColumns',
+]
+
+
+def _degrees(values):
+    if isinstance(values, u.Quantity):
+        return values.to_value(u.deg)
+
+    return values
+
+
+class LabelColumn:
+    """
+    Strings stored once each, with the index of each item's string.
+    """
+
+    __slots__ = ('values', 'codes')
+
+    def __init__(self, values, codes):
+        """
+        Parameters
+        ----------
+        values : list of str
+            The distinct strings.
+
+        codes : `~numpy.ndarray`
+            The index in ``values`` of each item's string.
+        """
+        self.values = values
+        self.codes = codes
+
+    @classmethod
+    def from_strings(cls, strings):
+        codes_by_value = dict()
+        codes = np.fromiter(
+            (codes_by_value.setdefault(string, len(codes_by_value)) for string in strings),
+            dtype=np.int32,
+            count=len(strings),
+        )
+
+        return cls(list(codes_by_value), codes)
+
+    @classmethod
+    def from_values(cls, values, n_items):
+        """
+        Store one string for all ``n_items``, or an array of strings with
+        one per item, which are made distinct with vectorized operations.
+        """
+        if isinstance(values, str):
+            return cls([values], np.zeros(n_items, dtype=np.int32))
+
+        values = np.asarray(values).astype(str)
+        if values.shape != (n_items,):
+            raise ValueError(
+                f"Marker labels must be a string or have one value for each of the "
+                f"{n_items} markers, but have shape {values.shape}."
+            )
+
+        distinct, codes = np.unique(values, return_inverse=True)
+
+        return cls(distinct.tolist(), codes.astype(np.int32))
+
+    def take(self, indices):
+        """
+        Return the labels at ``indices``, which share the distinct strings.
+        """
+        return LabelColumn(self.values, self.codes[indices])
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        return self.values[self.codes[index]]
+
+    def tolist(self, indices=None):
+        codes = self.codes if indices is None else self.codes[indices]
+        values = self.values
+
+        return [values[code] for code in codes.tolist()]
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + sum(len(value) for value in self.values)
+
+
+class MarkerColumns:
+    """
+    The positions and labels of markers, stored in columns.
+    """
+
+    __slots__ = ('lon', 'lat', 'title', 'description')
+
+    def __init__(self, lon, lat, title, description):
+        """
+        Parameters
+        ----------
+        lon, lat : `~numpy.ndarray`
+            The position of each marker in degrees.
+
+        title, description : `LabelColumn`
+            The labels of each marker.
+        """
+        self.lon = lon
+        self.lat = lat
+        self.title = title
+        self.description = description
+
+    @classmethod
+    def from_markers(cls, markers):
+        """
+        Store the positions and labels of a list of `~ipyaladin.Marker`.
+        """
+        return cls(
+            np.fromiter((marker.lon for marker in markers), np.float64, count=len(markers)),
+            np.fromiter((marker.lat for marker in markers), np.float64, count=len(markers)),
+            LabelColumn.from_strings([marker.title for marker in markers]),
+            LabelColumn.from_strings([marker.description for marker in markers]),
+        )
+
+    @classmethod
+    def from_arrays(cls, coordinates, dec=None, title="", description=""):
+        """
+        Store markers from arrays of positions and labels,
+        see `~mast_aladin.MastAladin.add_markers_from_arrays`.
+        """
+        if isinstance(coordinates, SkyCoord):
+            if dec is not None:
+                raise ValueError("`dec` can't be given with SkyCoord positions.")
+            coordinates = coordinates.icrs
+            lon, lat = coordinates.ra.deg, coordinates.dec.deg
+        elif dec is None:
+            raise ValueError("Marker positions need a SkyCoord, or both `ra` and `dec`.")
+        else:
+            lon, lat = _degrees(coordinates), _degrees(dec)
+
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        if lon.shape != lat.shape or lon.ndim != 1:
+            raise ValueError(
+                f"Marker positions must be 1D with the same length, but `ra` has "
+                f"shape {lon.shape} and `dec` has shape {lat.shape}."
+            )
+
+        return cls(
+            lon, lat,
+            LabelColumn.from_values(title, len(lon)),
+            LabelColumn.from_values(description, len(lon)),
+        )
+
+    def __len__(self):
+        return len(self.lon)
+
+    def take(self, indices):
+        """
+        Return the markers at ``indices`` as new `MarkerColumns`.
+        """
+        return MarkerColumns(
+            self.lon[indices], self.lat[indices],
+            self.title.take(indices), self.description.take(indices),
+        )
+
+    def to_buffers(self):
+        """
+        Return the positions and label codes as little-endian binary buffers,
+        which can be sent to the front end alongside a JSON message.
+        """
+        return [
+            memoryview(np.ascontiguousarray(array, dtype=dtype))
+            for array, dtype in [
+                (self.lon, '<f8'),
+                (self.lat, '<f8'),
+                (self.title.codes, '<i4'),
+                (self.description.codes, '<i4'),
+            ]
+        ]
+
+    def to_dicts(self, indices=None):
+        """
+        Return the markers as the dictionaries sent to the front end.
+
+        Parameters
+        ----------
+        indices : `~numpy.ndarray` (optional)
+            Only return the markers at these indices.
+        """
+        lon = self.lon if indices is None else self.lon[indices]
+        lat = self.lat if indices is None else self.lat[indices]
+
+        return [
+            {"title": title, "description": description, "lon": lon, "lat": lat}
+            for title, description, lon, lat in zip(
+                self.title.tolist(indices), self.description.tolist(indices),
+                lon.tolist(), lat.tolist(),
+            )
+        ]
+
+    def to_markers(self):
+        """
+        Return the markers as `~ipyaladin.Marker` objects.
+        """
+        markers = []
+        for attributes in self.to_dicts():
+            # set the attributes directly, rather than parsing positions:
+            marker = Marker.__new__(Marker)
+            marker.__dict__.update(attributes)
+            markers.append(marker)
+
+        return markers
+
+    @property
+    def nbytes(self):
+        return self.lon.nbytes + self.lat.nbytes + self.title.nbytes + self.description.nbytes
@@ -0,0 +1,283 @@
+"""
+Conversion of `regions` objects into the region infos sent to Aladin Lite.
+
+The geometry of each region is converted in groups of regions of the same
+type, reading the coordinate values of each region once and converting
+their units and angles with array operations, rather than creating angle
+objects for every value of every region. The geometry doesn't depend on the
+region visuals, so it is converted once for each overlay and reused when
+the overlay is restyled, and only the visuals are converted again.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import astropy.units as u
+from astropy.coordinates import SkyCoord
+
+try:
+    from regions import (
+        CircleSkyRegion,
+        EllipseSkyRegion,
+        LineSkyRegion,
+        PolygonSkyRegion,
+    )
+except ImportError:
+    CircleSkyRegion = None
+    EllipseSkyRegion = None
+    LineSkyRegion = None
+    PolygonSkyRegion = None
+
+__all__ = [
+    'geometry_regions',
+    'region_geometries',
+    'regions_infos',
+    'visual_options',
+]
+
+
+def _degrees(quantities):
+    """
+    Return a list of angle quantities as an array of degrees, with
+    one unit conversion for each distinct unit.
+    """
+    values = np.array([quantity.value for quantity in quantities], dtype=np.float64)
+    units = [quantity.unit for quantity in quantities]
+
+    for unit in set(units):
+        if unit != u.deg:
+            mask = np.array([item_unit == unit for item_unit in units])
+            values[mask] *= unit.to(u.deg)
+
+    return values
+
+
+def _lon_lat(coords):
+    """
+    Return the ICRS longitudes and latitudes in degrees of a list of scalar
+    `~astropy.coordinates.SkyCoord`, read from their coordinate data.
+    """
+    data = []
+    for coord in coords:
+        if coord.frame.name != "icrs":
+            coord = coord.icrs
+        representation = coord.data
+        if not hasattr(representation, "lon"):
+            representation = coord.spherical
+        data.append(representation)
+
+    return (
+        _degrees([representation.lon for representation in data]),
+        _degrees([representation.lat for representation in data]),
+    )
+
+
+def _circles(regions):
+    ra, dec = _lon_lat([region.center for region in regions])
+    radius = _degrees([region.radius for region in regions])
+
+    return "circle", [
+        {"ra": ra, "dec": dec, "radius": radius}
+        for ra, dec, radius in zip(ra.tolist(), dec.tolist(), radius.tolist())
+    ]
+
+
+def _ellipses(regions):
+    ra, dec = _lon_lat([region.center for region in regions])
+    a = _degrees([region.width for region in regions]) / 2
+    b = _degrees([region.height for region in regions]) / 2
+    # Aladin Lite measures the angle from the major axis, rather than the width:
+    theta = _degrees([region.angle for region in regions]) - 90
+
+    return "ellipse", [
+        {"ra": ra, "dec": dec, "a": a, "b": b, "theta": theta}
+        for ra, dec, a, b, theta in zip(
+            ra.tolist(), dec.tolist(), a.tolist(), b.tolist(), theta.tolist()
+        )
+    ]
+
+
+def _lines(regions):
+    ra1, dec1 = _lon_lat([region.start for region in regions])
+    ra2, dec2 = _lon_lat([region.end for region in regions])
+
+    return "line", [
+        {"ra1": ra1, "dec1": dec1, "ra2": ra2, "dec2": dec2}
+        for ra1, dec1, ra2, dec2 in zip(ra1.tolist(), dec1.tolist(), ra2.tolist(), dec2.tolist())
+    ]
+
+
+def _polygons(regions):
+    infos = []
+    for region in regions:
+        vertices = region.vertices
+        if vertices.frame.name != "icrs":
+            vertices = vertices.icrs
+        infos.append(
+            {"vertices": np.column_stack([vertices.ra.deg, vertices.dec.deg]).tolist()}
+        )
+
+    return "polygon", infos
+
+
+def _rectangles(regions):
+    """
+    Convert rectangles into polygons, as Aladin Lite draws them, by offsetting
+    the corners from each center and rotating them about the center.
+    """
+    ra, dec = np.radians(_lon_lat([region.center for region in regions]))
+    half_width = np.radians(_degrees([region.width for region in regions])) / 2
+    half_height = np.radians(_degrees([region.height for region in regions])) / 2
+    angle = np.radians(_degrees([region.angle for region in regions]))
+
+    # unit vectors towards each center, and to the east and north of it:
+    center = np.stack([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)], -1)
+    east = np.stack([-np.sin(ra), np.cos(ra), np.zeros_like(ra)], -1)
+    north = np.stack([-np.sin(dec) * np.cos(ra), -np.sin(dec) * np.sin(ra), np.cos(dec)], -1)
+
+    corners = []
+    for lon_sign, lat_sign in [(-1, -1), (-1, 1), (1, 1), (1, -1)]:
+        # the corner at spherical offsets from the center:
+        d_lon = (lon_sign * half_width)[:, None]
+        d_lat = (lat_sign * half_height)[:, None]
+        corner = (
+            np.cos(d_lat) * np.cos(d_lon) * center
+            + np.cos(d_lat) * np.sin(d_lon) * east
+            + np.sin(d_lat) * north
+        )
+
+        # rotated by the position angle about the center:
+        cos, sin = np.cos(angle)[:, None], np.sin(angle)[:, None]
+        corner = (
+            cos * corner
+            + (1 - cos) * center * np.sum(center * corner, axis=-1, keepdims=True)
+            - sin * np.cross(center, corner)
+        )
+        corners.append(corner)
+
+    x, y, z = np.moveaxis(np.stack(corners, axis=1), -1, 0)
+    vertex_ra = np.degrees(np.arctan2(y, x)) % 360
+    vertex_dec = np.degrees(np.arctan2(z, np.hypot(x, y)))
+
+    return "polygon", [
+        {"vertices": np.stack([ra, dec], -1).tolist()}
+        for ra, dec in zip(vertex_ra, vertex_dec)
+    ]
+
+
+_converters = {
+    "CircleSkyRegion": _circles,
+    "EllipseSkyRegion": _ellipses,
+    "LineSkyRegion": _lines,
+    "PolygonSkyRegion": _polygons,
+    "RectangleSkyRegion": _rectangles,
+}
+
+
+def region_geometries(regions, processes=None):
+    """
+    Convert the geometry of each region into its Aladin Lite region type
+    and infos, converting the regions of each type together.
+
+    Parameters
+    ----------
+    regions : list of `~regions.Region`
+        The regions to convert.
+
+    processes : int (optional, default is `None`)
+        If given, split the regions between this many worker processes,
+        which is only faster for very large numbers of regions.
+
+    Returns
+    -------
+    geometries : list of tuple
+        The ``(region_type, infos)`` of each region.
+    """
+    if processes is not None and processes > 1 and len(regions) > processes:
+        chunks = np.array_split(np.arange(len(regions)), processes)
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = executor.map(
+                region_geometries, [[regions[i] for i in chunk] for chunk in chunks]
+            )
+            return [geometry for result in results for geometry in result]
+
+    # the indices of the regions of each type:
+    groups = dict()
+    for i, region in enumerate(regions):
+        type_name = type(region).__name__
+        if type_name not in _converters:
+            raise ValueError(f"Unsupported region type: {type_name}")
+        groups.setdefault(type_name, []).append(i)
+
+    geometries = [None] * len(regions)
+    for type_name, indices in groups.items():
+        region_type, infos = _converters[type_name]([regions[i] for i in indices])
+        for i, info in zip(indices, infos):
+            geometries[i] = (region_type, info)
+
+    return geometries
+
+
+def geometry_regions(geometries, visuals):
+    """
+    Create `regions` objects from region geometries, see `region_geometries`,
+    and their visuals. Rectangles are converted into polygons, as they are
+    drawn in Aladin Lite.
+    """
+    regions = []
+    for (region_type, infos), visual in zip(geometries, visuals):
+        if region_type == "circle":
+            region = CircleSkyRegion(
+                SkyCoord(infos["ra"], infos["dec"], unit="deg"),
+                infos["radius"] * u.deg,
+            )
+        elif region_type == "ellipse":
+            region = EllipseSkyRegion(
+                SkyCoord(infos["ra"], infos["dec"], unit="deg"),
+                2 * infos["a"] * u.deg,
+                2 * infos["b"] * u.deg,
+                (infos["theta"] + 90) * u.deg,
+            )
+        elif region_type == "line":
+            region = LineSkyRegion(
+                SkyCoord(infos["ra1"], infos["dec1"], unit="deg"),
+                SkyCoord(infos["ra2"], infos["dec2"], unit="deg"),
+            )
+        else:
+            vertices = np.asarray(infos["vertices"])
+            region = PolygonSkyRegion(SkyCoord(vertices[:, 0], vertices[:, 1], unit="deg"))
+
+        region.visual.update(visual)
+        regions.append(region)
+
+    return regions
+
+
+def visual_options(visual):
+    """
+    Return the Aladin Lite options for the visuals of a region.
+    """
+    visual = dict(visual)
+
+    if "facecolor" in visual:
+        visual["fill_color"] = visual.pop("facecolor")
+    if "edgecolor" in visual:
+        visual["color"] = visual.pop("edgecolor")
+    if "color" in visual:
+        visual["fill_color"] = visual["color"]
+    if "alpha" in visual:
+        visual["opacity"] = visual.pop("alpha")
+    if "linewidth" in visual:
+        visual["line_width"] = visual.pop("linewidth")
+
+    return visual
+
+
+def regions_infos(visuals, geometries):
+    """
+    Return the region infos sent to Aladin Lite, from the visuals
+    of the regions and their geometries, see `region_geometries`.
+    """
+    return [
+        {"region_type": region_type, "infos": infos, "options": visual_options(visual)}
+        for visual, (region_type, infos) in zip(visuals, geometries)
+    ]
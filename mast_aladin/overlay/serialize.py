@@ -0,0 +1,154 @@
+import hashlib
+import io
+from collections import OrderedDict
+
+import numpy as np
+from astropy.time import Time
+
+__all__ = [
+    'VOTableCache',
+    'get_votable_cache',
+    'table_fingerprint',
+]
+
+
+def _update_hash(digest, column):
+    """
+    Add the values (and mask) of one table column to ``digest``.
+    """
+    if isinstance(column, Time):
+        arrays = [column.jd1, column.jd2]
+    elif isinstance(column, np.ndarray):
+        arrays = [np.asarray(column)]
+    else:
+        # other mixin columns (e.g. SkyCoord) are hashed
+        # by their string representation:
+        arrays = [np.array([str(value) for value in column])]
+
+    mask = getattr(column, 'mask', None)
+    if mask is not None and mask is not np.ma.nomask:
+        arrays.append(np.asarray(mask))
+
+    for array in arrays:
+        if array.dtype.kind == 'O':
+            array = np.array([str(value) for value in array.ravel()])
+
+        digest.update(f'{array.dtype.str}{array.shape}'.encode())
+        digest.update(np.ascontiguousarray(array).view(np.uint8).ravel())
+
+
+def table_fingerprint(table):
+    """
+    Return a hash of everything in ``table`` that is written to a
+    VOTable: its column names, values, masks, dtypes, units,
+    descriptions and formats, and the table metadata.
+
+    Hashing the column data in memory is much faster than writing the
+    table, so the fingerprint can be checked on every call to decide
+    whether a cached VOTable can be reused.
+
+    Parameters
+    ----------
+    table : `~astropy.table.Table`
+        The table to hash.
+
+    Returns
+    -------
+    fingerprint : str
+        Hexadecimal digest of the table contents.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(table.meta).encode())
+
+    for name in table.colnames:
+        column = table[name]
+        info = column.info
+        digest.update(repr((name, str(info.unit), info.description, info.format)).encode())
+        _update_hash(digest, column)
+
+    return digest.hexdigest()
+
+
+class VOTableCache:
+    """
+    Cache of tables serialized as VOTable bytes, keyed on
+    `table_fingerprint`, so that each table is only encoded once.
+
+    The least recently used VOTables are dropped once the
+    cached bytes exceed ``max_size``.
+    """
+
+    def __init__(self, max_size=256 * 1024 ** 2):
+        """
+        Parameters
+        ----------
+        max_size : int (optional, default is 256 MB)
+            The largest total size of the cached VOTables, in bytes.
+        """
+        self.max_size = max_size
+        self._votables = OrderedDict()
+        self._size = 0
+
+    def __len__(self):
+        return len(self._votables)
+
+    def get(self, table):
+        """
+        Return ``table`` serialized as VOTable bytes, writing
+        the VOTable only if it is not already cached.
+        """
+        fingerprint = table_fingerprint(table)
+
+        if fingerprint in self._votables:
+            self._votables.move_to_end(fingerprint)
+            return self._votables[fingerprint]
+
+        table_bytes = io.BytesIO()
+        table.write(table_bytes, format="votable")
+        votable = table_bytes.getvalue()
+
+        self._store(fingerprint, votable)
+
+        return votable
+
+    def add(self, table, votable):
+        """
+        Cache ``votable`` as the serialized ``table``, which was
+        written before, for example when a table is restored.
+        """
+        fingerprint = table_fingerprint(table)
+
+        if fingerprint in self._votables:
+            self._votables.move_to_end(fingerprint)
+            return
+
+        self._store(fingerprint, votable)
+
+    def _store(self, fingerprint, votable):
+        self._votables[fingerprint] = votable
+        self._size += len(votable)
+
+        # always keep the latest VOTable, even if it exceeds `max_size`:
+        while self._size > self.max_size and len(self._votables) > 1:
+            _, dropped = self._votables.popitem(last=False)
+            self._size -= len(dropped)
+
+    def clear(self):
+        self._votables.clear()
+        self._size = 0
+
+
+# VOTables sent by all MastAladin instances, created on first use:
+_votable_cache = None
+
+
+def get_votable_cache():
+    """
+    Return the VOTable cache that is shared by all MastAladin instances.
+    """
+    global _votable_cache
+
+    if _votable_cache is None:
+        _votable_cache = VOTableCache()
+
+    return _votable_cache
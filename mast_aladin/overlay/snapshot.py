@@ -0,0 +1,357 @@
+"""
+Snapshots of overlays, which can be saved to disk and restored in a new widget.
+
+A snapshot is a NumPy ``.npz`` file. The data of each overlay is stored in
+binary arrays: marker positions and label codes, table columns, the flat
+arrays of parsed STC-S footprints, and the concatenated values of region
+geometries. A small JSON header stores the overlay names, types and options,
+and the distinct labels and region visuals. Restoring a snapshot reads the
+arrays directly, so that none of the Python-side conversions of the ``add_*``
+methods are repeated.
+"""
+import json
+import warnings
+
+import numpy as np
+from astropy.table import Column, MaskedColumn, Table
+
+from mast_aladin.overlay.records import LabelColumn, MarkerColumns
+from mast_aladin.overlay.serialize import get_votable_cache
+from mast_aladin.overlay.stcs import Footprints
+
+__all__ = [
+    'load_snapshot',
+    'save_snapshot',
+]
+
+snapshot_version = 1
+
+# the keys of the infos of each region type, in the order they're stored:
+region_keys = {
+    "circle": ("ra", "dec", "radius"),
+    "ellipse": ("ra", "dec", "a", "b", "theta"),
+    "line": ("ra1", "dec1", "ra2", "dec2"),
+    "polygon": ("vertices",),
+}
+region_types = list(region_keys)
+
+
+def _json_default(value):
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+
+    raise ValueError(
+        f"Overlay options and region visuals must be JSON serializable to be saved "
+        f"in a snapshot, but got a value of type {type(value).__name__}."
+    )
+
+
+def _json_meta(meta, name):
+    """
+    Return the items of a table's ``meta`` that can be stored in the JSON
+    header, and warn about the items that are left out.
+    """
+    kept = dict()
+    for key, value in meta.items():
+        try:
+            json.dumps({key: value}, default=_json_default)
+        except (TypeError, ValueError):
+            warnings.warn(
+                f"The meta item `{key}` of the table of overlay `{name}` is not JSON "
+                "serializable, and is not saved in the snapshot.",
+                stacklevel=4,
+            )
+            continue
+        kept[key] = value
+
+    return kept
+
+
+def _pack_strings(strings):
+    """
+    Return a list of strings as UTF-8 bytes, and the start of each string
+    in the joined text, followed by the length of the text.
+    """
+    lengths = np.fromiter((len(string) for string in strings), np.int64, count=len(strings))
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+
+    return np.frombuffer("".join(strings).encode(), dtype=np.uint8), offsets
+
+
+def _unpack_strings(data, offsets):
+    text = data.tobytes().decode()
+    offsets = offsets.tolist()
+
+    return [text[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+
+
+def _distinct_codes(values):
+    """
+    Return the distinct JSON values of a list, and the index of each value.
+    """
+    codes_by_value = dict()
+    codes = np.fromiter(
+        (
+            codes_by_value.setdefault(json.dumps(value, default=_json_default), len(codes_by_value))
+            for value in values
+        ),
+        dtype=np.int32,
+        count=len(values),
+    )
+
+    return [json.loads(value) for value in codes_by_value], codes
+
+
+def _save_markers(overlay, record, arrays):
+    marker_columns = overlay["marker_columns"]
+
+    record["titles"] = marker_columns.title.values
+    record["descriptions"] = marker_columns.description.values
+    arrays["lon"] = marker_columns.lon
+    arrays["lat"] = marker_columns.lat
+    arrays["title_codes"] = marker_columns.title.codes
+    arrays["description_codes"] = marker_columns.description.codes
+
+
+def _load_markers(record, arrays):
+    return MarkerColumns(
+        arrays["lon"], arrays["lat"],
+        LabelColumn(record["titles"], arrays["title_codes"]),
+        LabelColumn(record["descriptions"], arrays["description_codes"]),
+    )
+
+
+def _save_table(overlay, record, arrays):
+    table = overlay["table"]
+
+    columns = []
+    for i, name in enumerate(table.colnames):
+        column = table[name]
+        if not isinstance(column, Column):
+            raise ValueError(
+                f"Column `{name}` of the table of overlay `{overlay.name}` is a "
+                f"{type(column).__name__}, which can't be saved in a snapshot."
+            )
+
+        data = np.asarray(column)
+        if data.dtype.kind == "O":
+            raise ValueError(
+                f"Column `{name}` of the table of overlay `{overlay.name}` holds "
+                "Python objects, which can't be saved in a snapshot. Convert it to "
+                "a column of strings or numbers first."
+            )
+
+        arrays[f"column_{i}"] = data
+        masked = isinstance(column, MaskedColumn)
+        if masked:
+            arrays[f"mask_{i}"] = np.ma.getmaskarray(column)
+
+        columns.append({
+            "name": name,
+            "unit": None if column.unit is None else column.unit.to_string(),
+            "description": column.description,
+            "format": column.format,
+            "masked": masked,
+        })
+
+    record["columns"] = columns
+    record["meta"] = _json_meta(table.meta, overlay.name)
+    record["shape"] = overlay.get("shape", "cross")
+    record["weak_table"] = overlay._is_stored("table_ref")
+
+    # the VOTable that is sent to the front end, so that restored
+    # tables don't need to be serialized again:
+    arrays["votable"] = np.frombuffer(get_votable_cache().get(table), dtype=np.uint8)
+
+
+def _load_table(record, arrays):
+    columns = []
+    for i, info in enumerate(record["columns"]):
+        column_class = MaskedColumn if info["masked"] else Column
+        kwargs = {"mask": arrays[f"mask_{i}"]} if info["masked"] else {}
+        columns.append(column_class(
+            arrays[f"column_{i}"],
+            name=info["name"],
+            unit=info["unit"],
+            description=info["description"],
+            format=info["format"],
+            **kwargs,
+        ))
+
+    table = Table(columns, meta=record["meta"], copy=False)
+    get_votable_cache().add(table, arrays["votable"].tobytes())
+
+    return table
+
+
+def _save_regions(overlay, record, arrays):
+    geometries = overlay["region_geometries"]
+    visuals = (
+        [dict(region.visual) for region in overlay["update_info"]]
+        if overlay._is_stored("update_info") else overlay["region_visuals"]
+    )
+
+    values = []
+    offsets = [0]
+    for region_type, infos in geometries:
+        if region_type == "polygon":
+            values.extend(value for vertex in infos["vertices"] for value in vertex)
+        else:
+            values.extend(infos[key] for key in region_keys[region_type])
+        offsets.append(len(values))
+
+    arrays["region_types"] = np.array(
+        [region_types.index(region_type) for region_type, _ in geometries], dtype=np.uint8
+    )
+    arrays["values"] = np.array(values, dtype=np.float64)
+    arrays["offsets"] = np.array(offsets, dtype=np.int64)
+    record["visuals"], arrays["visual_codes"] = _distinct_codes(visuals)
+    record["style_options"] = overlay.get("style_options", {})
+
+
+def _load_regions(record, arrays):
+    values = arrays["values"].tolist()
+    offsets = arrays["offsets"].tolist()
+
+    geometries = []
+    for region_type, start, stop in zip(
+        arrays["region_types"].tolist(), offsets[:-1], offsets[1:]
+    ):
+        region_type = region_types[region_type]
+        if region_type == "polygon":
+            infos = {"vertices": [values[i:i + 2] for i in range(start, stop, 2)]}
+        else:
+            infos = dict(zip(region_keys[region_type], values[start:stop]))
+        geometries.append((region_type, infos))
+
+    visuals = record["visuals"]
+
+    return geometries, [visuals[code] for code in arrays["visual_codes"].tolist()]
+
+
+def _save_footprints(overlay, record, arrays):
+    footprints = overlay["footprints"]
+
+    # STC-S columns of MAST results are often masked where there's no footprint:
+    strings = [
+        "" if string is np.ma.masked or string is None else str(string)
+        for string in overlay["update_info"]
+    ]
+    arrays["stcs"], arrays["stcs_offsets"] = _pack_strings(strings)
+    arrays["shape_types"] = footprints.shape_types
+    arrays["shape_rows"] = footprints.shape_rows
+    arrays["shape_frames"] = footprints.shape_frames
+    arrays["values"] = footprints.values
+    arrays["offsets"] = footprints.offsets
+    record["n_rows"] = footprints.n_rows
+
+
+def _load_footprints(record, arrays):
+    return (
+        _unpack_strings(arrays["stcs"], arrays["stcs_offsets"]),
+        Footprints(
+            arrays["shape_types"], arrays["shape_rows"],
+            arrays["values"], arrays["offsets"], record["n_rows"],
+            arrays["shape_frames"],
+        ),
+    )
+
+
+_savers = {
+    "marker": _save_markers,
+    "table": _save_table,
+    "overlay_region": _save_regions,
+    "overlay_stcs": _save_footprints,
+}
+
+_loaders = {
+    "marker": _load_markers,
+    "table": _load_table,
+    "overlay_region": _load_regions,
+    "overlay_stcs": _load_footprints,
+}
+
+
+def save_snapshot(overlays, file, compress=False):
+    """
+    Save overlays to a snapshot file.
+
+    Parameters
+    ----------
+    overlays : list of `~mast_aladin.overlay.mast_overlay.MastOverlay`
+        The overlays to save.
+
+    file : str, `~pathlib.Path` or file-like
+        The ``.npz`` file to write.
+
+    compress : bool (optional, default is `False`)
+        Compress the arrays, which makes the file smaller
+        and slower to write and read.
+    """
+    records = []
+    arrays = dict()
+
+    for i, overlay in enumerate(overlays):
+        record = {
+            "type": overlay.type,
+            "options": overlay.options,
+            # options that are set when the overlay is added:
+            "lod": "lod" in overlay,
+            "cull": "culling" in overlay,
+            "cluster": "clustering" in overlay,
+        }
+
+        if overlay.type == "catalog":
+            record["votable_URL"] = overlay["votable_URL"]
+        else:
+            overlay_arrays = dict()
+            _savers[overlay.type](overlay, record, overlay_arrays)
+            arrays.update(
+                (f"{i}/{key}", array) for key, array in overlay_arrays.items()
+            )
+
+        records.append(record)
+
+    header = json.dumps(
+        {"version": snapshot_version, "overlays": records}, default=_json_default
+    )
+    arrays["header"] = np.frombuffer(header.encode(), dtype=np.uint8)
+
+    (np.savez_compressed if compress else np.savez)(file, **arrays)
+
+
+def load_snapshot(file):
+    """
+    Read the overlays in a snapshot file.
+
+    Parameters
+    ----------
+    file : str, `~pathlib.Path` or file-like
+        The ``.npz`` file to read.
+
+    Returns
+    -------
+    records : list of dict
+        The type, options and view options of each overlay, with its data
+        as ``record["data"]``, or its ``votable_URL``.
+    """
+    with np.load(file, allow_pickle=False) as snapshot:
+        header = json.loads(snapshot["header"].tobytes().decode())
+        if header.get("version") != snapshot_version:
+            raise ValueError(
+                f"Snapshots of version {header.get('version')} can't be read, "
+                f"only version {snapshot_version}."
+            )
+
+        arrays = [dict() for _ in header["overlays"]]
+        for key in snapshot.files:
+            if key != "header":
+                i, name = key.split("/", 1)
+                arrays[int(i)][name] = snapshot[key]
+
+    records = header["overlays"]
+    for record, overlay_arrays in zip(records, arrays):
+        if record["type"] in _loaders:
+            record["data"] = _loaders[record["type"]](record, overlay_arrays)
+
+    return records
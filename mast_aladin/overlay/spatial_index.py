@@ -0,0 +1,432 @@
+"""
+HEALPix spatial index over sky positions.
+
+Items are sorted by the nested HEALPix cell that contains them, at a fine
+order. In the nested scheme, the cells within a coarser cell have contiguous
+indices, so the items within any coarser cell are found with a binary search.
+Queries descend from the twelve base cells to the cells that may intersect the
+query region, find their items with binary searches, and then test only those
+items exactly, in O(log n + k) for k items near the region.
+
+Items may have a radius, like the bounding caps of footprints, in which case
+queries return the items whose caps intersect the region.
+"""
+import numpy as np
+import astropy.units as u
+
+from mast_aladin.overlay.culling import Viewport, project
+
+__all__ = [
+    'SpatialIndex',
+    'ang2pix',
+    'pix2ang',
+    'table_positions',
+]
+
+# the order of the cells that items are sorted by, where
+# cells are about 0.2 arcseconds across:
+index_order = 20
+
+# the first row and column of each base cell, in units of cells:
+_face_row = np.array([2, 2, 2, 2, 3, 3, 3, 3, 4, 4, 4, 4])
+_face_column = np.array([1, 3, 5, 7, 0, 2, 4, 6, 1, 3, 5, 7])
+
+# column names that are recognized as coordinates, in lower case,
+# when the columns are not given and have no UCDs:
+ra_names = ['ra', 'targ_ra', 's_ra', 'ra_icrs', 'raj2000', '_raj2000', 'ra_deg']
+dec_names = ['dec', 'targ_dec', 's_dec', 'de_icrs', 'dej2000', '_dej2000', 'dec_deg']
+
+
+def _spread_bits(values):
+    # move bit i of each value to bit 2i:
+    values = values.astype(np.int64)
+    for shift, mask in [
+        (16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+        (2, 0x3333333333333333), (1, 0x5555555555555555),
+    ]:
+        values = (values | (values << shift)) & mask
+    return values
+
+
+def _compact_bits(values):
+    # move bit 2i of each value to bit i:
+    values = values & 0x5555555555555555
+    for shift, mask in [
+        (1, 0x3333333333333333), (2, 0x0F0F0F0F0F0F0F0F), (4, 0x00FF00FF00FF00FF),
+        (8, 0x0000FFFF0000FFFF), (16, 0x00000000FFFFFFFF),
+    ]:
+        values = (values | (values >> shift)) & mask
+    return values
+
+
+def ang2pix(order, lon, lat):
+    """
+    Return the nested HEALPix index of the cells containing sky positions.
+
+    Parameters
+    ----------
+    order : int
+        The HEALPix order, with ``12 * 4 ** order`` cells.
+
+    lon, lat : `~numpy.ndarray`
+        The positions in degrees.
+
+    Returns
+    -------
+    pix : `~numpy.ndarray`
+        The cell indices.
+    """
+    nside = 1 << order
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+
+    z = np.sin(np.radians(lat))
+    z_abs = np.abs(z)
+    tt = np.mod(lon, 360) / 90
+    tt = np.where(tt >= 4, 0, tt)
+
+    # equatorial cells:
+    column = nside * (0.5 + tt)
+    row = nside * z * 0.75
+    jp = (column - row).astype(np.int64)
+    jm = (column + row).astype(np.int64)
+    face_p = jp // nside
+    face_m = jm // nside
+    face = np.where(face_p == face_m, face_p | 4, np.where(face_p < face_m, face_p, face_m + 8))
+    x = jm & (nside - 1)
+    y = nside - (jp & (nside - 1)) - 1
+
+    # polar cells, with 1 - |z| computed from the cosine of the latitude:
+    polar = z_abs > 2 / 3
+    if np.any(polar):
+        ntt = np.minimum(tt[polar].astype(np.int64), 3)
+        tp = tt[polar] - ntt
+        tmp = nside * np.cos(np.radians(lat[polar])) * np.sqrt(3 / (1 + z_abs[polar]))
+        jp_polar = np.minimum((tp * tmp).astype(np.int64), nside - 1)
+        jm_polar = np.minimum(((1 - tp) * tmp).astype(np.int64), nside - 1)
+        north = z[polar] > 0
+
+        face[polar] = np.where(north, ntt, ntt + 8)
+        x[polar] = np.where(north, nside - jm_polar - 1, jp_polar)
+        y[polar] = np.where(north, nside - jp_polar - 1, jm_polar)
+
+    return (face << (2 * order)) + _spread_bits(x) + (_spread_bits(y) << 1)
+
+
+def pix2ang(order, pix):
+    """
+    Return the center in degrees of nested HEALPix cells, the inverse of `ang2pix`.
+    """
+    nside = 1 << order
+    pix = np.asarray(pix, dtype=np.int64)
+
+    face = pix >> (2 * order)
+    within_face = pix & ((1 << (2 * order)) - 1)
+    x = _compact_bits(within_face)
+    y = _compact_bits(within_face >> 1)
+
+    ring = _face_row[face] * nside - x - y - 1
+
+    ring_cells = np.where(ring < nside, ring, np.where(ring > 3 * nside, 4 * nside - ring, nside))
+    polar_z = 1 - ring_cells.astype(np.float64) ** 2 / (3 * nside * nside)
+    z = np.where(
+        ring < nside, polar_z,
+        np.where(ring > 3 * nside, -polar_z, (2 * nside - ring) * 2 / (3 * nside))
+    )
+    shift = np.where((ring >= nside) & (ring <= 3 * nside), (ring - nside) & 1, 0)
+
+    jp = (_face_column[face] * ring_cells + x - y + 1 + shift) // 2
+    jp = np.where(jp > 4 * nside, jp - 4 * nside, jp)
+    jp = np.where(jp < 1, jp + 4 * nside, jp)
+
+    lon = (jp - (shift + 1) * 0.5) * (90 / ring_cells)
+
+    return np.mod(lon, 360), np.degrees(np.arcsin(np.clip(z, -1, 1)))
+
+
+def max_pixrad(order):
+    """
+    Return the largest angular distance in degrees
+    between the center and a corner of a cell.
+    """
+    nside = 1 << order
+    t1 = (1 - 1 / nside) ** 2
+
+    return angular_distance(
+        45 / nside, np.degrees(np.arcsin(2 / 3)), 0, np.degrees(np.arcsin(1 - t1 / 3))
+    )
+
+
+def angular_distance(lon1, lat1, lon2, lat2):
+    """
+    Return the angular distance in degrees between sky positions in degrees.
+    """
+    lon1, lat1, lon2, lat2 = (np.radians(value) for value in (lon1, lat1, lon2, lat2))
+
+    # the haversine formula, which is accurate for small distances:
+    sin_lat = np.sin((lat2 - lat1) / 2)
+    sin_lon = np.sin((lon2 - lon1) / 2)
+    a = sin_lat ** 2 + np.cos(lat1) * np.cos(lat2) * sin_lon ** 2
+
+    return np.degrees(2 * np.arcsin(np.sqrt(np.clip(a, 0, 1))))
+
+
+def _find_column(table, field, ucd, names):
+    if field is not None:
+        return field
+
+    for colname in table.colnames:
+        if (table[colname].meta.get('ucd') or '').lower().startswith(ucd):
+            return colname
+
+    for colname in table.colnames:
+        if colname.lower() in names:
+            return colname
+
+    raise ValueError(
+        f"The table has no column with a `{ucd}` UCD or named one of {names}, "
+        "so its rows have no positions."
+    )
+
+
+def _column_degrees(column):
+    # masked values have no position, and are never found by queries:
+    values = np.ma.filled(np.ma.asarray(column, dtype=np.float64), np.nan)
+
+    if getattr(column, 'unit', None) is not None:
+        values = u.Quantity(values, column.unit).to_value(u.deg)
+
+    return values
+
+
+def table_positions(table, ra_field=None, dec_field=None):
+    """
+    Return the position of each row of a table.
+
+    Parameters
+    ----------
+    table : `~astropy.table.Table`
+        The table.
+
+    ra_field, dec_field : str (optional)
+        The names of the coordinate columns. By default, the columns
+        are found by their UCDs, or by common names like ``ra`` and
+        ``dec``, or ``targ_ra`` and ``targ_dec``.
+
+    Returns
+    -------
+    lon, lat : `~numpy.ndarray`
+        The position of each row in degrees.
+    """
+    lon = _column_degrees(table[_find_column(table, ra_field, 'pos.eq.ra', ra_names)])
+    lat = _column_degrees(table[_find_column(table, dec_field, 'pos.eq.dec', dec_names)])
+
+    return lon, lat
+
+
+class SpatialIndex:
+    """
+    Find items near positions on the sky.
+    """
+
+    def __init__(self, lon, lat, radius=None):
+        """
+        Parameters
+        ----------
+        lon, lat : `~numpy.ndarray`
+            The position of each item in degrees. Items
+            with NaN positions are never found.
+
+        radius : `~numpy.ndarray` (optional)
+            The radius of each item in degrees. By default, items are points.
+        """
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.radius = (
+            np.zeros(len(self.lon)) if radius is None else np.asarray(radius, dtype=np.float64)
+        )
+
+        valid = np.flatnonzero(np.isfinite(self.lon) & np.isfinite(self.lat))
+        self.max_radius = float(np.max(self.radius[valid], initial=0))
+
+        # the items sorted by their cells:
+        cells = ang2pix(index_order, self.lon[valid], self.lat[valid])
+        order = np.argsort(cells, kind='stable')
+        self._cells = cells[order]
+        self._items = valid[order]
+
+    def __len__(self):
+        return len(self.lon)
+
+    @classmethod
+    def from_table(cls, table, ra_field=None, dec_field=None):
+        """
+        Index the rows of a table, see `table_positions`.
+        """
+        return cls(*table_positions(table, ra_field, dec_field))
+
+    @classmethod
+    def from_footprints(cls, footprints):
+        """
+        Index the bounding caps of each shape in
+        `~mast_aladin.overlay.stcs.Footprints`, in ICRS.
+        """
+        from mast_aladin.overlay.lod import shape_centers
+        from mast_aladin.overlay.stcs import icrs_positions
+
+        lon, lat, size = shape_centers(footprints)
+        lon, lat = icrs_positions(lon, lat, footprints.shape_frames)
+
+        # the cap around the bounding box of each shape:
+        return cls(lon, lat, size / np.sqrt(2))
+
+    def _candidates(self, lon, lat, radius):
+        """
+        Return the items in cells that may be within ``radius``
+        degrees of a position, sorted by their cells.
+        """
+        if radius >= 180:
+            return self._items
+
+        cells = np.arange(12)
+        for order in range(index_order + 1):
+            center_lon, center_lat = pix2ang(order, cells)
+            pixrad = max_pixrad(order) + 1e-9
+            near = angular_distance(center_lon, center_lat, lon, lat) <= radius + pixrad
+            cells = cells[near]
+
+            # stop descending once the cells are small compared to the region:
+            if order == index_order or pixrad < radius / 4 or not len(cells):
+                break
+
+            cells = (4 * cells[:, None] + np.arange(4)).ravel()
+
+        shift = 2 * (index_order - order)
+        starts = np.searchsorted(self._cells, cells << shift)
+        stops = np.searchsorted(self._cells, (cells + 1) << shift)
+
+        counts = stops - starts
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        gather = np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1])
+
+        return self._items[gather]
+
+    def cone(self, lon, lat, radius):
+        """
+        Return the indices of the items within a cone.
+
+        Parameters
+        ----------
+        lon, lat, radius : float
+            The center and radius of the cone in degrees.
+
+        Returns
+        -------
+        indices : `~numpy.ndarray`
+            The sorted indices of the items that intersect the cone.
+        """
+        candidates = self._candidates(lon, lat, radius + self.max_radius)
+        distance = angular_distance(self.lon[candidates], self.lat[candidates], lon, lat)
+
+        return np.sort(candidates[distance <= radius + self.radius[candidates]])
+
+    def box(self, lon, lat, width, height, rotation=0):
+        """
+        Return the indices of the items within a box.
+
+        Parameters
+        ----------
+        lon, lat : float
+            The center of the box in degrees.
+
+        width, height : float
+            The size of the box in degrees, along its own axes.
+
+        rotation : float (optional, default is 0)
+            The rotation of the box in degrees.
+
+        Returns
+        -------
+        indices : `~numpy.ndarray`
+            The sorted indices of the items that intersect the box.
+        """
+        return self.viewport(Viewport(lon, lat, width, height, rotation))
+
+    def viewport(self, viewport):
+        """
+        Return the sorted indices of the items that intersect a
+        `~mast_aladin.overlay.culling.Viewport`.
+        """
+        if viewport.all_sky:
+            return np.arange(len(self))
+
+        corner_lon, corner_lat = viewport.corners()
+        radius = np.max(angular_distance(corner_lon, corner_lat, viewport.lon, viewport.lat))
+
+        candidates = self._candidates(viewport.lon, viewport.lat, radius + self.max_radius)
+        inside = viewport.contains(
+            self.lon[candidates], self.lat[candidates], self.radius[candidates]
+        )
+
+        return np.sort(candidates[inside])
+
+    def polygon(self, vertices):
+        """
+        Return the indices of the items within a polygon.
+
+        Parameters
+        ----------
+        vertices : `~numpy.ndarray`
+            The longitude and latitude of each vertex in degrees, with shape
+            ``(n, 2)``. Edges are great circles, and the polygon must be
+            smaller than a hemisphere.
+
+        Returns
+        -------
+        indices : `~numpy.ndarray`
+            The sorted indices of the items that intersect the polygon.
+        """
+        vertices = np.asarray(vertices, dtype=np.float64)
+        if vertices.ndim != 2 or vertices.shape[1] != 2 or len(vertices) < 3:
+            raise ValueError("A polygon needs the longitude and latitude of 3 or more vertices.")
+
+        # the center of the polygon, from the mean of its vertices on the unit sphere:
+        lon, lat = np.radians(vertices.T)
+        mean = np.array([
+            np.mean(np.cos(lat) * np.cos(lon)),
+            np.mean(np.cos(lat) * np.sin(lon)),
+            np.mean(np.sin(lat)),
+        ])
+        center_lon = np.degrees(np.arctan2(mean[1], mean[0]))
+        center_lat = np.degrees(np.arctan2(mean[2], np.hypot(mean[0], mean[1])))
+
+        radius = np.max(angular_distance(*vertices.T, center_lon, center_lat))
+        candidates = self._candidates(center_lon, center_lat, radius + self.max_radius)
+
+        # great circles are straight lines in the gnomonic projection:
+        x, y = project(self.lon[candidates], self.lat[candidates], center_lon, center_lat)
+        vertex_x, vertex_y = project(*vertices.T, center_lon, center_lat)
+        next_x, next_y = np.roll(vertex_x, -1), np.roll(vertex_y, -1)
+
+        # count the edges crossed by a ray from each point:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            straddles = (vertex_y > y[:, None]) != (next_y > y[:, None])
+            slope = (next_x - vertex_x) / (next_y - vertex_y)
+            crossing_x = vertex_x + (y[:, None] - vertex_y) * slope
+        inside = np.count_nonzero(straddles & (x[:, None] < crossing_x), axis=1) % 2 == 1
+
+        if self.max_radius > 0:
+            # items whose caps reach across an edge:
+            edge_x, edge_y = next_x - vertex_x, next_y - vertex_y
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t = np.clip(
+                    ((x[:, None] - vertex_x) * edge_x + (y[:, None] - vertex_y) * edge_y)
+                    / (edge_x ** 2 + edge_y ** 2), 0, 1
+                )
+            distance = np.min(
+                np.hypot(vertex_x + t * edge_x - x[:, None], vertex_y + t * edge_y - y[:, None]),
+                axis=1,
+            )
+            inside |= distance <= np.tan(np.radians(self.radius[candidates]))
+
+        return np.sort(candidates[inside])
@@ -0,0 +1,375 @@
+"""
+Vectorized parsing of STC-S footprints into flat NumPy arrays.
+
+Keywords in the strings are replaced by sentinel values, so that all
+strings are parsed as numbers in a single pass, and then classified with
+array operations. No Python objects are created per footprint.
+Each shape is stored as a type code, the row of the STC-S string it came
+from, the code of its frame, and a slice of one flat array of numeric values:
+
+* ``POLYGON``: the longitude and latitude of each vertex,
+* ``CIRCLE``: the center longitude and latitude, and the radius,
+* ``BOX``: the center longitude and latitude, the width and the height,
+
+with all values in degrees.
+"""
+import re
+
+import numpy as np
+from astropy.coordinates import SkyCoord
+
+__all__ = [
+    'Footprints',
+    'icrs_positions',
+    'parse_stcs',
+]
+
+shape_names = ['polygon', 'circle', 'box']
+
+# frames of the shapes, which are written back when the shapes are sent to
+# Aladin Lite. Shapes without a frame have the code 0:
+frame_names = [
+    '', 'ICRS', 'FK5', 'FK4', 'J2000', 'B1950', 'GALACTIC', 'GALACTIC_II',
+    'SUPER_GALACTIC', 'ECLIPTIC', 'GEO_C', 'GEO_D', 'UNKNOWNFRAME',
+]
+
+# frames whose positions differ from ICRS by more than the precision of the
+# spatial index, and their astropy names. Other frames are treated as ICRS:
+astropy_frames = {
+    'FK4': 'fk4',
+    'B1950': 'fk4',
+    'GALACTIC': 'galactic',
+    'GALACTIC_II': 'galactic',
+    'SUPER_GALACTIC': 'supergalactic',
+    'ECLIPTIC': 'geocentricmeanecliptic',
+}
+
+# STC-S shapes that can't be drawn as footprints:
+unsupported_shapes = ['POSITION', 'ELLIPSE', 'CONVEX']
+
+# keywords are replaced by sentinel values before the whole text is
+# parsed as numbers, starting with the separator between strings:
+_row_code = -9e300
+_unsupported_code = -8e300
+_shape_codes = [-(code + 1) * 1e300 for code in range(len(shape_names))]
+_frame_codes = [-(code + 10) * 1e300 for code in range(len(frame_names))]
+
+# longer frames come first, so that e.g. SUPER_GALACTIC
+# is replaced before GALACTIC:
+_keywords = {
+    **{name.upper(): f' {code!r} ' for name, code in zip(shape_names, _shape_codes)},
+    **{name: f' {_unsupported_code!r} ' for name in unsupported_shapes},
+    **{
+        name: f' {_frame_codes[frame_names.index(name)]!r} '
+        for name in sorted(frame_names[1:], key=len, reverse=True)
+    },
+}
+
+# reference positions and operators, which are dropped:
+ignored_keywords = [
+    'UNKNOWNREFPOS', 'INTERSECTION', 'HELIOCENTER', 'RELOCATABLE', 'TOPOCENTER',
+    'BARYCENTER', 'DIFFERENCE', 'SPHERICAL2', 'GEOCENTER', 'UNION', 'LSR', 'NOT',
+]
+
+# words that don't start within a number (like the "e" in "1e-5"):
+_word = re.compile(r'\b[A-Z_]\w*')
+
+
+def _parse_numbers(text, normalize=False):
+    """
+    Parse STC-S text with its keywords replaced by sentinel values.
+    If ``normalize``, keywords in any case are replaced, and all
+    words that are not keywords are dropped, which is slower.
+    """
+    if normalize:
+        text = text.upper()
+
+    text = text.replace('(', ' ').replace(')', ' ')
+    for keyword, code in _keywords.items():
+        text = text.replace(keyword, code)
+    for keyword in ignored_keywords:
+        text = text.replace(keyword, ' ')
+
+    if normalize:
+        text = _word.sub(' ', text)
+
+    return np.array(text.split(), dtype=np.float64)
+
+
+def parse_stcs(stcs):
+    """
+    Parse STC-S strings into flat arrays of shapes and values.
+
+    Parameters
+    ----------
+    stcs : str or iterable of str
+        STC-S strings, each with one or more ``POLYGON``, ``CIRCLE``
+        or ``BOX`` shapes, e.g. the ``s_region`` column of a MAST query.
+        The frame of each shape is kept, see ``frame_names``, reference
+        position keywords are ignored, and masked or empty strings have
+        no shapes.
+
+    Returns
+    -------
+    footprints : `Footprints`
+        The parsed shapes.
+    """
+    if isinstance(stcs, str):
+        stcs = [stcs]
+
+    if isinstance(stcs, np.ma.MaskedArray):
+        stcs = stcs.filled('')
+
+    strings = stcs.tolist() if isinstance(stcs, np.ndarray) else list(stcs)
+    if len(strings) and isinstance(strings[0], bytes):
+        strings = [string.decode() for string in strings]
+
+    n_rows = len(strings)
+    text = f' {_row_code!r} '.join(strings)
+
+    try:
+        tokens = _parse_numbers(text)
+    except ValueError:
+        # the text has words in lower case, or unknown words:
+        try:
+            tokens = _parse_numbers(text, normalize=True)
+        except ValueError:
+            raise ValueError("STC-S strings contain values that are not numbers.")
+
+    token_row = np.cumsum(tokens == _row_code)
+    shape_type = np.full(len(tokens), -1, dtype=np.int8)
+    for code, sentinel in enumerate(_shape_codes):
+        shape_type[tokens == sentinel] = code
+
+    unsupported = tokens == _unsupported_code
+    if np.any(unsupported):
+        row = token_row[np.argmax(unsupported)]
+        raise ValueError(
+            f"STC-S string {row} has a shape that is not supported, "
+            f"only {[name.upper() for name in shape_names]} are supported."
+        )
+
+    token_frame = np.zeros(len(tokens), dtype=np.uint8)
+    for code, sentinel in enumerate(_frame_codes[1:], start=1):
+        token_frame[tokens == sentinel] = code
+    is_frame = token_frame > 0
+
+    is_shape = shape_type >= 0
+    is_number = ~is_shape & ~is_frame & (tokens != _row_code)
+
+    # each number belongs to the last shape keyword before it:
+    token_shape = np.cumsum(is_shape) - 1
+    value_shape = token_shape[is_number]
+    stray = value_shape < 0
+    if not np.any(stray):
+        stray = token_row[is_number] != token_row[is_shape][value_shape]
+    if np.any(stray):
+        row = token_row[is_number][np.argmax(stray)]
+        raise ValueError(f"STC-S string {row} has values that don't follow a shape.")
+
+    values = tokens[is_number]
+    types = shape_type[is_shape].astype(np.uint8)
+    rows = token_row[is_shape].astype(np.int64)
+
+    # the frame of each shape follows its keyword, like "POLYGON ICRS", or
+    # comes earlier in the same string, like "UNION ICRS (POLYGON ...)":
+    shape_index = np.flatnonzero(is_shape)
+    following = np.minimum(shape_index + 1, len(tokens) - 1)
+    previous = np.maximum.accumulate(np.where(is_frame, np.arange(len(tokens)), 0))[shape_index]
+    frames = np.where(
+        is_frame[following],
+        token_frame[following],
+        np.where(token_row[previous] == rows, token_frame[previous], 0),
+    ).astype(np.uint8)
+    counts = np.bincount(value_shape, minlength=len(types))
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    valid = np.where(
+        types == shape_names.index('polygon'),
+        (counts >= 6) & (counts % 2 == 0),
+        counts == np.where(types == shape_names.index('circle'), 3, 4),
+    )
+    if not np.all(valid):
+        index = np.argmax(~valid)
+        raise ValueError(
+            f"STC-S string {rows[index]} has a {shape_names[types[index]]} "
+            f"with {counts[index]} values."
+        )
+
+    return Footprints(types, rows, values, offsets, n_rows, frames)
+
+
+def icrs_positions(lon, lat, shape_frames):
+    """
+    Convert the positions of shapes to ICRS from the frame of each shape.
+
+    Parameters
+    ----------
+    lon, lat : `~numpy.ndarray`
+        Positions in the frame of each shape, in degrees.
+
+    shape_frames : `~numpy.ndarray`
+        Index in ``frame_names`` of the frame of each shape.
+
+    Returns
+    -------
+    lon, lat : `~numpy.ndarray`
+        The positions in ICRS, in degrees.
+    """
+    lon = np.array(lon, dtype=np.float64)
+    lat = np.array(lat, dtype=np.float64)
+
+    for code in np.unique(shape_frames).tolist():
+        frame = astropy_frames.get(frame_names[code])
+        if frame is None:
+            continue
+
+        in_frame = shape_frames == code
+        icrs = SkyCoord(lon[in_frame], lat[in_frame], unit='deg', frame=frame).icrs
+        lon[in_frame] = icrs.ra.deg
+        lat[in_frame] = icrs.dec.deg
+
+    return lon, lat
+
+
+class Footprints:
+    """
+    Shapes parsed from STC-S strings, stored in flat arrays.
+    See `parse_stcs` for the layout of the arrays.
+    """
+
+    def __init__(self, shape_types, shape_rows, values, offsets, n_rows, shape_frames=None):
+        """
+        Parameters
+        ----------
+        shape_types : `~numpy.ndarray`
+            Index in ``shape_names`` of the type of each shape.
+
+        shape_rows : `~numpy.ndarray`
+            Index of the STC-S string that each shape came from.
+
+        values : `~numpy.ndarray`
+            Values of all shapes, concatenated.
+
+        offsets : `~numpy.ndarray`
+            Start of each shape's values in ``values``, followed
+            by the total number of values.
+
+        n_rows : int
+            The number of parsed STC-S strings.
+
+        shape_frames : `~numpy.ndarray` (optional, default is `None`)
+            Index in ``frame_names`` of the frame of each shape.
+            If `None`, the shapes have no frame.
+        """
+        if shape_frames is None:
+            shape_frames = np.zeros(len(shape_types), dtype=np.uint8)
+
+        self.shape_types = shape_types
+        self.shape_rows = shape_rows
+        self.values = values
+        self.offsets = offsets
+        self.n_rows = n_rows
+        self.shape_frames = shape_frames
+
+    def __len__(self):
+        return len(self.shape_types)
+
+    def shape_values(self, index):
+        """
+        Return the values of one shape.
+        """
+        return self.values[self.offsets[index]:self.offsets[index + 1]]
+
+    def take(self, indices):
+        """
+        Return the shapes at ``indices`` as new `Footprints`.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.offsets[indices]
+        counts = self.offsets[indices + 1] - starts
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        # gather the values of every shape without a Python loop:
+        gather = np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1])
+
+        return Footprints(
+            self.shape_types[indices], self.shape_rows[indices],
+            self.values[gather], offsets, self.n_rows, self.shape_frames[indices],
+        )
+
+    @classmethod
+    def concatenate(cls, footprints):
+        """
+        Join a list of `Footprints` parsed from the same STC-S strings.
+        """
+        offsets = [footprint.offsets[1:] for footprint in footprints]
+        starts = np.cumsum([0] + [footprint.offsets[-1] for footprint in footprints])
+
+        return cls(
+            np.concatenate([footprint.shape_types for footprint in footprints]),
+            np.concatenate([footprint.shape_rows for footprint in footprints]),
+            np.concatenate([footprint.values for footprint in footprints]),
+            np.concatenate([[0]] + [
+                offset + start for offset, start in zip(offsets, starts)
+            ]).astype(np.int64),
+            footprints[0].n_rows,
+            np.concatenate([footprint.shape_frames for footprint in footprints]),
+        )
+
+    def polygon_vertices(self):
+        """
+        Return the vertices of all polygons as an array of
+        longitude and latitude pairs, and the index of the first
+        vertex of each polygon, followed by the number of vertices.
+        """
+        polygons = self.take(np.flatnonzero(self.shape_types == shape_names.index('polygon')))
+
+        return polygons.values.reshape(-1, 2), polygons.offsets // 2
+
+    def to_buffers(self):
+        """
+        Return the arrays as little-endian binary buffers, which
+        can be sent to the front end alongside a JSON message.
+        """
+        return [
+            memoryview(np.ascontiguousarray(array, dtype=dtype))
+            for array, dtype in [
+                (self.shape_types, '<u1'),
+                (self.shape_rows, '<i4'),
+                (self.offsets, '<u4'),
+                (self.values, '<f8'),
+                (self.shape_frames, '<u1'),
+            ]
+        ]
+
+    def to_stcs(self, precision=6):
+        """
+        Format each shape as an STC-S string in its frame.
+
+        Parameters
+        ----------
+        precision : int (optional, default is 6)
+            The number of decimal places of each value.
+
+        Returns
+        -------
+        stcs : list of str
+            One STC-S string per shape.
+        """
+        if not len(self):
+            return []
+
+        values = np.char.mod(f'%.{precision}f', self.values).tolist()
+        prefixes = [
+            [f'{name.upper()} {frame} ' if frame else f'{name.upper()} ' for frame in frame_names]
+            for name in shape_names
+        ]
+        offsets = self.offsets.tolist()
+
+        return [
+            prefixes[shape_type][frame] + ' '.join(values[start:stop])
+            for shape_type, frame, start, stop in zip(
+                self.shape_types.tolist(), self.shape_frames.tolist(), offsets[:-1], offsets[1:]
+            )
+        ]
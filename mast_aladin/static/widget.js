@@ -0,0 +1,263 @@
+/*
+ * The front end of MastAladin: the front end of ipyaladin, with handlers for
+ * the messages that MastAladin sends in addition to those of ipyaladin.
+ *
+ * MastAladin defines `ipyaladinSource`, the source of the ipyaladin front end
+ * module, before this module. Messages that ipyaladin handles are passed on
+ * to its handler, and the other messages are translated into messages that
+ * ipyaladin handles, or applied to the Aladin Lite layers directly.
+ */
+const ipyaladinURL = URL.createObjectURL(
+  new Blob([ipyaladinSource], { type: "text/javascript" }),
+);
+const ipyaladin = (await import(ipyaladinURL)).default;
+URL.revokeObjectURL(ipyaladinURL);
+
+// the Aladin Lite module that ipyaladin imports, which is the same
+// module instance, so that the Aladin instances it creates can be found:
+const aladinLiteImport = ipyaladinSource.match(/from\s*"(https:[^"]*aladin-lite[^"]*)"/);
+const A = aladinLiteImport ? (await import(aladinLiteImport[1])).default : null;
+
+// the setters of layers and their shapes for the options that can be restyled:
+const overlaySetters = {
+  color: "setColor",
+  lineWidth: "setLineWidth",
+  lineDash: "setLineDash",
+  fillColor: "setFillColor",
+  opacity: "setOpacity",
+};
+const catalogShapeOptions = new Set(["color", "sourceSize", "shape"]);
+
+function camelCase(name) {
+  // like ipyaladin, which converts Python option names to Aladin Lite's:
+  const words = name.replace(/^_/, "").split("_");
+  return words
+    .map((word, i) => (i ? word.charAt(0).toUpperCase() + word.slice(1) : word))
+    .join("");
+}
+
+function findLayer(aladin, name) {
+  const view = (aladin && aladin.view) || {};
+  const layers = view.allOverlayLayers || [
+    ...(view.overlays || []),
+    ...(view.catalogs || []),
+  ];
+  return layers.find((layer) => layer.name === name);
+}
+
+function restyleLayer(layer, options) {
+  // returns whether all of the options could be applied in place,
+  // and only applies them if they can all be applied:
+  const entries = Object.entries(options).map(([key, value]) => [camelCase(key), value]);
+
+  if (typeof layer.updateShape === "function") {
+    // catalogs, of markers and tables, redraw their sources with a new shape:
+    const canRestyle = entries.every(
+      ([key, value]) =>
+        catalogShapeOptions.has(key) && (key !== "shape" || typeof value === "string"),
+    );
+    if (canRestyle) {
+      layer.updateShape(Object.fromEntries(entries));
+    }
+    return canRestyle;
+  }
+
+  // graphic overlays restyle themselves and each of their footprints and
+  // shapes, which were drawn with their own copy of the options:
+  const targets = [layer, ...(layer.overlays || []), ...(layer.overlayItems || [])];
+  const setters = entries.map(([key, value]) => [overlaySetters[key], value]);
+  const canRestyle = setters.every(
+    ([setter]) => setter && targets.every((target) => typeof target[setter] === "function"),
+  );
+  if (!canRestyle) {
+    return false;
+  }
+
+  for (const target of targets) {
+    for (const [setter, value] of setters) {
+      target[setter](value);
+    }
+  }
+  if (typeof layer.reportChange === "function") {
+    layer.reportChange();
+  }
+  return true;
+}
+
+function typedArray(ArrayType, buffer) {
+  // the bytes are copied, since buffers may not be aligned for `ArrayType`:
+  const view = ArrayBuffer.isView(buffer) ? buffer : new DataView(buffer);
+  return new ArrayType(
+    view.buffer.slice(view.byteOffset, view.byteOffset + view.byteLength),
+  );
+}
+
+class MessageHandler {
+  constructor(handle, model, getAladin) {
+    // the handler of ipyaladin's front end, the widget's
+    // model, and a function that returns its Aladin instance:
+    this.handle = handle;
+    this.model = model;
+    this.getAladin = getAladin;
+
+    this.eventHandlers = {
+      add_footprints: this.handleAddFootprints,
+      add_marker_columns: this.handleAddMarkerColumns,
+      batch: this.handleBatch,
+      set_overlay_options: this.handleSetOverlayOptions,
+    };
+  }
+
+  receive(content, buffers) {
+    const handler = this.eventHandlers[content.event_name];
+    if (handler) {
+      handler.call(this, content, buffers);
+      return;
+    }
+
+    this.handle(content, buffers);
+  }
+
+  handleBatch(content, buffers) {
+    // messages queued by `MastAladin.batch`, in the order they were
+    // sent, each with the indices of its own buffers:
+    for (const message of content.messages) {
+      const { buffer_indices: indices, ...messageContent } = message;
+      this.receive(
+        messageContent,
+        indices.map((index) => buffers[index]),
+      );
+    }
+  }
+
+  handleAddFootprints(content, buffers) {
+    // the flat arrays of `mast_aladin.overlay.stcs.Footprints`, which
+    // are drawn as one STC-S region for each shape:
+    const shapeTypes = typedArray(Uint8Array, buffers[0]);
+    const offsets = typedArray(Uint32Array, buffers[2]);
+    const values = typedArray(Float64Array, buffers[3]);
+    const shapeFrames = typedArray(Uint8Array, buffers[4]);
+    const names = content.shape_names.map((name) => name.toUpperCase());
+
+    const regionsInfos = [];
+    for (let i = 0; i < shapeTypes.length; i++) {
+      const frame = content.frame_names[shapeFrames[i]];
+      const words = [names[shapeTypes[i]], ...(frame ? [frame] : [])];
+      const shapeValues = values.subarray(offsets[i], offsets[i + 1]);
+      regionsInfos.push({
+        region_type: "stcs",
+        infos: { stcs: [...words, ...shapeValues].join(" ") },
+        options: content.options,
+      });
+    }
+
+    this.receive({
+      event_name: "add_overlay",
+      regions_infos: regionsInfos,
+      graphic_options: content.options,
+    });
+  }
+
+  handleAddMarkerColumns(content, buffers) {
+    // the columns of `mast_aladin.overlay.records.MarkerColumns`, with
+    // each distinct title and description sent once:
+    const lon = typedArray(Float64Array, buffers[0]);
+    const lat = typedArray(Float64Array, buffers[1]);
+    const titleCodes = typedArray(Int32Array, buffers[2]);
+    const descriptionCodes = typedArray(Int32Array, buffers[3]);
+
+    const markers = [];
+    for (let i = 0; i < lon.length; i++) {
+      markers.push({
+        title: content.titles[titleCodes[i]],
+        description: content.descriptions[descriptionCodes[i]],
+        lon: lon[i],
+        lat: lat[i],
+      });
+    }
+
+    this.receive({
+      event_name: "add_marker",
+      markers: markers,
+      options: content.options,
+    });
+  }
+
+  handleSetOverlayOptions(content) {
+    // the layer is restyled in place. Options that Aladin Lite can't
+    // change on an existing layer are reported back to MastAladin,
+    // which sends the overlay again with the new options:
+    const layer = findLayer(this.getAladin(), content.overlay_name);
+    if (layer && restyleLayer(layer, content.options)) {
+      const view = this.getAladin().view;
+      if (view && typeof view.requestRedraw === "function") {
+        view.requestRedraw();
+      }
+      return;
+    }
+
+    this.model.send({ event_type: "restyle_failed", overlay_name: content.overlay_name });
+  }
+}
+
+function withMessageHandler(model, getAladin) {
+  // ipyaladin's handler of custom messages is wrapped
+  // by a `MessageHandler` when it is registered:
+  return new Proxy(model, {
+    get(target, property) {
+      if (property === "on") {
+        return (name, callback, context) => {
+          if (name !== "msg:custom") {
+            return target.on(name, callback, context);
+          }
+
+          const handler = new MessageHandler(
+            (content, buffers) => callback.call(context, content, buffers),
+            target,
+            getAladin,
+          );
+          return target.on(
+            name,
+            (content, buffers) => handler.receive(content, buffers),
+            context,
+          );
+        };
+      }
+
+      const value = Reflect.get(target, property);
+      return typeof value === "function" ? value.bind(target) : value;
+    },
+  });
+}
+
+function render(props) {
+  // ipyaladin creates its Aladin instance while rendering, which is
+  // kept for restyling the layers in place. Without it, overlays are
+  // restyled by sending them again:
+  let aladin = null;
+  const createAladin = A && A.aladin;
+  try {
+    A.aladin = function (...args) {
+      aladin = new createAladin(...args);
+      return aladin;
+    };
+  } catch {
+    // the module can't be changed
+  }
+
+  try {
+    return ipyaladin.render({
+      ...props,
+      model: withMessageHandler(props.model, () => aladin),
+    });
+  } finally {
+    if (A && A.aladin !== createAladin) {
+      A.aladin = createAladin;
+    }
+  }
+}
+
+export default {
+  initialize: (props) => ipyaladin.initialize(props),
+  render,
+};
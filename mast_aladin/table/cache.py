@@ -0,0 +1,295 @@
+import os
+import tempfile
+import threading
+
+import numpy as np
+from astropy.config import get_cache_dir
+from astropy.table import Table
+from astropy.time import Time
+from astroquery.mast import MastMissions
+
+from mast_aladin.table.download import DownloadPipeline
+
+__all__ = [
+    'ProductCache',
+    'get_product_cache',
+]
+
+# suffix of files that are still being written to the cache:
+partial_suffix = '.part'
+
+
+def download_from_mast(product_file_name, local_path):
+    """
+    Download a product from MAST to ``local_path``.
+    """
+    # temporarily support JWST and HST until Roman is also available:
+    if product_file_name.startswith('jw'):
+        mission = 'jwst'
+    else:
+        mission = 'hst'
+
+    status, msg, _ = MastMissions(mission=mission).download_file(
+        product_file_name, local_path=local_path, cache=False, verbose=False
+    )
+
+    if status == 'ERROR':
+        raise OSError(f"Download of `{product_file_name}` from MAST failed: {msg}")
+
+
+class ProductCache:
+    """
+    Local cache of downloaded MAST data products, with a size budget.
+
+    Products are stored by file name in ``cache_dir``. When the cache grows
+    beyond ``max_size``, the least recently used products are deleted. Each
+    product is first downloaded to a temporary file, which is only moved
+    into place once it is complete (and has the expected size, if known),
+    so interrupted downloads never leave truncated products in the cache.
+    """
+
+    def __init__(self, cache_dir=None, max_size=10 * 1024 ** 3):
+        """
+        Parameters
+        ----------
+        cache_dir : str (optional, default is `None`)
+            Directory to store products. If `None`, products are stored
+            in the ``products`` directory of the mast_aladin cache,
+            see `~astropy.config.get_cache_dir`.
+
+        max_size : int or `None` (optional, default is 10 GB)
+            The size budget of the cache in bytes, or `None` for no limit.
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(get_cache_dir('mast_aladin'), 'products')
+
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    def path(self, filename):
+        """
+        Return the path where ``filename`` is stored in the cache.
+        """
+        return os.path.join(self.cache_dir, os.path.basename(filename))
+
+    def _cached_files(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+
+        return [
+            entry for entry in os.scandir(self.cache_dir)
+            if entry.is_file() and not entry.name.endswith(partial_suffix)
+        ]
+
+    def __contains__(self, filename):
+        return os.path.isfile(self.path(filename))
+
+    def get(self, filename, expected_size=None):
+        """
+        Return the path to a cached product, or `None` if it is not cached.
+
+        Cached products with a different size than ``expected_size`` are
+        deleted. Returning a product marks it as recently used.
+        """
+        path = self.path(filename)
+
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+
+        if expected_size is not None and size != expected_size:
+            os.remove(path)
+            return None
+
+        # the modification time records when a product was last used:
+        os.utime(path)
+
+        return path
+
+    def fetch(self, filename, download=download_from_mast, expected_size=None, keep=()):
+        """
+        Return the path to a cached product, downloading it if needed.
+
+        Parameters
+        ----------
+        filename : str
+            The product file name.
+
+        download : callable (optional, default is `download_from_mast`)
+            Function called with ``filename`` and a temporary path,
+            which downloads the product to the temporary path.
+
+        expected_size : int (optional, default is `None`)
+            The product size in bytes, if known. Downloads with
+            a different size raise an `OSError`.
+
+        keep : list of str (optional, default is ``()``)
+            File names of other products that are not evicted to make room
+            for this product, like the other products of the same batch.
+
+        Returns
+        -------
+        path : str
+            The path to the product in the cache.
+        """
+        path = self.get(filename, expected_size)
+        if path is not None:
+            return path
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path(filename)
+
+        # keep the product's file extension before the partial suffix, so
+        # that downloaders see a file path rather than a directory:
+        file_descriptor, partial_path = tempfile.mkstemp(
+            prefix=os.path.basename(filename) + '.',
+            suffix=partial_suffix,
+            dir=self.cache_dir,
+        )
+        os.close(file_descriptor)
+
+        try:
+            download(filename, partial_path)
+
+            size = os.path.getsize(partial_path)
+            if expected_size is not None and size != expected_size:
+                raise OSError(
+                    f"Downloaded {size} bytes for `{filename}`, "
+                    f"but expected {expected_size} bytes."
+                )
+
+            os.replace(partial_path, path)
+
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+        self.evict(keep=[path] + [self.path(name) for name in keep])
+
+        return path
+
+    def evict(self, keep=()):
+        """
+        Delete the least recently used products until the cache fits in
+        ``max_size``, never deleting the paths in ``keep``.
+        """
+        if self.max_size is None:
+            return
+
+        with self._lock:
+            entries = sorted(self._cached_files(), key=lambda entry: entry.stat().st_mtime)
+            total_size = sum(entry.stat().st_size for entry in entries)
+
+            for entry in entries:
+                if total_size <= self.max_size:
+                    break
+
+                if entry.path in keep:
+                    continue
+
+                size = entry.stat().st_size
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    # deleted by another thread or process:
+                    pass
+
+                total_size -= size
+
+    def info(self):
+        """
+        Return a table of the cached products, with
+        the least recently used product first.
+
+        Returns
+        -------
+        products : `~astropy.table.Table`
+            Table with the ``filename``, ``size`` in bytes and the
+            ``last_used`` time of each product. The total size and the
+            size budget are stored in the table ``meta``.
+        """
+        entries = sorted(self._cached_files(), key=lambda entry: entry.stat().st_mtime)
+        sizes = np.array([entry.stat().st_size for entry in entries], dtype=np.int64)
+
+        return Table(
+            {
+                'filename': np.array([entry.name for entry in entries], dtype=str),
+                'size': sizes,
+                'last_used': Time(
+                    [entry.stat().st_mtime for entry in entries], format='unix'
+                ),
+            },
+            meta={'total_size': int(sizes.sum()), 'max_size': self.max_size},
+        )
+
+    def prewarm(self, filenames, download=download_from_mast, sizes=None, max_workers=4):
+        """
+        Download products into the cache concurrently, before they are used.
+
+        Parameters
+        ----------
+        filenames : list of str
+            The product file names.
+
+        download : callable (optional, default is `download_from_mast`)
+            Function called with a file name and a temporary path, see `fetch`.
+
+        sizes : list of int (optional, default is `None`)
+            The expected size of each product in bytes.
+
+        max_workers : int (optional, default is 4)
+            The largest number of concurrent downloads.
+
+        Returns
+        -------
+        paths : list of str
+            The paths to the cached products that were downloaded successfully.
+        """
+        expected_sizes = dict(zip(filenames, sizes)) if sizes is not None else dict()
+
+        # products of this batch don't evict each other:
+        pipeline = DownloadPipeline(
+            filenames,
+            download=lambda filename: self.fetch(
+                filename, download, expected_sizes.get(filename), keep=filenames
+            ),
+            max_workers=max_workers,
+        )
+
+        return list(pipeline)
+
+    def purge(self, filenames=None):
+        """
+        Delete products from the cache, or all products if ``filenames`` is `None`.
+        Partial downloads are also deleted when purging all products.
+        """
+        if filenames is None:
+            if os.path.isdir(self.cache_dir):
+                for entry in os.scandir(self.cache_dir):
+                    if entry.is_file():
+                        os.remove(entry.path)
+            return
+
+        for filename in filenames:
+            if filename in self:
+                os.remove(self.path(filename))
+
+
+# products downloaded by the table widgets are
+# stored in this cache, which is created on first use:
+_product_cache = None
+
+
+def get_product_cache():
+    """
+    Return the product cache that is shared by the table widgets.
+    Set its ``cache_dir`` or ``max_size`` to configure the cache.
+    """
+    global _product_cache
+
+    if _product_cache is None:
+        _product_cache = ProductCache()
+
+    return _product_cache
@@ -0,0 +1,145 @@
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+__all__ = [
+    'DownloadPipeline',
+]
+
+
+class DownloadPipeline:
+    """
+    Download files concurrently with a bounded thread pool, yielding
+    each local file path as soon as its download completes.
+
+    Iterating over the pipeline starts the downloads, so that files can be
+    loaded into a viewer while the remaining files are still downloading::
+
+        pipeline = DownloadPipeline(filenames, download=_download_from_mast)
+        for path in pipeline:
+            viewer.load_data(path)
+
+    Each file's status is one of ``'queued'``, ``'downloading'``,
+    ``'done'``, ``'error'`` or ``'cancelled'``.
+    """
+
+    def __init__(self, filenames, download, max_workers=4, progress_callback=None):
+        """
+        Parameters
+        ----------
+        filenames : list of str
+            Names of the files to download.
+
+        download : callable
+            Function that downloads one file, given its name, and
+            returns the path to the local file.
+
+        max_workers : int (optional, default is 4)
+            The largest number of concurrent downloads.
+
+        progress_callback : callable (optional, default is `None`)
+            Called with the pipeline as its only argument each time a
+            download finishes, fails or is cancelled. It is always called
+            from the thread iterating over the pipeline, so calls never
+            overlap, and widget state can be updated from the callback.
+        """
+        self.filenames = list(dict.fromkeys(filenames))
+        self.download = download
+        self.max_workers = max_workers
+        self.progress_callback = progress_callback
+
+        self.status = {filename: 'queued' for filename in self.filenames}
+        self.errors = dict()
+
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def n_done(self):
+        """
+        Number of files that are no longer queued or downloading.
+        """
+        return sum(
+            status not in ('queued', 'downloading') for status in self.status.values()
+        )
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """
+        Cancel the downloads. Queued downloads are not started, and files
+        that are still downloading are not yielded once they complete.
+        This can be called from any thread, or from the loop body.
+        """
+        self._cancelled.set()
+
+    def _set_status(self, filename, status, notify=True):
+        with self._lock:
+            self.status[filename] = status
+
+        if notify and self.progress_callback is not None:
+            self.progress_callback(self)
+
+    def _download(self, filename):
+        with self._lock:
+            if self.cancelled:
+                return None
+            self.status[filename] = 'downloading'
+
+        return self.download(filename)
+
+    def __iter__(self):
+        if not len(self.filenames):
+            return
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {
+            executor.submit(self._download, filename): filename
+            for filename in self.filenames
+        }
+
+        try:
+            for future in as_completed(futures):
+                filename = futures[future]
+
+                if self.cancelled:
+                    break
+
+                try:
+                    path = future.result()
+                except Exception as err:
+                    self.errors[filename] = err
+                    self._set_status(filename, 'error')
+                    continue
+
+                self._set_status(filename, 'done')
+                yield path
+
+        finally:
+            # if the loop ends early, stop queued downloads and don't wait
+            # for the running downloads to finish. Downloads that completed
+            # without being yielded are cancelled too:
+            with self._lock:
+                cancelled = [
+                    filename for filename, status in self.status.items()
+                    if status in ('queued', 'downloading')
+                ]
+                if len(cancelled):
+                    self._cancelled.set()
+                for filename in cancelled:
+                    self.status[filename] = 'cancelled'
+
+            for future in futures:
+                future.cancel()
+            if len(cancelled) and self.progress_callback is not None:
+                self.progress_callback(self)
+
+            executor.shutdown(wait=False)
+
+        if len(self.errors):
+            warnings.warn(
+                f"{len(self.errors)} of {len(self.filenames)} downloads failed: "
+                f"{list(self.errors)}", UserWarning
+            )
@@ -1,8 +1,9 @@
 
-import os
-import warnings
+import threading
+import weakref
+from itertools import combinations
 
-from traitlets import List, Unicode, Bool, Int, Any, observe
+from traitlets import List, Dict, Unicode, Bool, Int, Any, Bunch, observe
 from ipypopout import PopoutButton
 from ipyvuetify import VuetifyTemplate
 from ipywidgets.widgets import widget_serialization
@@ -10,10 +11,16 @@ from ipywidgets.widgets import widget_serialization
 import numpy as np
 import astropy.units as u
 from astropy.coordinates import SkyCoord
-from astropy.table import Table
+from astropy.table import Table, vstack
 
+from mast_aladin.overlay.spatial_index import SpatialIndex
 from mast_aladin.table import validate
-from astroquery.mast import MastMissions
+from mast_aladin.table.cache import get_product_cache
+from mast_aladin.table.download import DownloadPipeline
+from mast_aladin.table.query import TableQuery
+from mast_aladin.table.serialize import (
+    rows_from_columns, serialize_buffers, serialize_columns
+)
 
 __all__ = [
     'MastTable',
@@ -24,19 +31,6 @@ __all__ = [
 _table_widgets = dict()
 
 
-def serialize(table):
-    """
-    Convert an astropy table to a list of dictionaries
-    containing each column as a list of pure Python objects.
-    """
-    return [
-        {
-            k: v.tolist()
-            for k, v in dict(row).items()
-        } for row in table
-    ]
-
-
 known_unique_mast_table_cols = [
     'fileSetName',  # data products from Missions Mast
     'source_id',    # Gaia
@@ -45,6 +39,118 @@ known_unique_mast_table_cols = [
 ]
 
 
+# names of the key added to each row sent to the front end, when
+# `item_key` is not a single table column:
+composite_item_key = '_item_key'
+row_index_item_key = '_row_index'
+
+# detected key columns for each table, keyed on `id(table)`:
+_key_columns_cache = dict()
+
+
+def _has_unique_values(columns, chunk_size=65536):
+    """
+    Check whether rows of ``columns`` have unique (combined) values in one
+    hashed pass, returning `False` as soon as a repeated value is found.
+    """
+    seen = set()
+
+    for start in range(0, len(columns[0]), chunk_size):
+        chunks = [column[start:start + chunk_size].tolist() for column in columns]
+        values = chunks[0] if len(chunks) == 1 else list(zip(*chunks))
+
+        n_seen = len(seen)
+        seen.update(values)
+        if len(seen) != n_seen + len(values):
+            return False
+
+    return True
+
+
+def _escape_key(column):
+    """
+    Return the values of a key column as strings, with backslashes and
+    the '|' that separates the values of composite keys escaped.
+    """
+    strings = np.asarray(column).astype(str)
+
+    return np.char.replace(np.char.replace(strings, '\\', '\\\\'), '|', '\\|')
+
+
+def find_key_columns(table, n_rows_slow=10_000_000, max_key_columns=2):
+    """
+    Find table columns whose values, alone or combined, are unique in each row.
+
+    First look for a column known to be unique in MAST query results. Otherwise
+    check each column for unique values, and then combinations of up to
+    ``max_key_columns`` columns. Each check is a single hashed pass over the
+    rows, which stops at the first repeated value. Results are cached per table,
+    until the table changes length or its columns are replaced.
+
+    Parameters
+    ----------
+    table : `~astropy.table.Table`
+        The table to search.
+
+    n_rows_slow : int (optional, default is 10,000,000)
+        Tables with more rows than ``n_rows_slow`` and no known unique
+        columns are not searched.
+
+    max_key_columns : int (optional, default is 2)
+        The largest number of columns to combine into a key.
+
+    Returns
+    -------
+    key_columns : tuple of str
+        The names of the key columns, or an empty tuple if
+        no unique columns or combinations were found.
+    """
+    cache_key = id(table)
+    signature = (tuple(map(id, table.columns.values())), len(table))
+    cached = _key_columns_cache.get(cache_key)
+
+    if cached is not None and cached[0]() is table and cached[1] == signature:
+        return cached[2]
+
+    key_columns = ()
+    known_columns = [
+        column for column in known_unique_mast_table_cols if column in table.colnames
+    ]
+
+    if len(known_columns):
+        key_columns = (known_columns[0],)
+
+    elif 0 < len(table) <= n_rows_slow:
+        # columns with masked values or multidimensional cells can't be keys:
+        candidates = [
+            name for name in table.colnames
+            if table[name].ndim == 1 and not np.any(getattr(table[name], 'mask', False))
+        ]
+        arrays = {name: np.asarray(table[name]) for name in candidates}
+
+        # nor can columns with NaNs, which are never equal to each other
+        # when hashed, so that repeated NaNs would look unique:
+        candidates = [
+            name for name in candidates
+            if arrays[name].dtype.kind not in 'fc' or not np.isnan(arrays[name]).any()
+        ]
+
+        for n_columns in range(1, max_key_columns + 1):
+            for names in combinations(candidates, n_columns):
+                if _has_unique_values([arrays[name] for name in names]):
+                    key_columns = names
+                    break
+            if len(key_columns):
+                break
+
+    def remove_from_cache(ref):
+        _key_columns_cache.pop(cache_key, None)
+
+    _key_columns_cache[cache_key] = (weakref.ref(table, remove_from_cache), signature, key_columns)
+
+    return key_columns
+
+
 class MastTable(VuetifyTemplate):
     """
     Table widget for observation queries from Mission MAST.
@@ -56,7 +162,8 @@ class MastTable(VuetifyTemplate):
     headers_avail = List().tag(sync=True)
     show_if_empty = Bool(True).tag(sync=True)
     show_rowselect = Bool(True).tag(sync=True)
-    selected_rows = List().tag(sync=True)
+    # `item_key` values of the selected rows:
+    selected_keys = List().tag(sync=True)
     column_descriptions = List().tag(sync=True)
     multiselect = Bool(True).tag(sync=True)
     items_per_page = Int(5).tag(sync=True)
@@ -67,13 +174,65 @@ class MastTable(VuetifyTemplate):
     enable_load_in_app = Bool(False).tag(sync=True)
     mission = Unicode().tag(sync=True)
 
+    # in windowed mode, only the rows on the current page are synced
+    # to the front end, and paging/sorting/searching happen in Python:
+    windowed = Bool(False).tag(sync=True)
+    page = Int(1).tag(sync=True)
+    sort_by = List().tag(sync=True)
+    sort_desc = List().tag(sync=True)
+    search = Unicode().tag(sync=True)
+
+    # column names mapped to filter expressions, which are
+    # applied in windowed mode, see `~mast_aladin.table.query.filter_mask`:
+    filters = Dict().tag(sync=True)
+
+    # total number of rows after filtering in windowed mode, or -1
+    # when all rows are synced to the front end:
+    server_items_length = Int(-1).tag(sync=True)
+
+    # with binary_transport, rows are sent as `column_data` instead of
+    # `items`, and numeric columns are sent as binary buffers:
+    binary_transport = Bool(False).tag(sync=True)
+    column_data = Dict().tag(sync=True)
+
+    # number of finished and total product downloads, while
+    # selected rows are opened in an app:
+    download_progress = Dict().tag(sync=True)
+
     # item_key is a column of the table with unique values
-    # for each row, enabling selection of the row by lookup
+    # for each row, enabling selection of the row by lookup.
+    # If no column is unique on its own, it is the name of a key
+    # that is added to each row sent to the front end:
     item_key = Unicode().tag(sync=True)
 
     table = None
     row_select_callbacks = []
 
+    # True after incremental row updates, which are sent to
+    # existing views only and not stored in the synced state:
+    _rows_modified = False
+
+    # table columns that make up the `item_key`, and synthetic
+    # row keys used when no combination of columns is unique:
+    _key_columns = ()
+    _row_keys = None
+
+    # `item_key` values mapped to their row index in the table,
+    # which is built on first use:
+    _key_index = None
+
+    # sort and filter engine for windowed mode, created on first use:
+    _query = None
+
+    # HEALPix index of the row positions, created on first use:
+    _spatial_index = None
+
+    # the largest number of concurrent product downloads, and
+    # the downloads for the last "open selected rows" action:
+    max_download_workers = 4
+    download_pipeline = None
+    download_thread = None
+
     def __init__(self, table, app=None, update_viewport=True, unique_column=None, **kwargs):
         """
         Parameters
@@ -89,16 +248,24 @@ class MastTable(VuetifyTemplate):
             viewport center to the position of the item in the
             first row of the table on load.
 
-        unique_column : str (optional, default is `None`)
-            A column which contains unique values in each row.
+        unique_column : str or list of str (optional, default is `None`)
+            A column which contains unique values in each row, or a list
+            of columns whose combined values are unique in each row.
 
             If no `unique_column` is given, ``MastTable`` will look for a
             column known to have unique values for each row in common MAST
             observation queries. If no known `unique_column` is found,
-            search through the table to find a column with unique rows.
-
-            For tables with many rows, unique column searches are inefficient
-            and a warning will be raised..
+            search through the table to find a column (or pair of columns)
+            with unique rows, see `find_key_columns`. If none are found, or
+            the table is too large to search, rows are keyed by their index.
+
+        **kwargs
+            Initial values for the widget traits. For example, pass
+            ``windowed=True`` to only sync the rows on the current page
+            to the front end, which is recommended for large tables.
+            Pass ``binary_transport=True`` to send numeric columns to the
+            front end as binary buffers rather than JSON, which is faster
+            for wide, float-heavy tables. In that case, `items` is empty.
         """
 
         super().__init__(**kwargs)
@@ -107,10 +274,9 @@ class MastTable(VuetifyTemplate):
         self.table = table
         self.app = app
 
-        self.items = serialize(table)
-        self.mission = validate.detect_mission_or_products(table)
+        self.mission = validate.detect_mission_or_products(table) or ''
         columns = table.colnames
-        self.column_descriptions = validate.get_column_descriptions(self.mission)
+        self.column_descriptions = validate.get_column_descriptions(self.mission, columns)
 
         self._set_item_key(columns, unique_column)
 
@@ -123,6 +289,8 @@ class MastTable(VuetifyTemplate):
 
         self.headers_visible = columns
 
+        self._update_items()
+
         _table_widgets[len(_table_widgets)] = self
 
         if update_viewport and self.app is not None:
@@ -140,66 +308,480 @@ class MastTable(VuetifyTemplate):
             # change the coordinate frame to match the coordinates in the MAST table:
             self.app.target = f"{center_coord.ra.degree} {center_coord.dec.degree}"
 
-    def _set_item_key(self, table_columns, item_key, n_rows_slow=10e6):
+    def _set_item_key(self, table_columns, item_key, n_rows_slow=10_000_000):
         """
         `item_key` should be set to the name of a table column that contains
         unique values in each row, which can be used for selection.
 
-        If no `unique_column` is given at construction, look for a column known to have
-        unique values for each row in MAST catalog and observation queries. If no known
-        columns are found, search through the table to find a column with unique rows.
-
-        Unique row searches are inefficient for tables with more than `n_rows_slow` rows,
-        and a warning will be raised. The default `n_rows_slow = 10e6` takes about 100
-        milliseconds per table column.
+        If no `unique_column` is given at construction, find key columns with
+        `find_key_columns`. Tables with more than `n_rows_slow` rows are not
+        searched. If the key spans several columns, `item_key` is set to
+        ``composite_item_key``. If no key columns are found, rows are given
+        a synthetic key ``row_index_item_key`` from their initial index.
         """
         if item_key is None:
-            # check for known unique columns:
-            for column in known_unique_mast_table_cols:
-                if column in table_columns:
-                    self.item_key = column
-                    break
+            key_columns = find_key_columns(self.table, n_rows_slow=n_rows_slow)
+        else:
+            key_columns = (item_key,) if isinstance(item_key, str) else tuple(item_key)
 
-            # warn the user if unique row search will be inefficient:
-            if len(self.table) > n_rows_slow:
-                warnings.warn(
-                    "No `unique_column` was given, so all columns will be checked "
-                    f"for unique entries. This table has {len(self.table)} rows, so "
-                    "the search for unique rows may be slow. To avoid this in the future,"
-                    "use the `unique_column` keyword argument when calling "
-                    "`MastAladin.load_table`.", UserWarning
+            missing = [column for column in key_columns if column not in table_columns]
+            if len(missing) or not len(key_columns):
+                raise ValueError(
+                    f"item_key '{item_key}' not found in table columns: {table_columns}"
                 )
 
-            # search for columns with unique rows:
-            for column in table_columns:
-                n_unique_values = np.unique(self.table[column]).size
-                if n_unique_values == len(self.table):
-                    self.item_key = column
-                    break
+        self._key_columns = key_columns
+        self._row_keys = None
+
+        if len(key_columns) == 1:
+            self.item_key = key_columns[0]
+        elif len(key_columns) > 1:
+            self.item_key = composite_item_key
+        else:
+            self.item_key = row_index_item_key
+            self._row_keys = np.arange(len(self.table))
+
+    def _keys_of(self, table):
+        """
+        Return the `item_key` values of the rows in ``table``.
+        """
+        if len(self._key_columns) == 1:
+            return np.asarray(table[self._key_columns[0]])
+
+        if len(self._key_columns) > 1:
+            # values are joined by '|', which is escaped within the values,
+            # so that different rows can't have the same key:
+            keys = _escape_key(table[self._key_columns[0]])
+            for name in self._key_columns[1:]:
+                keys = np.char.add(np.char.add(keys, '|'), _escape_key(table[name]))
+            return keys
+
+        # synthetic keys are only known for rows sent to the front end:
+        return np.asarray(table[row_index_item_key])
+
+    def _item_keys(self):
+        """
+        Return the `item_key` values of every row in ``self.table``.
+        """
+        if self._row_keys is not None:
+            return self._row_keys
+
+        return self._keys_of(self.table)
+
+    def _serialize_rows(self, indices=None):
+        """
+        Serialize the rows of ``self.table`` at ``indices`` (or all rows)
+        to a list of row dictionaries, including the `item_key`.
+        """
+        table = self.table if indices is None else self.table[indices]
+        columns = serialize_columns(table)
+
+        if self.item_key not in columns:
+            keys = self._item_keys()
+            columns[self.item_key] = (keys if indices is None else keys[indices]).tolist()
+
+        return rows_from_columns(columns)
+
+    def _serialize_buffers(self, indices=None):
+        """
+        Serialize the rows of ``self.table`` at ``indices`` (or all rows)
+        to columns with binary buffers, including the `item_key`.
+        """
+        table = self.table if indices is None else self.table[indices]
+        columns = serialize_buffers(table)
+
+        if self.item_key not in columns:
+            keys = self._item_keys()
+            columns[self.item_key] = {
+                'values': (keys if indices is None else keys[indices]).tolist()
+            }
+
+        return columns
+
+    @property
+    def query(self):
+        """
+        `~mast_aladin.table.query.TableQuery` for sorting, filtering and
+        paging through the rows of the table in Python.
+        """
+        if self._query is None or self._query.table is not self.table:
+            self._query = TableQuery(self.table)
+
+        return self._query
+
+    @property
+    def spatial_index(self):
+        """
+        `~mast_aladin.overlay.spatial_index.SpatialIndex` of the row
+        positions, from the ``ra`` and ``dec`` or ``targ_ra`` and
+        ``targ_dec`` columns, for finding the rows near a position.
+        """
+        if self._spatial_index is None or self._spatial_index_table is not self.table:
+            self._spatial_index = SpatialIndex.from_table(self.table)
+            self._spatial_index_table = self.table
+
+        return self._spatial_index
+
+    def _window_indices(self):
+        """
+        Return the indices of the rows in ``self.table`` on the current page,
+        and the number of rows that match the current `filters` and `search`.
+        """
+        return self.query.window(
+            page=self.page,
+            items_per_page=self.items_per_page,
+            sort_by=self.sort_by,
+            sort_desc=self.sort_desc,
+            filters=self.filters,
+            search=self.search,
+            search_columns=self.headers_visible,
+        )
+
+    def _update_items(self):
+        """
+        Sync the table rows to the front end. In windowed mode,
+        only the rows on the current page are sent.
+        """
+        if self.windowed:
+            rows, n_rows = self._window_indices()
+        else:
+            rows, n_rows = None, -1
+
+        with self.hold_sync():
+            if self.binary_transport:
+                self.items = []
+                self.column_data = self._serialize_buffers(rows)
             else:
+                self.items = self._serialize_rows(rows)
+                self.column_data = {}
+
+            self.server_items_length = n_rows
+
+    @observe(
+        'windowed', 'binary_transport', 'page', 'items_per_page',
+        'sort_by', 'sort_desc', 'search', 'filters'
+    )
+    def _on_window_update(self, msg={}):
+        if self.table is None:
+            # traits can be set before the table is loaded on init
+            return
+
+        if msg.get('name') in ('windowed', 'binary_transport') or self.windowed:
+            self._update_items()
+
+    def _row_indices(self, keys):
+        """
+        Return the indices of the rows in ``self.table`` with
+        `item_key` values in ``keys``, in the order of ``keys``.
+        """
+        if self._key_index is None:
+            self._key_index = dict(zip(self._item_keys().tolist(), range(len(self.table))))
+
+        keys = np.asarray(keys).tolist()
+        try:
+            return np.fromiter(
+                (self._key_index[key] for key in keys), dtype=int, count=len(keys)
+            )
+        except KeyError:
+            missing = [key for key in keys if key not in self._key_index]
+            raise ValueError(
+                f"No rows found with {self.item_key} values: {missing}"
+            )
+
+    def _send_row_update(self, method, *args):
+        """
+        Send only the changed rows to the front end. In windowed mode,
+        re-sync the current page instead.
+        """
+        if self.windowed:
+            self._update_items()
+        else:
+            self.send({'method': method, 'args': list(args)})
+            self._rows_modified = True
+
+    def append_rows(self, rows):
+        """
+        Append rows to the table, sending only the new rows to the front end.
+
+        Parameters
+        ----------
+        rows : `~astropy.table.Table`, list of dict, or dict of lists
+            The rows to append. They must have the same columns as
+            ``self.table``, and new values in the `item_key` column(s).
+        """
+        rows = rows if isinstance(rows, Table) else Table(rows)
+        rows = rows[self.table.colnames]
+        n_rows = len(self.table)
+
+        if self._row_keys is not None:
+            next_key = self._row_keys.max() + 1 if len(self._row_keys) else 0
+            new_keys = np.arange(next_key, next_key + len(rows))
+        else:
+            new_keys = self._keys_of(rows)
+
+            # build the key index if needed:
+            self._row_indices([])
+
+            if (
+                np.unique(new_keys).size != len(new_keys) or
+                any(key in self._key_index for key in new_keys.tolist())
+            ):
                 raise ValueError(
-                    "No `unique_column` specified, and no unique columns were found."
+                    f"Appended rows must have unique values for the `{self.item_key}` key."
                 )
 
-        elif item_key in table_columns:
-            self.item_key = item_key
+        self.table = vstack([self.table, rows], join_type='exact')
+
+        if self._row_keys is not None:
+            self._row_keys = np.concatenate([self._row_keys, new_keys])
+
+        if self._key_index is not None:
+            self._key_index.update(zip(new_keys.tolist(), range(n_rows, len(self.table))))
+
+        new_items = self._serialize_rows(np.arange(n_rows, len(self.table)))
+        if not self.binary_transport and not self.windowed:
+            self.items.extend(new_items)
+
+        self._send_row_update('append_rows', new_items)
+
+    def update_rows(self, rows):
+        """
+        Replace the values in existing rows, matched by their
+        `item_key`, sending only the changed rows to the front end.
+
+        Parameters
+        ----------
+        rows : `~astropy.table.Table`, list of dict, or dict of lists
+            The updated rows. They must contain the `item_key` column(s),
+            and may contain any subset of the other columns.
+        """
+        rows = rows if isinstance(rows, Table) else Table(rows)
+        indices = self._row_indices(self._keys_of(rows))
+
+        updated_columns = [
+            name for name in rows.colnames
+            if name in self.table.colnames and name not in self._key_columns
+        ]
+        for name in updated_columns:
+            column = self.table[name]
+            new_values = rows[name]
+
+            # fixed-width string columns are widened first, so that
+            # longer new values aren't truncated:
+            if column.dtype.kind in 'US' and new_values.dtype.kind in 'US':
+                dtype = np.result_type(column.dtype, new_values.dtype)
+                if dtype != column.dtype:
+                    self.table.replace_column(name, column.astype(dtype))
+
+            self.table[name][indices] = new_values
+
+        self.query.invalidate(updated_columns)
+        self._spatial_index = None
+
+        new_items = self._serialize_rows(indices)
+        if not self.binary_transport and not self.windowed:
+            for index, item in zip(indices.tolist(), new_items):
+                self.items[index] = item
+
+        self._send_row_update('update_rows', self.item_key, new_items)
+
+    def remove_rows(self, keys):
+        """
+        Remove rows by their `item_key` values, sending only the
+        keys of the removed rows to the front end.
+
+        Parameters
+        ----------
+        keys : list or array
+            `item_key` values of the rows to remove.
+        """
+        indices = self._row_indices(np.atleast_1d(keys))
+        keys = self._item_keys()[indices].tolist()
+
+        self.table.remove_rows(indices)
+
+        if self._row_keys is not None:
+            self._row_keys = np.delete(self._row_keys, indices)
+
+        # row indices after the removed rows have changed:
+        self._key_index = None
+        self.query.invalidate()
+        self._spatial_index = None
+
+        if not self.binary_transport and not self.windowed:
+            for index in sorted(indices.tolist(), reverse=True):
+                del self.items[index]
+
+        removed = set(keys)
+        if not removed.isdisjoint(self.selected_keys):
+            self.selected_keys = [key for key in self.selected_keys if key not in removed]
 
+        self._send_row_update('remove_rows', self.item_key, keys)
+
+    def vue_sync_rows(self, *args):
+        """
+        Re-sync all rows when a view is shown after incremental
+        row updates, since those only update existing views.
+        """
+        if not self._rows_modified:
+            return
+
+        if self.binary_transport:
+            self.column_data = self._serialize_buffers()
         else:
-            raise ValueError(
-                f"item_key '{item_key}' not found in table columns: {table_columns}"
-            )
+            self.send_state('items')
+
+        self._rows_modified = False
+
+    @observe('selected_keys')
+    def _on_row_selection(self, change):
+        # `selected_rows` is derived from the synced keys when it's read, and
+        # can be observed like a trait. Its observers and `row_select_callbacks`
+        # are told about each change, and the rows are only serialized for them:
+        notifiers = self._trait_notifiers.get('selected_rows', {})
+        if not any(notifiers.values()) and not self.row_select_callbacks:
+            return
+
+        msg = Bunch(
+            name='selected_rows',
+            old=self._selected_rows_of(change['old']),
+            new=self.selected_rows,
+            owner=self,
+            type='change',
+        )
+        self.notify_change(msg)
 
-    @observe('selected_rows')
-    def _on_row_selection(self, msg={}):
         for func in self.row_select_callbacks:
             func(msg)
 
+    def _selected_rows_of(self, keys):
+        try:
+            return self._serialize_rows(self._row_indices(keys))
+        except ValueError:
+            # the rows of some keys were removed, along with their selection:
+            keys = [key for key in keys if key in self._key_index]
+            return self._serialize_rows(self._row_indices(keys))
+
+    @property
+    def selected_rows(self):
+        """
+        List of the selected rows, as dictionaries of pure Python objects,
+        which can be observed with ``observe(handler, names='selected_rows')``.
+        """
+        return self._serialize_rows(self._row_indices(self.selected_keys))
+
+    @selected_rows.setter
+    def selected_rows(self, rows):
+        self.selected_keys = [row[self.item_key] for row in rows]
+
     @property
     def selected_rows_table(self):
         """
-        `~astropy.table.Table` of only the selected rows.
+        `~astropy.table.Table` of only the selected rows, sliced
+        from the original table to keep its dtypes, units and masks.
+        """
+        return self.table[self._row_indices(self.selected_keys)]
+
+    def download_selected_rows(self, download=None):
+        """
+        Download the products in the selected rows concurrently.
+
+        Parameters
+        ----------
+        download : callable (optional, default is `None`)
+            Function that downloads one product, given its file name, and
+            returns the local file path. If `None`, products are downloaded
+            from MAST to the product cache, see
+            `~mast_aladin.table.cache.get_product_cache`.
+
+        Returns
+        -------
+        pipeline : `~mast_aladin.table.download.DownloadPipeline`
+            Iterate over the pipeline to get the path to each
+            product as soon as its download completes.
+        """
+        if self.download_pipeline is not None:
+            self.download_pipeline.cancel()
+
+        selected = self.selected_rows_table
+
+        if download is None:
+            # check downloads against the product sizes from `list_products`:
+            sizes = dict()
+            if 'size' in selected.colnames:
+                sizes = {
+                    filename: int(size)
+                    for filename, size in zip(selected['filename'], selected['size'])
+                    if not np.ma.is_masked(size)
+                }
+
+            # products of this batch don't evict each other:
+            filenames = selected['filename'].tolist()
+
+            def download(filename):
+                return _download_from_mast(filename, sizes.get(filename), keep=filenames)
+
+        self.download_pipeline = DownloadPipeline(
+            selected['filename'].tolist(),
+            download=download,
+            max_workers=self.max_download_workers,
+            progress_callback=self._on_download_progress,
+        )
+        self._on_download_progress(self.download_pipeline)
+
+        return self.download_pipeline
+
+    def _on_download_progress(self, pipeline):
+        # a cancelled pipeline that winds down after a new one
+        # starts doesn't overwrite the progress of the new one:
+        if pipeline is not self.download_pipeline:
+            return
+
+        n_done = pipeline.n_done
+        n_total = len(pipeline.filenames)
+
+        if n_done == n_total:
+            self.download_progress = {}
+        else:
+            self.download_progress = {'n_done': n_done, 'n_total': n_total}
+
+    def cancel_downloads(self):
+        """
+        Cancel product downloads that have not completed.
+        """
+        if self.download_pipeline is not None:
+            self.download_pipeline.cancel()
+        self.download_progress = {}
+
+    def vue_cancel_downloads(self, *args):
+        self.cancel_downloads()
+
+    def _load_selected_rows(self, load):
+        """
+        Download the selected products in a background thread, so that the
+        comm handler that starts the downloads returns immediately, and
+        download progress reaches the front end while products download.
+
+        Parameters
+        ----------
+        load : callable
+            Called in the background thread with the
+            `~mast_aladin.table.download.DownloadPipeline`,
+            to load each product as soon as its download completes.
+
+        Returns
+        -------
+        thread : `~threading.Thread`
+            The thread running the downloads.
         """
-        return Table(self.selected_rows)
+        pipeline = self.download_selected_rows()
+
+        self.download_thread = threading.Thread(
+            target=load, args=(pipeline,), daemon=True
+        )
+        self.download_thread.start()
+
+        return self.download_thread
 
     def vue_open_selected_rows_in_jdaviz(self, *args):
         from jdaviz import Imviz
@@ -208,22 +790,27 @@ class MastTable(VuetifyTemplate):
         if viz is None:
             viz = Imviz()
 
-        with viz.batch_load():
-            for filename in self.selected_rows_table['filename']:
-                _download_from_mast(filename)
-                viz.load_data(filename)
+        def load(pipeline):
+            with viz.batch_load():
+                for path in pipeline:
+                    viz.load_data(path)
+
+            if pipeline.cancelled:
+                return
+
+            orientation = viz.plugins['Orientation']
+            orientation.align_by = 'WCS'
+            orientation.set_north_up_east_left()
 
-        orientation = viz.plugins['Orientation']
-        orientation.align_by = 'WCS'
-        orientation.set_north_up_east_left()
+            plot_options = viz.plugins['Plot Options']
+            if len(plot_options.layer.choices) > 1:
+                for layer in plot_options.layer.choices:
+                    plot_options.layer = layer
+                    plot_options.image_color_mode = 'Color'
 
-        plot_options = viz.plugins['Plot Options']
-        if len(plot_options.layer.choices) > 1:
-            for layer in plot_options.layer.choices:
-                plot_options.layer = layer
-                plot_options.image_color_mode = 'Color'
+                plot_options.apply_RGB_presets()
 
-            plot_options.apply_RGB_presets()
+        self._load_selected_rows(load)
 
         return viz
 
@@ -232,9 +819,11 @@ class MastTable(VuetifyTemplate):
 
         mal = gca()
 
-        for filename in self.selected_rows_table['filename']:
-            _download_from_mast(filename)
-            mal.delayed_add_fits(filename)
+        def load(pipeline):
+            for path in pipeline:
+                mal.delayed_add_fits(path)
+
+        self._load_selected_rows(load)
 
         return mal
 
@@ -244,18 +833,14 @@ class MastTable(VuetifyTemplate):
             self.enable_load_in_app = True
 
 
-def _download_from_mast(product_file_name):
-    if os.path.exists(product_file_name):
-        # support load from cache without query to MM
-        return
-
-    # temporarily support JWST and HST until Roman is also available:
-    if product_file_name.startswith('jw'):
-        mission = 'jwst'
-    else:
-        mission = 'hst'
-
-    MastMissions(mission=mission).download_file(product_file_name)
+def _download_from_mast(product_file_name, expected_size=None, keep=()):
+    """
+    Return the local path to a product, downloading it from MAST to the
+    product cache if needed, without evicting the products in ``keep``.
+    """
+    return get_product_cache().fetch(
+        product_file_name, expected_size=expected_size, keep=keep
+    )
 
 
 def get_current_table():
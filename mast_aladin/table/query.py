@@ -0,0 +1,332 @@
+import operator
+from collections import OrderedDict
+
+import numpy as np
+from astropy.table import Column
+
+__all__ = [
+    'TableQuery',
+    'filter_mask',
+]
+
+# comparison operators supported in filter expressions, with
+# two-character operators first so they match before `<` or `>`:
+filter_operators = [
+    ('>=', operator.ge),
+    ('<=', operator.le),
+    ('!=', operator.ne),
+    ('==', operator.eq),
+    ('>', operator.gt),
+    ('<', operator.lt),
+    ('=', operator.eq),
+]
+
+
+def _missing(column):
+    """
+    Return a boolean array that is `True` for the masked entries of a column.
+    """
+    mask = getattr(column, 'mask', None)
+    if mask is None or mask is np.ma.nomask:
+        return np.zeros(len(column), dtype=bool)
+
+    return np.array(np.broadcast_to(mask, column.shape), dtype=bool)
+
+
+def _string_values(column):
+    """
+    Return the values of a column as lowercase strings, or `None` if the
+    column has more than one value per row. Mixin columns, such as
+    `~astropy.time.Time` or `~astropy.coordinates.SkyCoord`, are formatted
+    the way they are shown in the table.
+    """
+    if len(column.shape) > 1:
+        return None
+
+    if isinstance(column, Column):
+        values = np.asarray(column).astype(str)
+    else:
+        values = np.array(list(column.info.iter_str_vals()), dtype=str)
+
+    return np.char.lower(values)
+
+
+def filter_mask(column, expression):
+    """
+    Evaluate a filter expression on a table column as a vectorized boolean mask.
+
+    Parameters
+    ----------
+    column : `~astropy.table.Column`
+        The column to filter.
+
+    expression : str, number, or list
+        If ``expression`` is a list, rows with values in the list are kept.
+        If it is a string starting with a comparison operator (``>``, ``>=``,
+        ``<``, ``<=``, ``==``, ``=``, or ``!=``), rows are compared to the
+        value after the operator. Otherwise, numeric columns are kept where
+        they equal ``expression``, and other columns are kept where they
+        contain ``expression`` as a substring, ignoring case.
+
+    Returns
+    -------
+    mask : `~numpy.ndarray`
+        `True` for rows that pass the filter. Masked values never pass,
+        and columns with more than one value per row never contain
+        ``expression`` as a substring.
+    """
+    values = np.asarray(column)
+    numeric = values.dtype.kind in 'iufb'
+
+    if isinstance(expression, (list, tuple)):
+        mask = np.isin(values, expression)
+
+    else:
+        compare = None
+        expression = str(expression).strip()
+
+        for symbol, function in filter_operators:
+            if expression.startswith(symbol):
+                compare = function
+                expression = expression[len(symbol):].strip()
+                break
+
+        if numeric:
+            try:
+                value = float(expression)
+            except ValueError:
+                raise ValueError(
+                    f"Cannot compare numeric column `{column.info.name}` to '{expression}'."
+                )
+            mask = (compare or operator.eq)(values, value)
+
+        elif compare is not None:
+            mask = compare(values.astype(str), expression)
+
+        else:
+            lower = _string_values(column)
+            if lower is None:
+                return np.zeros(len(column), dtype=bool)
+            mask = np.char.find(lower, expression.lower()) >= 0
+
+    if len(column.shape) == 1:
+        mask &= ~_missing(column)
+
+    return mask
+
+
+class TableQuery:
+    """
+    Sort, filter and page through the rows of a table in Python.
+
+    Sort permutations are computed once per combination of sort columns
+    and directions, and cached until the table changes. Filters are
+    vectorized boolean masks, which are applied to the cached permutation,
+    so that sorting a filtered table never needs a new sort.
+    """
+
+    def __init__(self, table, max_cached_sorts=16):
+        """
+        Parameters
+        ----------
+        table : `~astropy.table.Table`
+            The table to query.
+
+        max_cached_sorts : int (optional, default is 16)
+            The number of sort permutations to keep, dropping the
+            least recently used permutation first.
+        """
+        self.table = table
+        self.max_cached_sorts = max_cached_sorts
+        self._sorts = OrderedDict()
+        self._ranks = dict()
+
+    def invalidate(self, colnames=None):
+        """
+        Drop cached sorts that depend on ``colnames``, or all cached sorts if
+        ``colnames`` is `None`. Call this after the table values change.
+        """
+        if colnames is None:
+            self._sorts.clear()
+            self._ranks.clear()
+            return
+
+        for name in colnames:
+            self._ranks.pop(name, None)
+
+        for sort_key in list(self._sorts):
+            if any(name in colnames for name, _ in sort_key):
+                self._sorts.pop(sort_key)
+
+    def _column_ranks(self, name):
+        """
+        Return the dense rank of each value in a column, from its stable
+        ascending sort permutation, and the number of distinct values.
+        Masked entries share the rank after the last value.
+        """
+        if name not in self._ranks:
+            order = self.argsort([name])
+            n_valid = np.count_nonzero(~_missing(self.table[name]))
+            values = np.asarray(self.table[name])[order[:n_valid]]
+
+            ranks = np.empty(len(order), dtype=np.int64)
+            n_ranks = 0
+            if n_valid:
+                ranks[order[:n_valid]] = np.concatenate(
+                    [[0], np.cumsum(values[1:] != values[:-1])]
+                )
+                n_ranks = ranks[order[n_valid - 1]] + 1
+            ranks[order[n_valid:]] = n_ranks
+
+            self._ranks[name] = ranks, n_ranks
+
+        return self._ranks[name]
+
+    def _sort_key(self, name, descending):
+        """
+        Return the lexsort key of a column, which
+        keeps masked entries last in either direction.
+        """
+        ranks, n_ranks = self._column_ranks(name)
+        if descending:
+            return np.where(ranks < n_ranks, n_ranks - 1 - ranks, n_ranks)
+
+        return ranks
+
+    def argsort(self, sort_by, sort_desc=()):
+        """
+        Return the stable permutation that sorts the table rows.
+
+        Parameters
+        ----------
+        sort_by : list of str
+            Columns to sort by, in order of precedence.
+
+        sort_desc : list of bool (optional)
+            Whether to sort each column in ``sort_by`` in
+            descending order. Missing entries are ascending.
+
+        Returns
+        -------
+        order : `~numpy.ndarray`
+            Row indices in sorted order, with masked entries
+            last in both ascending and descending order.
+        """
+        sort_desc = list(sort_desc) + [False] * (len(sort_by) - len(sort_desc))
+        sort_key = tuple(zip(sort_by, map(bool, sort_desc)))
+
+        if sort_key in self._sorts:
+            self._sorts.move_to_end(sort_key)
+            return self._sorts[sort_key]
+
+        if len(sort_key) == 0:
+            order = np.arange(len(self.table))
+
+        elif sort_key == ((sort_by[0], False),):
+            # masked entries are sorted last, rather than by their fill value:
+            column = self.table[sort_by[0]]
+            missing = _missing(column)
+            valid = np.flatnonzero(~missing)
+            order = np.concatenate([
+                valid[np.argsort(np.asarray(column)[valid], kind='stable')],
+                np.flatnonzero(missing),
+            ])
+
+        else:
+            # sort on ranks, reversed for descending order, so that ties
+            # keep a stable order. lexsort's last key has precedence:
+            keys = [
+                self._sort_key(name, descending)
+                for name, descending in reversed(sort_key)
+            ]
+            order = np.lexsort(keys)
+
+        self._sorts[sort_key] = order
+        if len(self._sorts) > self.max_cached_sorts:
+            self._sorts.popitem(last=False)
+
+        return order
+
+    def rows(self, sort_by=(), sort_desc=(), filters=None, search='', search_columns=()):
+        """
+        Return the indices of the rows that pass all filters, in sorted order.
+
+        Parameters
+        ----------
+        sort_by, sort_desc : list
+            See `argsort`.
+
+        filters : dict (optional)
+            Column names mapped to filter expressions, see `filter_mask`.
+
+        search : str (optional)
+            Keep rows where any column in ``search_columns`` contains
+            ``search``, ignoring case. Masked entries and columns with
+            more than one value per row never match.
+
+        search_columns : list of str (optional)
+            Columns to search.
+
+        Returns
+        -------
+        rows : `~numpy.ndarray`
+            Row indices.
+        """
+        order = self.argsort(sort_by, sort_desc)
+
+        mask = None
+        for name, expression in (filters or {}).items():
+            column_mask = filter_mask(self.table[name], expression)
+            mask = column_mask if mask is None else (mask & column_mask)
+
+        if search:
+            search = search.lower()
+            search_mask = np.zeros(len(self.table), dtype=bool)
+            for name in search_columns:
+                values = _string_values(self.table[name])
+                if values is None:
+                    continue
+                search_mask |= (
+                    (np.char.find(values, search) >= 0) & ~_missing(self.table[name])
+                )
+            mask = search_mask if mask is None else (mask & search_mask)
+
+        if mask is None:
+            return order
+
+        return order[mask[order]]
+
+    def window(self, page=1, items_per_page=-1, **kwargs):
+        """
+        Return the indices of the rows on one page of the query result.
+
+        Parameters
+        ----------
+        page : int (optional, default is 1)
+            The page number, starting at 1. Pages beyond the last
+            page return the last page.
+
+        items_per_page : int (optional, default is -1)
+            The number of rows per page, or -1 for all rows.
+
+        **kwargs
+            Sort and filter arguments passed to `rows`.
+
+        Returns
+        -------
+        rows : `~numpy.ndarray`
+            Row indices on the page.
+
+        n_rows : int
+            The total number of rows that pass the filters.
+        """
+        rows = self.rows(**kwargs)
+        n_rows = len(rows)
+
+        if items_per_page > 0:
+            n_pages = max(int(np.ceil(n_rows / items_per_page)), 1)
+            page = min(max(page, 1), n_pages)
+            start = (page - 1) * items_per_page
+            rows = rows[start:start + items_per_page]
+
+        return rows, n_rows
@@ -0,0 +1,222 @@
+"""
+Column-oriented serialization of astropy tables for the table widget.
+
+Each column is converted to pure Python objects in a single vectorized
+NumPy pass, and rows are only assembled at the end. The performance
+target for `serialize` is at least 250,000 rows per second for a table
+with ten mixed float and string columns (the previous row-wise
+implementation managed about 30,000 rows per second on four columns).
+"""
+import numpy as np
+import astropy.units as u
+from astropy.time import Time
+
+__all__ = [
+    'column_to_buffer',
+    'column_to_list',
+    'rows_from_columns',
+    'serialize_columns',
+    'serialize',
+    'serialize_buffers',
+]
+
+# NumPy dtypes with a matching JavaScript TypedArray, which
+# can be sent to the front end as raw binary buffers:
+buffer_dtypes = [
+    'int8', 'int16', 'int32', 'int64',
+    'uint8', 'uint16', 'uint32', 'uint64',
+    'float32', 'float64',
+]
+
+
+def _column_mask(column):
+    """
+    Return a boolean array that is `True` for rows with masked values,
+    or `None` if no values in ``column`` are masked.
+    """
+    mask = getattr(column, 'mask', None)
+    if mask is None or mask is np.ma.nomask:
+        return None
+
+    mask = np.asarray(mask)
+    if mask.ndim > 1:
+        # multidimensional cells are masked if any element is masked:
+        mask = mask.reshape(len(mask), -1).any(axis=1)
+
+    if not mask.any():
+        return None
+
+    return mask
+
+
+def column_to_buffer(column):
+    """
+    Convert a numeric or boolean table column to a ``memoryview`` of its
+    little-endian data, without copying the data if it is already
+    contiguous and little-endian.
+
+    Parameters
+    ----------
+    column : `~astropy.table.Column` or `~astropy.table.MaskedColumn`
+        A one-dimensional column with a numeric or boolean dtype.
+
+    Returns
+    -------
+    column_buffer : dict or `None`
+        The ``dtype`` name, the ``buffer`` of values, and a ``mask``
+        buffer (one byte per row, or `None` if no values are masked),
+        where non-finite values are also masked.
+        `None` is returned if ``column`` cannot be sent as a buffer.
+    """
+    if not isinstance(column, np.ndarray) or isinstance(column, Time) or column.ndim != 1:
+        return None
+
+    data = np.asarray(column.value if isinstance(column, u.Quantity) else column)
+
+    if data.dtype.kind == 'b':
+        data = data.view(np.uint8)
+
+    dtype = data.dtype.newbyteorder('<')
+    if dtype.name not in buffer_dtypes:
+        return None
+
+    data = np.ascontiguousarray(data, dtype=dtype)
+    mask = _column_mask(column)
+
+    # like `column_to_list`, non-finite values are sent as masked:
+    if data.dtype.kind == 'f':
+        not_finite = ~np.isfinite(data)
+        if not_finite.any():
+            mask = not_finite if mask is None else (mask | not_finite)
+
+    return {
+        'dtype': 'bool' if column.dtype.kind == 'b' else dtype.name,
+        'buffer': memoryview(data),
+        'mask': None if mask is None else memoryview(mask.view(np.uint8)),
+    }
+
+
+def column_to_list(column):
+    """
+    Convert a table column to a list of pure Python objects.
+
+    Units are dropped, bytes are decoded to ``str``, and masked or
+    non-finite values become `None`, so the result can be sent to
+    the front end as JSON.
+
+    Parameters
+    ----------
+    column : `~astropy.table.Column`, `~astropy.table.MaskedColumn` or mixin column
+        The column to convert.
+
+    Returns
+    -------
+    values : list
+        One entry per row of ``column``.
+    """
+    if isinstance(column, Time):
+        data = np.asarray(column.isot)
+    elif isinstance(column, u.Quantity):
+        data = column.value
+    elif isinstance(column, np.ndarray):
+        data = np.asarray(column)
+    else:
+        # other mixin columns (e.g. SkyCoord) fall back on their
+        # string representation:
+        return [str(value) for value in column]
+
+    mask = _column_mask(column)
+
+    if data.dtype.kind == 'S':
+        data = np.char.decode(data, 'utf-8')
+
+    elif data.dtype.kind in 'fc':
+        not_finite = ~np.isfinite(data)
+        if not_finite.ndim > 1:
+            not_finite = not_finite.reshape(len(not_finite), -1).any(axis=1)
+        if not_finite.any():
+            mask = not_finite if mask is None else (mask | not_finite)
+
+    values = data.tolist()
+
+    if mask is not None:
+        for index in np.flatnonzero(mask).tolist():
+            values[index] = None
+
+    return values
+
+
+def serialize_columns(table, colnames=None):
+    """
+    Convert an astropy table to a dictionary of lists of
+    pure Python objects, one list per column.
+
+    Parameters
+    ----------
+    table : `~astropy.table.Table`
+        The table to convert.
+
+    colnames : list of str (optional, default is `None`)
+        Columns to convert. If `None`, convert all columns.
+
+    Returns
+    -------
+    columns : dict
+        Column names mapped to lists of values.
+    """
+    if colnames is None:
+        colnames = table.colnames
+
+    return {name: column_to_list(table[name]) for name in colnames}
+
+
+def rows_from_columns(columns):
+    """
+    Assemble a list of row dictionaries from a dictionary
+    of column names mapped to lists of values.
+    """
+    names = list(columns)
+
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+
+def serialize(table):
+    """
+    Convert an astropy table to a list of dictionaries
+    containing each column as a list of pure Python objects.
+    """
+    return rows_from_columns(serialize_columns(table))
+
+
+def serialize_buffers(table):
+    """
+    Convert an astropy table to a dictionary of columns, where
+    numeric columns are sent to the front end as binary buffers
+    and all other columns are lists of pure Python objects.
+
+    The ``memoryview`` objects in the result are extracted by
+    ipywidgets and sent as binary buffers alongside the JSON message,
+    avoiding the cost of text-encoding every number.
+
+    Parameters
+    ----------
+    table : `~astropy.table.Table`
+        The table to convert.
+
+    Returns
+    -------
+    columns : dict
+        Column names mapped to a dictionary with either a ``values`` list,
+        or the ``dtype``, ``buffer`` and ``mask`` from `column_to_buffer`.
+    """
+    columns = dict()
+
+    for name in table.colnames:
+        column_buffer = column_to_buffer(table[name])
+
+        if column_buffer is None:
+            columns[name] = {'values': column_to_list(table[name])}
+        else:
+            columns[name] = column_buffer
+
+    return columns
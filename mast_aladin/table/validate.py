@@ -1,6 +1,7 @@
 import json
 import os
 from collections import defaultdict
+from functools import cached_property
 
 
 # locations for metadata from MissionMAST:
@@ -150,22 +151,169 @@ def update_mast_column_lists(update_column_descriptions=True, update_unique_colu
                 sort_keys=True
             )
 
+    # reload the metadata from the updated files on next use:
+    global _mission_metadata
+    _mission_metadata = None
+
     return unique_columns, column_descriptions
 
 
+class MissionMetadata:
+    """
+    Metadata about the columns in results from ``astroquery.mast.MastMissions``
+    queries for each mission, loaded lazily from the JSON files in
+    ``table/data`` the first time it is needed.
+    """
+
+    def __init__(
+        self,
+        unique_column_path=unique_column_path,
+        column_descriptions_path=column_descriptions_path
+    ):
+        self.unique_column_path = unique_column_path
+        self.column_descriptions_path = column_descriptions_path
+
+    @staticmethod
+    def _load_json(path):
+        with open(path, 'r') as json_file:
+            return json.load(json_file)
+
+    @cached_property
+    def missions(self):
+        """
+        Missions (and ``list_products``) in order of detection priority.
+        """
+        return missions + ['list_products']
+
+    @cached_property
+    def column_index(self):
+        """
+        Column names mapped to the missions where they are unique.
+        """
+        unique_columns = self._load_json(self.unique_column_path)
+        index = defaultdict(list)
+
+        for mission in self.missions:
+            for name in unique_columns.get(mission, []):
+                index[name].append(mission)
+
+        return dict(index)
+
+    @cached_property
+    def column_descriptions(self):
+        """
+        Mission names mapped to dictionaries of column
+        names and their descriptions.
+        """
+        return {
+            mission: {entry['name']: entry for entry in entries}
+            for mission, entries in self._load_json(self.column_descriptions_path).items()
+        }
+
+    def scores(self, colnames):
+        """
+        Score how well each mission matches a list of column names.
+
+        Parameters
+        ----------
+        colnames : list of str
+            Column names of a query result.
+
+        Returns
+        -------
+        scores : dict
+            Missions mapped to the fraction of columns unique to any
+            mission that are unique to that mission. Missions with no
+            matching columns are not included.
+        """
+        matches = defaultdict(int)
+        n_matched = 0
+
+        for name in colnames:
+            matched_missions = self.column_index.get(name, ())
+            n_matched += bool(matched_missions)
+            for mission in matched_missions:
+                matches[mission] += 1
+
+        return {mission: count / n_matched for mission, count in matches.items()}
+
+    def detect(self, colnames):
+        """
+        Return the mission with the highest score for ``colnames``,
+        or `None` if no mission matches. Ties go to the mission
+        listed first in ``missions``.
+        """
+        scores = self.scores(colnames)
+
+        if not len(scores):
+            return None
+
+        return max(self.missions, key=lambda mission: scores.get(mission, 0))
+
+    def descriptions(self, mission, colnames=None):
+        """
+        Return column descriptions for a mission.
+
+        Parameters
+        ----------
+        mission : str
+            The mission name.
+
+        colnames : list of str (optional, default is `None`)
+            If given, return descriptions for only these columns, in this
+            order. Columns without a known description get an empty one.
+
+        Returns
+        -------
+        descriptions : list of dict
+            Dictionaries with the ``name`` and ``description`` of each column.
+        """
+        mission_descriptions = self.column_descriptions.get(mission, {})
+
+        if colnames is None:
+            return list(mission_descriptions.values())
+
+        return [
+            mission_descriptions.get(name, {'name': name, 'description': ''})
+            for name in colnames
+        ]
+
+
+# the process-wide metadata, see `get_mission_metadata`:
+_mission_metadata = None
+
+
+def get_mission_metadata():
+    """
+    Return the process-wide `MissionMetadata`, creating it on first use.
+    """
+    global _mission_metadata
+
+    if _mission_metadata is None:
+        _mission_metadata = MissionMetadata()
+
+    return _mission_metadata
+
+
 def detect_mission_or_products(table):
     """
     Detect which mission was queried by the results from an astroquery.mast.missions
     query by looking for unique columns in the `astropy.table.Table`.
     """
-    unique_columns = json.load(open(unique_column_path, 'r'))
-    columns = table.colnames
+    return get_mission_metadata().detect(table.colnames)
 
-    for mission in missions + ['list_products']:
-        if any(name in unique_columns[mission] for name in columns):
-            return mission
+
+def mission_scores(table):
+    """
+    Score how well each mission matches the columns of a query result,
+    see `MissionMetadata.scores`.
+    """
+    return get_mission_metadata().scores(table.colnames)
 
 
-def get_column_descriptions(mission):
-    column_descriptions = json.load(open(column_descriptions_path, 'r'))
-    return column_descriptions[mission]
+def get_column_descriptions(mission, colnames=None):
+    """
+    Return descriptions of the columns in query results for ``mission``,
+    optionally limited to ``colnames``, see `MissionMetadata.descriptions`.
+    """
+    return get_mission_metadata().descriptions(mission, colnames)
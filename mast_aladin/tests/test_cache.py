@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from mast_aladin.table.cache import ProductCache
+
+
+def write_bytes(n_bytes):
+    # stand-in for a MAST download, which writes `n_bytes` to the local path:
+    def download(filename, local_path):
+        with open(local_path, 'wb') as f:
+            f.write(b'x' * n_bytes)
+
+    return download
+
+
+def test_product_cache_fetch(tmp_path):
+    product_cache = ProductCache(tmp_path / 'products', max_size=None)
+
+    path = product_cache.fetch('a.fits', write_bytes(10), expected_size=10)
+    assert path == str(tmp_path / 'products' / 'a.fits')
+    assert 'a.fits' in product_cache
+
+    # cached products are not downloaded again:
+    def fail(filename, local_path):
+        raise AssertionError('product was downloaded again')
+
+    assert product_cache.fetch('a.fits', fail, expected_size=10) == path
+
+    # truncated downloads never reach the cache:
+    with pytest.raises(OSError, match='expected 20 bytes'):
+        product_cache.fetch('b.fits', write_bytes(10), expected_size=20)
+
+    # neither do failed downloads:
+    with pytest.raises(AssertionError):
+        product_cache.fetch('c.fits', fail)
+
+    assert os.listdir(product_cache.cache_dir) == ['a.fits']
+
+    # cached products with the wrong size are downloaded again:
+    product_cache.fetch('a.fits', write_bytes(5), expected_size=5)
+    assert os.path.getsize(path) == 5
+
+
+def test_product_cache_eviction(tmp_path):
+    product_cache = ProductCache(tmp_path, max_size=25)
+
+    for i, filename in enumerate(['a.fits', 'b.fits']):
+        path = product_cache.fetch(filename, write_bytes(10))
+        os.utime(path, (i, i))
+
+    # using a product marks it as recently used:
+    product_cache.get('a.fits')
+
+    # so the least recently used product is evicted:
+    product_cache.fetch('c.fits', write_bytes(10))
+    assert 'a.fits' in product_cache
+    assert 'b.fits' not in product_cache
+
+    info = product_cache.info()
+    assert info['filename'].tolist() == ['a.fits', 'c.fits']
+    assert info.meta['total_size'] == 20
+
+    # products larger than the budget are still kept until the next download:
+    product_cache.fetch('d.fits', write_bytes(30))
+    assert product_cache.info()['filename'].tolist() == ['d.fits']
+
+
+def test_product_cache_prewarm_purge(tmp_path):
+    product_cache = ProductCache(tmp_path)
+
+    with pytest.warns(UserWarning, match='1 of 3 downloads failed'):
+        paths = product_cache.prewarm(
+            ['a.fits', 'b.fits', 'c.fits'], write_bytes(10), sizes=[10, 10, 5]
+        )
+
+    assert sorted(os.path.basename(path) for path in paths) == ['a.fits', 'b.fits']
+
+    product_cache.purge(['a.fits'])
+    assert product_cache.info()['filename'].tolist() == ['b.fits']
+
+    product_cache.purge()
+    assert len(product_cache.info()) == 0
+
+
+def test_product_cache_batch_not_evicted(tmp_path):
+    product_cache = ProductCache(tmp_path, max_size=25)
+    product_cache.fetch('old.fits', write_bytes(10))
+
+    # products of the same batch don't evict each other, even
+    # when the batch is larger than the budget:
+    paths = product_cache.prewarm(['a.fits', 'b.fits', 'c.fits'], write_bytes(10))
+    assert len(paths) == 3
+    assert all(os.path.exists(path) for path in paths)
+    assert 'old.fits' not in product_cache
+
+    # the next download evicts the least recently used products:
+    product_cache.fetch('d.fits', write_bytes(10))
+    assert len(product_cache.info()) == 2
@@ -0,0 +1,83 @@
+from io import BytesIO
+from unittest.mock import Mock
+
+import numpy as np
+from astropy.table import Table
+from ipyaladin import Aladin
+
+from mast_aladin import MastAladin
+from mast_aladin.overlay.clustering import Clustering
+from mast_aladin.overlay.spatial_index import SpatialIndex
+
+
+def test_clustering():
+    rng = np.random.default_rng(0)
+    lon = 10 + rng.uniform(-1, 1, 1000)
+    lat = 20 + rng.uniform(-1, 1, 1000)
+    clustering = Clustering(SpatialIndex(lon, lat), pixels=500)
+
+    # zoomed out, the sources are drawn as a few clusters:
+    key, clusters = clustering.for_fov(60)
+    assert key[0] == "clusters"
+    assert 0 < len(clusters) < 10
+    assert clusters.count.sum() == 1000
+    assert np.allclose(
+        np.average(clusters.lon, weights=clusters.count), lon.mean(), atol=0.01
+    )
+
+    # clusters are computed once for each order:
+    assert clustering.clusters(key[1]) is clusters
+
+    # finer orders have more, smaller clusters:
+    assert len(clustering.for_fov(10)[1]) > len(clusters)
+
+    # zoomed in, the sources are drawn individually:
+    assert clustering.for_fov(0.5) == (("full",), None)
+
+    # clusters are cached by the source positions, for all instances:
+    assert Clustering(SpatialIndex(lon.copy(), lat)).clusters(key[1]) is clusters
+    assert Clustering(SpatialIndex(lon + 1, lat)).clusters(key[1]) is not clusters
+
+
+def test_clustered_markers_and_table(monkeypatch, sent_messages, sent_markers):
+    mast_aladin = MastAladin(target="10 20", fov=60)
+    mock_send = Mock()
+    monkeypatch.setattr(Aladin, "send", mock_send)
+
+    rng = np.random.default_rng(0)
+    ra = 10 + rng.uniform(-1, 1, 500)
+    dec = 20 + rng.uniform(-1, 1, 500)
+
+    overlay = mast_aladin.add_markers_from_arrays(ra, dec, cluster=True, name="markers")
+    markers = sent_markers(*sent_messages(mock_send)[-1])
+    assert len(markers) < 10
+    assert sum(int(marker["title"].split()[0]) for marker in markers) == 500
+
+    # zooming out further keeps the same clusters, and
+    # zooming in replaces them with the markers:
+    mock_send.reset_mock()
+    mast_aladin._fov = 50
+    mock_send.assert_not_called()
+
+    mast_aladin._fov = 0.5
+    messages = sent_messages(mock_send)
+    events = [content["event_name"] for content, _ in messages]
+    assert events == ["remove_overlay", "add_marker_columns"]
+    assert len(sent_markers(*messages[-1])) == 500
+
+    # updated overlays stay clustered:
+    assert "clustering" in overlay.update(color="red")
+
+    mast_aladin._fov = 60
+    table = mast_aladin.add_table(Table({"ra": ra, "dec": dec}), cluster=True, name="table")
+    votable = BytesIO(mock_send.call_args.kwargs["buffers"][0])
+    clusters = Table.read(votable, format="votable")
+    assert len(clusters) < 10
+    assert clusters["n_sources"].sum() == 500
+
+    # adding the same sources again reuses their clusters:
+    order = table["clustering"].sent_key[1]
+    again = mast_aladin.add_table(Table({"ra": ra, "dec": dec}), cluster=True, name="again")
+    assert again["clustering"].sent_key == table["clustering"].sent_key
+    assert again["clustering"].clusters(order) is table["clustering"].clusters(order)
+    assert overlay["clustering"].clusters(order) is table["clustering"].clusters(order)
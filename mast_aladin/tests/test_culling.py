@@ -0,0 +1,106 @@
+from io import BytesIO
+from unittest.mock import Mock
+
+import numpy as np
+from astropy.coordinates import SkyCoord
+from astropy.table import Table
+from ipyaladin import Aladin
+from ipyaladin.elements.marker import Marker
+
+from mast_aladin import MastAladin
+from mast_aladin.overlay.culling import Viewport, ViewportCulling
+from mast_aladin.overlay.spatial_index import SpatialIndex
+
+
+def test_viewport():
+    viewport = Viewport(10, 20, 2, 1)
+
+    mask = viewport.contains([10, 10.9, 10, 11.5, 10], [20, 20, 20.4, 20, 20.6])
+    assert mask.tolist() == [True, True, True, False, False]
+
+    # rotated by 90 degrees, the viewport is taller than it is wide:
+    rotated = Viewport(10, 20, 2, 1, rotation=90)
+    assert rotated.contains([10, 10], [20.9, 20.6]).tolist() == [True, True]
+    assert not rotated.contains(10.9, 20)
+
+    # points on the other side of the sky are never within the viewport:
+    assert not viewport.contains(190, -20)
+
+    assert viewport.expand(0.5).covers(Viewport(10.4, 20.2, 2, 1))
+    assert not viewport.expand(0.5).covers(Viewport(12, 20, 2, 1))
+    assert Viewport(0, 0, 180, 180).contains(190, -20)
+
+
+def test_viewport_culling():
+    culling = ViewportCulling(margin=0.5)
+
+    assert culling.update(Viewport(10, 20, 2, 2))
+    assert culling.region.width == 4
+
+    # small pans stay within the region, and large pans leave it:
+    assert not culling.update(Viewport(10.5, 20, 2, 2))
+    assert culling.update(Viewport(15, 20, 2, 2))
+    assert culling.region_id == 2
+
+    # zooming in far enough sends a smaller region:
+    assert not culling.update(Viewport(15, 20, 1, 1))
+    assert culling.update(Viewport(15, 20, 0.5, 0.5))
+
+    culling.index = SpatialIndex([15, 15.4, 16], [20, 20, 20])
+    assert culling.visible().tolist() == [0, 1]
+
+
+def test_culled_markers(monkeypatch, sent_messages, sent_markers):
+    mast_aladin = MastAladin(target="10 20", fov=2)
+    mock_send = Mock()
+    monkeypatch.setattr(Aladin, "send", mock_send)
+
+    markers = [
+        Marker(SkyCoord(lon, 20, unit="deg"), title=str(lon), description="")
+        for lon in np.arange(0, 40, 0.5)
+    ]
+    overlay = mast_aladin.add_markers(markers, cull=True, name="markers")
+
+    # only the markers near the viewport are sent:
+    titles = [marker["title"] for marker in sent_markers(*sent_messages(mock_send)[-1])]
+    assert titles == [str(lon) for lon in np.arange(8, 12.5, 0.5)]
+
+    # panning within the margin sends nothing, and leaving it
+    # replaces the layer with the markers in the new region:
+    mock_send.reset_mock()
+    mast_aladin._target = "10.5 20"
+    mock_send.assert_not_called()
+
+    mast_aladin._target = "30 20"
+    messages = sent_messages(mock_send)
+    events = [content["event_name"] for content, _ in messages]
+    assert events == ["remove_overlay", "add_marker_columns"]
+    assert sent_markers(*messages[-1])[0]["title"] == "28.0"
+
+    # updated overlays stay culled:
+    overlay = overlay.update(name="renamed")
+    assert "culling" in overlay
+    assert len(sent_markers(*sent_messages(mock_send)[-1])) == 9
+
+
+def test_culled_table_and_footprints(monkeypatch):
+    mast_aladin = MastAladin(target="10 20", fov=2)
+    mock_send = Mock()
+    monkeypatch.setattr(Aladin, "send", mock_send)
+
+    table = Table({"ra": np.arange(0, 40, 0.5), "dec": np.full(80, 20.0)})
+    mast_aladin.add_table(table, cull=True, name="table")
+
+    content = mock_send.call_args.args[0]
+    assert content["event_name"] == "add_table"
+    assert content["options"]["shape"] == "cross"
+    votable = BytesIO(mock_send.call_args.kwargs["buffers"][0])
+    assert len(Table.read(votable, format="votable")) == 9
+
+    stcs = [f"CIRCLE ICRS {lon} 20 0.2" for lon in np.arange(0, 40, 0.5)]
+    mast_aladin.add_graphic_overlay_from_stcs(stcs, cull=True, name="footprints")
+
+    content = mock_send.call_args.args[0]
+    shape_types = mock_send.call_args.kwargs["buffers"][0]
+    assert content["event_name"] == "add_footprints"
+    assert len(np.frombuffer(shape_types, dtype=np.uint8)) == 9
@@ -0,0 +1,113 @@
+from unittest.mock import Mock
+
+import numpy as np
+from ipyaladin import Aladin
+
+from mast_aladin import MastAladin
+from mast_aladin.overlay.lod import LevelOfDetail, coverage, shape_centers, simplify
+from mast_aladin.overlay.stcs import parse_stcs, shape_names
+
+
+def circle_polygons(centers, radius=0.01, n_vertices=16):
+    # STC-S polygons approximating circles:
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    offsets = radius * np.column_stack([np.cos(angles), np.sin(angles)])
+
+    return [
+        "POLYGON ICRS " + " ".join(f"{value:.6f}" for value in (center + offsets).ravel())
+        for center in centers
+    ]
+
+
+def test_simplify():
+    footprints = parse_stcs([
+        "POLYGON 0 0 0.001 0 0.001 0.001",
+        "POLYGON 0 0 2 0 2 0.01 2 1 0 1",
+        "BOX 10 20 2 1",
+    ])
+    simplified = simplify(footprints, 0.5)
+
+    # the tiny polygon becomes a circle, and the vertex
+    # that snaps to the same point as its neighbor is dropped:
+    assert [shape_names[code] for code in simplified.shape_types] == [
+        'polygon', 'circle', 'box'
+    ]
+    assert simplified.shape_rows.tolist() == [1, 0, 2]
+    assert simplified.shape_values(0).tolist() == [0, 0, 2, 0, 2, 1, 0, 1]
+    assert simplified.shape_values(1)[2] == 0.25
+    assert simplified.shape_values(2).tolist() == [10, 20, 2, 1]
+
+    lon, lat, size = shape_centers(footprints)
+    assert lon.tolist() == [0.0005, 1, 10]
+    assert lat.tolist() == [0.0005, 0.5, 20]
+
+
+def test_coverage():
+    footprints = parse_stcs([
+        "CIRCLE 0.1 0.1 0.01", "CIRCLE 1.2 0.3 0.01", "CIRCLE 0.5 0.2 0.01", "CIRCLE 5 0.1 0.01"
+    ])
+    boxes = coverage(footprints, 1)
+
+    # the first three circles are in adjacent cells, which merge into one box:
+    assert len(boxes) == 2
+    assert boxes.shape_rows.tolist() == [-1, -1]
+    assert np.allclose(boxes.shape_values(0), [1, 0.5, 2, 1], rtol=1e-3)
+
+
+def test_longitude_wraparound():
+    footprints = parse_stcs(["POLYGON ICRS 359.5 0 0.5 0 0.5 1 359.5 1"])
+
+    # the extent of a polygon that crosses longitude 0 is the small one:
+    lon, lat, size = shape_centers(footprints)
+    assert np.allclose(lon, 0) or np.allclose(lon, 360)
+    assert np.allclose(size, 1)
+
+    boxes = coverage(footprints, 1)
+    assert len(boxes) <= 2
+    assert all(0 <= boxes.shape_values(i)[0] < 360 for i in range(len(boxes)))
+    assert all(boxes.shape_values(i)[2] <= 2 for i in range(len(boxes)))
+
+
+def test_level_of_detail():
+    rng = np.random.default_rng(0)
+    footprints = parse_stcs(circle_polygons(rng.random((500, 2)) + [150, 2]))
+    level_of_detail = LevelOfDetail(footprints)
+
+    keys = [level_of_detail.for_fov(fov)[0] for fov in [0.5, 5, 60]]
+    assert keys[0] == ('full',)
+    assert keys[1][0] == 'simplified'
+    assert keys[2][0] == 'coverage'
+
+    # levels are cached, and nearby fields of view share a level:
+    assert level_of_detail.for_fov(5.1)[1] is level_of_detail.for_fov(5)[1]
+
+
+def test_load_footprints_with_level_of_detail(monkeypatch, sent_messages):
+    mast_aladin = MastAladin(fov=60)
+    mock_send = Mock()
+    monkeypatch.setattr(Aladin, "send", mock_send)
+
+    rng = np.random.default_rng(0)
+    stcs = circle_polygons(rng.random((500, 2)) + [150, 2])
+    overlay = mast_aladin.add_graphic_overlay_from_stcs(stcs, lod=True, name="lod")
+
+    # zoomed out, the footprints are sent as coverage boxes:
+    content = mock_send.call_args.args[0]
+    shape_types = np.frombuffer(mock_send.call_args.kwargs["buffers"][0], dtype=np.uint8)
+    assert content["event_name"] == "add_footprints"
+    assert len(shape_types) < 10
+    assert np.all(shape_types == shape_names.index('box'))
+
+    # zooming within the same level sends nothing:
+    mock_send.reset_mock()
+    mast_aladin._fov = 59
+    mock_send.assert_not_called()
+
+    # zooming in replaces the layer with the footprints at full detail:
+    mast_aladin._fov = 0.5
+    messages = [content for content, _ in sent_messages(mock_send)]
+    events = [content["event_name"] for content in messages]
+    assert events == ["remove_overlay", "add_footprints"]
+    shape_types = sent_messages(mock_send)[-1][1][0]
+    assert len(np.frombuffer(shape_types, dtype=np.uint8)) == 500
+    assert overlay["lod"].sent_key == ('full',)
@@ -1,4 +1,22 @@
-from mast_aladin.table import MastTable
+import os
+import threading
+import time
+import warnings
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+from astropy.table import Table, MaskedColumn
+from ipywidgets.widgets.widget import _remove_buffers
+
+from astroquery.mast import MastMissionsClass
+
+from mast_aladin.table import MastTable, cache
+from mast_aladin.table.download import DownloadPipeline
+from mast_aladin.table.mast_table import find_key_columns
+from mast_aladin.table.serialize import (
+    rows_from_columns, serialize, serialize_buffers, serialize_columns
+)
 
 
 def test_mast_table_init(mast_observation_table):
@@ -13,6 +31,391 @@ def test_mast_table_init(mast_observation_table):
     # check that s_region col isn't visible by default
     assert 's_region' not in mast_table.headers_visible
 
-    # the MAST observation query has a ArchiveFileID column,
-    # which should be chosen as the default item_key:
-    assert mast_table.item_key == 'ArchiveFileID'
+    # the MAST observation query has a fileSetName column, which
+    # is known to be unique and should be chosen as the default item_key:
+    assert mast_table.item_key == 'fileSetName'
+
+    # one serialized item per row:
+    assert len(mast_table.items) == len(mast_observation_table)
+    assert mast_table.items[0]['fileSetName'] == mast_observation_table['fileSetName'][0]
+
+
+def test_mast_table_spatial_index(mast_observation_table):
+    mast_table = MastTable(mast_observation_table)
+    n_rows = len(mast_table.table)
+    ra, dec = mast_observation_table['targ_ra'][0], mast_observation_table['targ_dec'][0]
+
+    # the index is built once from the targ_ra and targ_dec columns:
+    index = mast_table.spatial_index
+    assert mast_table.spatial_index is index
+    assert 0 in index.cone(ra, dec, 1 / 3600)
+
+    mast_table.remove_rows([mast_observation_table['fileSetName'][0]])
+    assert mast_table.spatial_index is not index
+    assert len(mast_table.spatial_index) == n_rows - 1
+
+
+def test_serialize():
+    table = Table({
+        'id': np.arange(3),
+        'flux': MaskedColumn([1.5, 2.5, np.nan], mask=[False, True, False]),
+        'name': np.array([b'a', b'b', b'c']),
+    })
+    table['flux'].unit = 'mJy'
+
+    columns = serialize_columns(table)
+    assert columns == {
+        'id': [0, 1, 2],
+        'flux': [1.5, None, None],
+        'name': ['a', 'b', 'c'],
+    }
+
+    items = serialize(table)
+    assert items[0] == {'id': 0, 'flux': 1.5, 'name': 'a'}
+    assert all(type(item['id']) is int for item in items)
+    assert serialize(table[:0]) == []
+
+
+def products_table(n_rows):
+    # a table with columns from a `list_products` query:
+    return Table({
+        'product_key': np.arange(n_rows),
+        'size': np.arange(n_rows) % 7,
+        'filename': [f'file{i}.fits' for i in range(n_rows)],
+    })
+
+
+def test_mast_table_windowed():
+    n_rows = 1000
+    mast_table = MastTable(
+        products_table(n_rows), unique_column='product_key', windowed=True, items_per_page=10
+    )
+
+    # only the first page is synced:
+    assert [item['product_key'] for item in mast_table.items] == list(range(10))
+    assert mast_table.server_items_length == n_rows
+
+    mast_table.page = 3
+    assert [item['product_key'] for item in mast_table.items] == list(range(20, 30))
+
+    mast_table.page = 1
+    mast_table.sort_by = ['size', 'product_key']
+    mast_table.sort_desc = [True, False]
+    assert all(item['size'] == 6 for item in mast_table.items)
+    assert [item['product_key'] for item in mast_table.items] == list(range(6, 76, 7))
+
+    mast_table.sort_by = []
+    mast_table.search = 'FILE99'
+    assert mast_table.server_items_length == 11
+    assert [item['filename'] for item in mast_table.items][:2] == ['file99.fits', 'file990.fits']
+
+    # leaving windowed mode syncs every row:
+    mast_table.windowed = False
+    assert len(mast_table.items) == n_rows
+    assert mast_table.server_items_length == -1
+
+
+def test_mast_table_binary_transport():
+    table = products_table(100)
+    table['size'] = MaskedColumn(table['size'], mask=table['size'] == 0)
+    mast_table = MastTable(table, unique_column='product_key', binary_transport=True)
+
+    assert mast_table.items == []
+    column_data = mast_table.column_data
+
+    # numeric columns are sent as buffers, strings as lists:
+    assert column_data['product_key']['dtype'] == 'int64'
+    assert np.array_equal(
+        np.frombuffer(column_data['product_key']['buffer'], dtype='<i8'),
+        table['product_key']
+    )
+    assert np.array_equal(
+        np.frombuffer(column_data['size']['mask'], dtype=bool), table['size'].mask
+    )
+    assert column_data['filename']['values'][1] == 'file1.fits'
+
+    # ipywidgets extracts the buffers from the synced state:
+    state, buffer_paths, buffers = _remove_buffers(mast_table.get_state(['column_data']))
+    assert ['column_data', 'product_key', 'buffer'] in buffer_paths
+    assert len(buffers) == 3
+
+
+def test_binary_transport_matches_json():
+    table = products_table(5)
+    table['flux'] = MaskedColumn(
+        [1.5, np.nan, np.inf, 4.5, 5.5], mask=[False, False, False, True, False]
+    )
+    table['flag'] = MaskedColumn([True, False, True, False, True], mask=[0, 0, 0, 0, 1])
+
+    # columns decoded like the front end decodes binary buffers:
+    columns = dict()
+    for name, column in serialize_buffers(table).items():
+        if 'values' in column:
+            columns[name] = column['values']
+            continue
+
+        dtype = np.uint8 if column['dtype'] == 'bool' else np.dtype(column['dtype'])
+        values = np.frombuffer(column['buffer'], dtype=dtype).tolist()
+        if column['dtype'] == 'bool':
+            values = [bool(value) for value in values]
+        mask = np.zeros(len(values), bool) if column['mask'] is None else (
+            np.frombuffer(column['mask'], dtype=bool)
+        )
+        columns[name] = [None if masked else value for value, masked in zip(values, mask)]
+
+    # masked and non-finite values are `None` with both transports:
+    assert rows_from_columns(columns) == serialize(table)
+    assert [row['flux'] for row in serialize(table)] == [1.5, None, None, None, 5.5]
+
+
+def test_mast_table_row_updates(monkeypatch):
+    mast_table = MastTable(products_table(10), unique_column='product_key')
+    mock_send = Mock()
+    monkeypatch.setattr(MastTable, "send", mock_send)
+
+    # only the new rows are sent to the front end:
+    mast_table.append_rows(products_table(12)[10:])
+    message = mock_send.call_args[0][0]
+    assert message['method'] == 'append_rows'
+    assert [row['product_key'] for row in message['args'][0]] == [10, 11]
+    assert len(mast_table.table) == len(mast_table.items) == 12
+
+    with pytest.raises(ValueError, match="unique values"):
+        mast_table.append_rows(products_table(1))
+
+    mast_table.update_rows([{'product_key': 11, 'size': 100}])
+    message = mock_send.call_args[0][0]
+    assert message['method'] == 'update_rows'
+    assert message['args'] == ['product_key', [mast_table.items[11]]]
+    assert mast_table.table['size'][11] == mast_table.items[11]['size'] == 100
+
+    # string columns are widened for values that are longer than the column:
+    long_filename = 'a_much_longer_filename_than_the_others.fits'
+    assert len(long_filename) > mast_table.table['filename'].dtype.itemsize // 4
+    mast_table.update_rows([{'product_key': 10, 'filename': long_filename}])
+    assert mast_table.table['filename'][10] == mast_table.items[10]['filename'] == long_filename
+    assert mast_table.table['filename'][9] == 'file9.fits'
+
+    mast_table.selected_rows = mast_table.items[2:4]
+    mast_table.remove_rows([3, 0])
+    message = mock_send.call_args[0][0]
+    assert message['method'] == 'remove_rows'
+    assert message['args'] == ['product_key', [3, 0]]
+    assert mast_table.table['product_key'].tolist() == [1, 2, 4, 5, 6, 7, 8, 9, 10, 11]
+    assert [item['product_key'] for item in mast_table.items] == [1, 2, 4, 5, 6, 7, 8, 9, 10, 11]
+    assert [row['product_key'] for row in mast_table.selected_rows] == [2]
+
+    with pytest.raises(ValueError, match="No rows found"):
+        mast_table.remove_rows([3])
+
+
+def test_find_key_columns():
+    table = products_table(10)
+    table.remove_column('product_key')
+    table['filename'] = 'file.fits'
+    table['dataset'] = np.arange(10) // 2
+
+    # the combination of two columns is unique:
+    assert find_key_columns(table) == ('size', 'dataset')
+    mast_table = MastTable(table)
+    assert mast_table.item_key == '_item_key'
+    assert mast_table.items[3]['_item_key'] == '3|1'
+
+    # if no columns are unique, rows are keyed by their index:
+    table.replace_column('size', np.zeros(10, dtype=int))
+    assert find_key_columns(table) == ()
+    mast_table = MastTable(table, update_viewport=False)
+    assert mast_table.item_key == '_row_index'
+    assert [item['_row_index'] for item in mast_table.items] == list(range(10))
+
+    mast_table.remove_rows([0])
+    mast_table.append_rows(table[:1])
+    assert [item['_row_index'] for item in mast_table.items] == list(range(1, 11))
+
+
+def test_key_columns_with_nans_and_separators():
+    # repeated NaNs aren't equal when hashed, but don't make a column unique:
+    table = Table({
+        'flux': np.full(4, np.nan),
+        'name': ['a|b', 'a', 'c', 'c'],
+        'band': ['c', 'b|c', 'c', 'd'],
+    })
+    assert find_key_columns(table) == ('name', 'band')
+
+    # the '|' within values is escaped, so that composite keys stay unique:
+    mast_table = MastTable(table)
+    keys = [item['_item_key'] for item in mast_table.items]
+    assert keys == ['a\\|b|c', 'a|b\\|c', 'c|c', 'c|d']
+    mast_table.selected_keys = keys[1:2]
+    assert mast_table.selected_rows_table['name'].tolist() == ['a']
+
+
+def test_selected_rows_table():
+    table = products_table(10)
+    table['size'] = MaskedColumn(table['size'], mask=table['size'] == 3, unit='byte')
+    mast_table = MastTable(table, unique_column='filename')
+
+    # the front end only sends back the keys of selected rows:
+    mast_table.selected_keys = ['file3.fits', 'file1.fits']
+    selected = mast_table.selected_rows_table
+
+    assert selected['filename'].tolist() == ['file3.fits', 'file1.fits']
+    assert selected['size'].unit == 'byte'
+    assert selected['size'].mask.tolist() == [True, False]
+    assert [row['product_key'] for row in mast_table.selected_rows] == [3, 1]
+
+    # rows can also be selected from their serialized items:
+    mast_table.selected_rows = mast_table.items[5:6]
+    assert mast_table.selected_keys == ['file5.fits']
+
+
+def test_observe_selected_rows():
+    mast_table = MastTable(products_table(10), unique_column='filename')
+    changes = []
+    mast_table.observe(changes.append, names='selected_rows')
+
+    # observers of the selected rows are told about selections by key:
+    mast_table.selected_keys = ['file2.fits']
+    assert [row['product_key'] for row in changes[-1]['new']] == [2]
+    assert changes[-1]['old'] == []
+
+    mast_table.selected_rows = mast_table.items[4:6]
+    assert [row['product_key'] for row in changes[-1]['new']] == [4, 5]
+    assert [row['product_key'] for row in changes[-1]['old']] == [2]
+
+    # and about rows that are no longer selected once they're removed:
+    mast_table.remove_rows(['file4.fits'])
+    assert [row['product_key'] for row in changes[-1]['new']] == [5]
+    assert len(changes) == 3
+
+
+def test_download_selected_rows(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache, '_product_cache', cache.ProductCache(tmp_path))
+    filenames = ['file0.fits', 'file1.fits', 'file2.fits', 'file3.fits']
+    downloaded = []
+
+    # all downloads have to be running at once to pass the barrier:
+    barrier = threading.Barrier(len(filenames))
+    received = {filename: threading.Event() for filename in filenames}
+
+    def download_file(self, uri, local_path=None, **kwargs):
+        # local stand-in for MAST, where each file has the size given in
+        # the `products_table`, and later files finish first, since each
+        # file waits until the next file has been yielded:
+        index = int(uri[4])
+        barrier.wait(timeout=10)
+        if index + 1 < len(filenames):
+            assert received[filenames[index + 1]].wait(timeout=10)
+        with open(local_path, 'wb') as f:
+            f.write(b'x' * (index % 7))
+        downloaded.append(uri)
+        return 'COMPLETE', None, None
+
+    monkeypatch.setattr(MastMissionsClass, 'download_file', download_file)
+
+    mast_table = MastTable(products_table(4), unique_column='filename')
+    mast_table.selected_keys = filenames
+
+    progress = []
+    mast_table.observe(lambda change: progress.append(change['new']), 'download_progress')
+
+    # downloads run concurrently, and each path is yielded as soon as its
+    # download completes, rather than in the order of the selection:
+    paths = []
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        for path in mast_table.download_selected_rows():
+            paths.append(path)
+            received[os.path.basename(path)].set()
+
+    assert paths == [str(tmp_path / filename) for filename in filenames[::-1]]
+    assert progress[0] == {'n_done': 0, 'n_total': 4}
+    assert progress[-1] == {}
+
+    # products that are already downloaded are not downloaded again:
+    assert sorted(mast_table.download_selected_rows()) == sorted(paths)
+    assert len(downloaded) == 4
+
+
+def test_open_selected_rows_in_background(monkeypatch):
+    release = threading.Event()
+
+    def download(filename):
+        assert release.wait(timeout=10)
+        return filename
+
+    mast_table = MastTable(products_table(4), unique_column='filename')
+    mast_table.selected_keys = ['file0.fits', 'file1.fits']
+
+    mal = Mock()
+    monkeypatch.setattr('mast_aladin.app.gca', lambda: mal)
+
+    def download_selected_rows(download=download):
+        return MastTable.download_selected_rows(mast_table, download=download)
+
+    monkeypatch.setattr(mast_table, 'download_selected_rows', download_selected_rows)
+
+    # the comm handler returns while the products are still downloading,
+    # and the progress is synced in the meantime:
+    assert mast_table.vue_open_selected_rows_in_aladin() is mal
+    assert mast_table.download_progress == {'n_done': 0, 'n_total': 2}
+    mal.delayed_add_fits.assert_not_called()
+
+    release.set()
+    mast_table.download_thread.join(timeout=10)
+    assert sorted(call.args[0] for call in mal.delayed_add_fits.call_args_list) == [
+        'file0.fits', 'file1.fits'
+    ]
+    assert mast_table.download_progress == {}
+
+    # the cancel button stops the downloads and clears the progress:
+    release.clear()
+    mal.reset_mock()
+    mast_table.vue_open_selected_rows_in_aladin()
+    mast_table.vue_cancel_downloads()
+    assert mast_table.download_pipeline.cancelled
+    assert mast_table.download_progress == {}
+
+    release.set()
+    mast_table.download_thread.join(timeout=10)
+    mal.delayed_add_fits.assert_not_called()
+    assert mast_table.download_progress == {}
+
+
+def test_download_pipeline_cancel():
+    started = []
+
+    def download(filename):
+        started.append(filename)
+        time.sleep(0.02)
+        return filename
+
+    pipeline = DownloadPipeline(
+        [f'file{i}.fits' for i in range(10)], download=download, max_workers=2
+    )
+
+    paths = []
+    for path in pipeline:
+        paths.append(path)
+        pipeline.cancel()
+
+    # queued downloads are never started after cancellation:
+    assert len(paths) == 1
+    assert len(started) < 10
+    assert 'cancelled' in pipeline.status.values()
+
+
+def test_download_pipeline_errors():
+    def download(filename):
+        if filename == 'bad.fits':
+            raise OSError('download failed')
+        return filename
+
+    pipeline = DownloadPipeline(['a.fits', 'bad.fits', 'b.fits'], download=download)
+
+    with pytest.warns(UserWarning, match='1 of 3 downloads failed'):
+        paths = sorted(pipeline)
+
+    assert paths == ['a.fits', 'b.fits']
+    assert pipeline.status['bad.fits'] == 'error'
+    assert isinstance(pipeline.errors['bad.fits'], OSError)
@@ -0,0 +1,101 @@
+from unittest.mock import Mock
+
+import numpy as np
+from astropy.table import Table
+from ipyaladin import Aladin
+
+from mast_aladin import MastAladin
+
+
+def test_mirror_overlays(monkeypatch):
+    monkeypatch.setattr(Aladin, "send", Mock())
+
+    source = MastAladin()
+    target = MastAladin(target="10 20", fov=2)
+    source.add_markers_from_arrays([10, 11], [20, 20], name="existing")
+
+    mirror = source.mirror_overlays(target)
+    assert "existing" in target._overlays_dict
+
+    # added overlays are copied with the data that was converted for the source:
+    table = Table({"ra": [10.0, 10.1], "dec": [20.0, 20.1]})
+    source.add_table(table, name="table")
+    source.add_graphic_overlay_from_stcs(["CIRCLE ICRS 10 20 0.5"], name="footprints", lod=True)
+
+    assert target._overlays_dict["table"]["table"] is table
+    assert target._overlays_dict["footprints"]["footprints"] is (
+        source._overlays_dict["footprints"]["footprints"]
+    )
+    assert "lod" in target._overlays_dict["footprints"]
+
+    # updates only send the new options, and keep the data:
+    target_send = Mock()
+    monkeypatch.setattr(target, "send", target_send)
+    source.add_markers_from_arrays(np.arange(3), np.zeros(3), name="markers")
+    target_send.reset_mock()
+
+    source._overlays_dict["markers"].update(color="red")
+    target_send.assert_called_once_with(
+        {
+            "event_name": "set_overlay_options",
+            "overlay_name": "markers",
+            "options": {"color": "red"},
+        }
+    )
+    assert target._overlays_dict["markers"].options["color"] == "red"
+
+    # renamed and removed overlays are renamed and removed in the target:
+    source._overlays_dict["table"].update(name="renamed")
+    assert "renamed" in target._overlays_dict
+    assert "table" not in target._overlays_dict
+
+    source.remove_overlay(["renamed", "existing"])
+    assert set(target._overlays_dict.keys()) == {"footprints", "markers"}
+
+    # changes to the target are not mirrored back, and
+    # changes to the source are no longer mirrored once stopped:
+    target.remove_overlay("footprints")
+    assert "footprints" in source._overlays_dict
+
+    mirror.stop()
+    source.remove_overlay("markers")
+    assert "markers" in target._overlays_dict
+
+
+def test_widgets_mirroring_each_other(monkeypatch):
+    monkeypatch.setattr(Aladin, "send", Mock())
+
+    first = MastAladin()
+    second = MastAladin()
+    first.mirror_overlays(second)
+    second.mirror_overlays(first)
+
+    first.add_markers_from_arrays([10], [20], name="markers")
+    second.add_markers_from_arrays([11], [21], name="other")
+
+    assert set(first._overlays_dict.keys()) == {"markers", "other"}
+    assert set(second._overlays_dict.keys()) == {"markers", "other"}
+
+    second.remove_overlay("markers")
+    assert set(first._overlays_dict.keys()) == {"other"}
+
+
+def test_mirroring_each_other_with_existing_overlays(monkeypatch):
+    monkeypatch.setattr(Aladin, "send", Mock())
+
+    first = MastAladin()
+    second = MastAladin()
+    first.add_markers_from_arrays([10], [20], name="markers")
+
+    # overlays that were copied to the other widget are not copied back:
+    first.mirror_overlays(second)
+    second.mirror_overlays(first)
+    assert list(first._overlays_dict.keys()) == ["markers"]
+    assert list(second._overlays_dict.keys()) == ["markers"]
+
+    # and stay paired in both directions:
+    second._overlays_dict["markers"].update(name="renamed")
+    assert list(first._overlays_dict.keys()) == ["renamed"]
+
+    first.remove_overlay("renamed")
+    assert not second._overlays_dict.keys()
@@ -0,0 +1,101 @@
+from unittest.mock import Mock
+
+import pytest
+
+from ipyaladin import Aladin
+
+from mast_aladin import MastAladin
+
+
+def test_delayed_operations_run_once_in_order(monkeypatch):
+    mock_send = Mock()
+    monkeypatch.setattr(Aladin, "send", mock_send)
+
+    mast_aladin = MastAladin()
+    calls = []
+    monkeypatch.setattr(mast_aladin, "add_fits", lambda path: calls.append(path))
+
+    mast_aladin.delayed_add_fits("a.fits")
+    mast_aladin.delayed_add_graphic_overlay_from_stcs("CIRCLE ICRS 10 20 0.5", name="region")
+    for _ in range(10):
+        mast_aladin.delayed_add_fits("b.fits")
+    mast_aladin.delayed_set_viewport(target="10 20", fov=5)
+    mast_aladin.delayed_set_viewport(fov=2)
+
+    # one observer of `_wcs` for all operations, and duplicates are removed:
+    assert len(mast_aladin._trait_notifiers["_wcs"]["change"]) == 1
+    assert mast_aladin.pending_operations == [
+        "delayed_add_fits",
+        "delayed_add_graphic_overlay_from_stcs",
+        "delayed_add_fits",
+        "delayed_set_viewport",
+        "delayed_set_viewport",
+    ]
+    assert not calls
+    assert "region" not in mast_aladin._overlays_dict
+
+    # the first render runs the queue once, in order:
+    mast_aladin._wcs = {"CRVAL1": 10}
+    assert calls == ["a.fits", "b.fits"]
+    assert "region" in mast_aladin._overlays_dict
+    assert mast_aladin._fov == 2
+    assert mast_aladin._target == "10.0 20.0"
+    assert mast_aladin.pending_operations == []
+
+    # changing the view resets the WCS until the front end sends it
+    # again, after which operations run immediately:
+    mast_aladin._wcs = {"CRVAL1": 10}
+    mast_aladin.delayed_add_fits("c.fits")
+    assert calls == ["a.fits", "b.fits", "c.fits"]
+
+
+def test_delayed_viewport_is_set_before_batch(monkeypatch):
+    mast_aladin = MastAladin()
+    events = []
+    monkeypatch.setattr(
+        Aladin, "send", lambda self, content, buffers=None: events.append(content["event_name"])
+    )
+    mast_aladin.observe(lambda change: events.append(change["name"]), ["_fov", "_target"])
+    monkeypatch.setattr(mast_aladin, "add_fits", lambda path: events.append(mast_aladin._fov))
+
+    mast_aladin.delayed_add_fits("a.fits")
+    mast_aladin.delayed_add_graphic_overlay_from_stcs("CIRCLE ICRS 10 20 0.5", name="a")
+    mast_aladin.delayed_set_viewport(fov=2)
+    mast_aladin.delayed_add_graphic_overlay_from_stcs("CIRCLE ICRS 11 20 0.5", name="b")
+    mast_aladin.delayed_set_viewport(target="10 20")
+
+    # viewport traits are set and synced first, even if they were delayed
+    # later, and then the other operations run and are sent together:
+    mast_aladin._wcs = {"CRVAL1": 10}
+    assert events == ["_fov", "_target", 2, "batch"]
+    assert "a" in mast_aladin._overlays_dict and "b" in mast_aladin._overlays_dict
+
+
+def test_failed_delayed_operation_runs_the_rest(monkeypatch):
+    monkeypatch.setattr(Aladin, "send", Mock())
+
+    mast_aladin = MastAladin()
+    calls = []
+
+    def add_fits(path):
+        if path == "bad.fits":
+            raise OSError("can't read bad.fits")
+        calls.append(path)
+
+    monkeypatch.setattr(mast_aladin, "add_fits", add_fits)
+    monkeypatch.setattr(mast_aladin, "add_moc", lambda moc: calls.append(moc))
+
+    mast_aladin.delayed_add_fits("a.fits")
+    mast_aladin.delayed_add_fits("bad.fits")
+    mast_aladin.delayed_add_fits("b.fits")
+
+    # the old name of `delayed_add_moc` still works, with a warning:
+    with pytest.warns(DeprecationWarning, match="delayed_add_moc"):
+        mast_aladin.delayed_delayed_add_moc("moc")
+    assert mast_aladin.pending_operations[-1] == "delayed_add_moc"
+
+    # the error is raised once the operations after it have run:
+    with pytest.raises(OSError, match="bad.fits"):
+        mast_aladin._wcs = {"CRVAL1": 10}
+    assert calls == ["a.fits", "b.fits", "moc"]
+    assert mast_aladin.pending_operations == []
@@ -5,12 +5,14 @@ import pytest
 from unittest.mock import Mock
 import warnings
 import re
+import numpy as np
 
 from mast_aladin import MastAladin
+from mast_aladin.overlay.batch import coalesce_messages
 from mast_aladin.overlay.mast_overlay import MastOverlay, MastOverlayType
 from ipyaladin.elements.error_shape import EllipseError, CircleError
 from regions import CircleSkyRegion
-from ipyaladin import Marker
+from ipyaladin import Aladin, Marker
 
 
 mast_aladin = MastAladin()
@@ -24,6 +26,11 @@ def test_overlays_dict_add_markers(
     mock_send = Mock()
     monkeypatch.setattr(MastAladin, "send", mock_send)
 
+    # front ends without the `add_marker_columns` handler are sent marker dictionaries:
+    monkeypatch.setattr(
+        MastAladin, "_frontend_events", MastAladin._frontend_events - {"add_marker_columns"}
+    )
+
     markers = []
     for i in range(1, 11):
         name = f"M{i}"
@@ -273,6 +280,11 @@ def test_overlays_dict_add_graphic_overlay_from_stcs_(
     test_name = "test"
     mock_send = Mock()
     monkeypatch.setattr(MastAladin, "send", mock_send)
+
+    # front ends without the `add_footprints` handler are sent the STC-S strings:
+    monkeypatch.setattr(
+        MastAladin, "_frontend_events", MastAladin._frontend_events - {"add_footprints"}
+    )
     mast_aladin.add_graphic_overlay_from_stcs(stcs_strings, name=test_name)
 
     assert test_name in mast_aladin._overlays_dict
@@ -404,7 +416,228 @@ def test_remove_overlay(
     # try removing non-existent layer to confirm error is raised
     with pytest.raises(
         ValueError,
-        match="Cannot remove overlayer `does_not_exist` "
-        "since this layer does not exist.",
+        match="Cannot remove overlay `does_not_exist` "
+        "since this overlay does not exist.",
     ):
         mast_aladin.remove_overlay("does_not_exist")
+
+
+@pytest.mark.parametrize("frontend_events", [frozenset(), frozenset({"batch"})])
+def test_batch(monkeypatch, frontend_events):
+    """Test that batched messages are coalesced and sent on exit."""
+    mast_aladin = MastAladin()
+    monkeypatch.setattr(MastAladin, "_frontend_events", frontend_events)
+    mock_send = Mock()
+    monkeypatch.setattr(Aladin, "send", mock_send)
+
+    table = Table({"ra": [1.0, 2.0], "dec": [3.0, 4.0]})
+
+    with mast_aladin.batch():
+        mast_aladin.add_table(table, name="kept")
+        with mast_aladin.batch():
+            mast_aladin.add_table(table, name="dropped")
+        mast_aladin.send({"event_name": "change_colormap", "colormap": "viridis"})
+        mast_aladin.remove_overlay("dropped")
+
+        # nothing is sent until the batch exits, but overlays are tracked:
+        mock_send.assert_not_called()
+        assert "kept" in mast_aladin._overlays_dict
+        assert "dropped" not in mast_aladin._overlays_dict
+
+    if frontend_events:
+        mock_send.assert_called_once()
+        content = mock_send.call_args.args[0]
+        assert content["event_name"] == "batch"
+        messages = content["messages"]
+        assert len(mock_send.call_args.kwargs["buffers"]) == 1
+        assert messages[0]["buffer_indices"] == [0]
+        assert messages[1]["buffer_indices"] == []
+    else:
+        messages = [call.args[0] for call in mock_send.call_args_list]
+
+    # the table that was added and removed in the batch is never sent:
+    assert [message["event_name"] for message in messages] == [
+        "add_table", "change_colormap"
+    ]
+    assert messages[0]["options"]["name"] == "kept"
+
+
+def test_coalesce_messages():
+    """Test that only messages which cancel each other out are dropped."""
+    messages = [
+        ({"event_name": "add_overlay", "graphic_options": {"name": "a"}}, None),
+        ({"event_name": "set_overlay_options", "overlay_name": "a", "options": {}}, None),
+        ({"event_name": "set_overlay_options", "overlay_name": "b", "options": {}}, None),
+        ({"event_name": "remove_overlay", "overlay_names": ["a", "b"]}, None),
+        ({"event_name": "add_marker", "options": {"name": "b"}}, None),
+    ]
+
+    assert coalesce_messages(messages) == [
+        ({"event_name": "remove_overlay", "overlay_names": ["b"]}, None),
+        ({"event_name": "add_marker", "options": {"name": "b"}}, None),
+    ]
+
+
+def test_add_footprints(monkeypatch):
+    """Test that STC-S footprints are stored compactly and sent as buffers."""
+    mast_aladin = MastAladin()
+    mock_send = Mock()
+    monkeypatch.setattr(Aladin, "send", mock_send)
+
+    stcs = ["CIRCLE ICRS 258.9 43.1 0.6", "POLYGON ICRS 1 2 3 4 5 6"]
+    overlay = mast_aladin.add_graphic_overlay_from_stcs(stcs, name="footprints", color="red")
+
+    # per-footprint region infos are not stored:
+    assert set(overlay) == {"type", "update_info", "options", "footprints"}
+
+    content = mock_send.call_args.args[0]
+    buffers = mock_send.call_args.kwargs["buffers"]
+    assert content["event_name"] == "add_footprints"
+    assert content["options"] == {"name": "footprints", "color": "red"}
+    assert np.frombuffer(buffers[0], dtype=np.uint8).tolist() == [1, 0]
+    assert np.frombuffer(buffers[3], dtype=np.float64).tolist() == [
+        258.9, 43.1, 0.6, 1, 2, 3, 4, 5, 6
+    ]
+
+    # region infos are still available, and created on first use:
+    assert overlay["regions_infos"][0] == {
+        "region_type": "stcs",
+        "infos": {"stcs": stcs[0]},
+        "options": overlay.options,
+    }
+
+    # shapes that aren't parsed in Python are sent for Aladin Lite to parse:
+    mast_aladin.add_graphic_overlay_from_stcs("ELLIPSE ICRS 1 2 3 2 0", name="ellipse")
+    content = mock_send.call_args.args[0]
+    assert content["event_name"] == "add_overlay"
+    assert content["regions_infos"][0]["infos"]["stcs"] == "ELLIPSE ICRS 1 2 3 2 0"
+
+
+def test_unique_names_and_indexes(monkeypatch):
+    """Test that freed suffixes are reused and overlays are indexed by type and prefix."""
+    mast_aladin = MastAladin()
+    monkeypatch.setattr(Aladin, "send", Mock())
+    overlays = mast_aladin._overlays_dict
+
+    # default names get numbered suffixes without warnings:
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        for _ in range(5):
+            mast_aladin.add_graphic_overlay_from_stcs("CIRCLE ICRS 1 2 0.1")
+
+    assert overlays.names() == ["overlay_python"] + [f"overlay_python_{i}" for i in range(1, 5)]
+
+    # the lowest freed suffix is used first, and is only
+    # taken when an overlay with the name is added:
+    mast_aladin.remove_overlay(["overlay_python_3", "overlay_python_1"])
+    assert overlays.make_unique_name("overlay_python") == "overlay_python_1"
+    assert overlays.make_unique_name("overlay_python") == "overlay_python_1"
+
+    mast_aladin.add_graphic_overlay_from_stcs("CIRCLE ICRS 1 2 0.1")
+    assert overlays.make_unique_name("overlay_python") == "overlay_python_3"
+
+    # suffixes taken by explicit names are skipped:
+    with pytest.warns(UserWarning):
+        mast_aladin.add_graphic_overlay_from_stcs("CIRCLE ICRS 1 2 0.1", name="overlay_python")
+    mast_aladin.add_graphic_overlay_from_stcs("CIRCLE ICRS 1 2 0.1", name="overlay_python_5")
+    assert overlays.make_unique_name("overlay_python") == "overlay_python_6"
+    mast_aladin.remove_overlay(["overlay_python_1", "overlay_python_3", "overlay_python_5"])
+
+    mast_aladin.add_markers(Marker("0 0", "marker", ""), name="marker")
+    mast_aladin.add_table(Table({"ra": [1.0], "dec": [2.0]}), name="overlay_table")
+
+    assert overlays.names(overlay_type="marker") == ["marker"]
+    assert overlays.names(overlay_type=MastOverlayType.TABLE) == ["overlay_table"]
+    assert overlays.names(prefix="overlay_p") == [
+        "overlay_python", "overlay_python_2", "overlay_python_4"
+    ]
+    assert overlays.names(overlay_type="table", prefix="overlay") == ["overlay_table"]
+
+    assert mast_aladin.remove_overlays(overlay_type="overlay_stcs") == [
+        "overlay_python", "overlay_python_2", "overlay_python_4"
+    ]
+    assert overlays.names() == ["marker", "overlay_table"]
+
+
+def test_compact_overlay_records(monkeypatch):
+    """Test that overlays store their data once, and can hold tables weakly."""
+    mast_aladin = MastAladin()
+    mock_send = Mock()
+    monkeypatch.setattr(Aladin, "send", mock_send)
+
+    markers = [Marker(f"{i} 10", "star", f"star {i}") for i in range(1000)]
+    overlay = mast_aladin.add_markers(markers, name="stars")
+
+    # markers are stored in columns, with repeated labels stored once:
+    assert set(overlay) == {"type", "marker_columns", "options"}
+    marker_columns = overlay["marker_columns"]
+    assert marker_columns.lon.dtype == np.float64
+    assert marker_columns.title.values == ["star"]
+    assert overlay["markers"][5] == markers[5].__dict__
+    assert overlay["update_info"][5].__dict__ == markers[5].__dict__
+
+    # derived keys are available through `get` and `in` like stored keys:
+    assert "markers" in overlay
+    assert overlay.get("markers")[5] == markers[5].__dict__
+    assert "region_geometries" not in overlay
+    assert overlay.get("region_geometries", "default") == "default"
+
+    stcs_overlay = mast_aladin.add_graphic_overlay_from_stcs("CIRCLE ICRS 1 2 0.1", name="stcs")
+    assert "regions_infos" in stcs_overlay
+    assert stcs_overlay.get("regions_infos")[0]["infos"]["stcs"] == "CIRCLE ICRS 1 2 0.1"
+
+    table = Table({"ra": [1.0, 2.0], "dec": [3.0, 4.0]})
+    overlay = mast_aladin.add_table(table, weak_table=True, name="weak")
+    assert "table" not in dict(overlay)
+    assert overlay["table"] is table
+
+    # the table can be freed, after which the overlay can't be re-added:
+    del table
+    with pytest.raises(ValueError, match="no longer available"):
+        overlay.update(ra_field="ra")
+    assert "weak" in mast_aladin._overlays_dict
+
+
+def test_add_markers_from_arrays(monkeypatch, sent_messages, sent_markers):
+    """Test that markers from arrays match markers from Marker objects."""
+    mast_aladin = MastAladin()
+    mock_send = Mock()
+    monkeypatch.setattr(Aladin, "send", mock_send)
+
+    ra, dec = np.array([10.0, 20.0, 30.0]), np.array([-5.0, 0.0, 5.0])
+    titles = ["a", "b", "a"]
+    mast_aladin.add_markers(
+        [Marker(f"{lon} {lat}", title, "") for lon, lat, title in zip(ra, dec, titles)],
+        name="objects",
+    )
+    expected = sent_markers(*sent_messages(mock_send)[-1])
+    assert [marker["title"] for marker in expected] == titles
+
+    overlay = mast_aladin.add_markers_from_arrays(
+        SkyCoord(ra, dec, unit="deg"), title=titles, name="arrays"
+    )
+    assert sent_markers(*sent_messages(mock_send)[-1]) == expected
+    assert overlay["marker_columns"].title.values == ["a", "b"]
+
+    mast_aladin.add_markers_from_arrays(ra * u.deg, dec, title=titles, name="quantities")
+    assert sent_markers(*sent_messages(mock_send)[-1]) == expected
+
+    # renaming re-adds the markers from their columns:
+    overlay = overlay.update(name="renamed", color="red")
+    content, buffers = sent_messages(mock_send)[-1]
+    assert sent_markers(content, buffers) == expected
+    assert content["options"] == {"name": "renamed", "color": "red"}
+
+    # the columns are sent as binary arrays, with each distinct label once:
+    mast_aladin.add_markers_from_arrays(ra, dec, title=titles, description="star", name="binary")
+    content = mock_send.call_args.args[0]
+    buffers = mock_send.call_args.kwargs["buffers"]
+    assert content["event_name"] == "add_marker_columns"
+    assert content["titles"] == ["a", "b"] and content["descriptions"] == ["star"]
+    assert np.frombuffer(buffers[0], dtype=np.float64).tolist() == ra.tolist()
+    assert np.frombuffer(buffers[2], dtype=np.int32).tolist() == [0, 1, 0]
+
+    with pytest.raises(ValueError, match="one value for each"):
+        mast_aladin.add_markers_from_arrays(ra, dec, title=["a"])
+    with pytest.raises(ValueError, match="both `ra` and `dec`"):
+        mast_aladin.add_markers_from_arrays(ra)
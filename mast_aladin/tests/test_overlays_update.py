@@ -1,11 +1,15 @@
+import json
+from unittest.mock import Mock
+
 from astropy.table import Table
 from astropy.coordinates import SkyCoord, Angle
 
 from mast_aladin import MastAladin
+from mast_aladin.overlay import serialize
 from mast_aladin.overlay.mast_overlay import MastOverlay
 from ipyaladin.elements.error_shape import CircleError
 from regions import CircleSkyRegion
-from ipyaladin import Marker
+from ipyaladin import Aladin, Marker
 
 
 def test_overlays_dict_add_markers():
@@ -165,3 +169,109 @@ def test_overlays_dict_add_graphic_overlay_from_stcs_():
     assert stcs_overlay.name == updated_options["name"]
     assert stcs_overlay.options["color"] == updated_options["color"]
     assert stcs_overlay.options == updated_options
+
+
+def test_table_update_reuses_votable(monkeypatch):
+    """Test that re-added tables are only serialized to a VOTable once."""
+    mast_aladin = MastAladin()
+    monkeypatch.setattr(serialize, "_votable_cache", serialize.VOTableCache())
+
+    table = Table({"ra": [1., 2., 3.], "dec": [4., 5., 6.]})
+    fingerprint = serialize.table_fingerprint(table)
+
+    mock_send = Mock()
+    monkeypatch.setattr(MastAladin, "send", mock_send)
+
+    table_overlay = mast_aladin.add_table(table, name="cached")
+    table_overlay = table_overlay.update(name="renamed")
+    table_overlay.update(color="blue", name="cached_copy")
+
+    # each add_table message reuses the same VOTable bytes:
+    buffers = [
+        call.kwargs["buffers"][0] for call in mock_send.call_args_list
+        if call.args[0]["event_name"] == "add_table"
+    ]
+    assert len(buffers) == 3
+    assert all(buffer is buffers[0] for buffer in buffers)
+    assert len(serialize.get_votable_cache()) == 1
+
+    # equal tables share a fingerprint, while changed values or units don't:
+    assert serialize.table_fingerprint(table.copy()) == fingerprint
+    table["ra"][0] = 10.
+    assert serialize.table_fingerprint(table) != fingerprint
+    table["ra"][0] = 1.
+    table["ra"].unit = "deg"
+    assert serialize.table_fingerprint(table) != fingerprint
+
+
+def test_votable_cache_eviction():
+    """Test that added VOTables are evicted like written ones, least recently used first."""
+    cache = serialize.VOTableCache(max_size=10)
+    tables = [Table({"ra": [float(i)], "dec": [0.]}) for i in range(3)]
+
+    cache.add(tables[0], b"x" * 4)
+    cache.add(tables[1], b"x" * 4)
+
+    # adding a cached table again marks it as recently used:
+    cache.add(tables[0], b"x" * 4)
+    cache.add(tables[2], b"x" * 4)
+
+    assert len(cache) == 2
+    assert cache._size == 8
+    assert list(cache._votables) == [
+        serialize.table_fingerprint(tables[0]), serialize.table_fingerprint(tables[2])
+    ]
+
+
+def test_overlay_restyle_in_place(monkeypatch):
+    """Test that style-only updates keep the overlay and don't resend its data."""
+    mast_aladin = MastAladin()
+    mock_send = Mock()
+    monkeypatch.setattr(MastAladin, "send", mock_send)
+
+    stcs = ["CIRCLE ICRS 258.9 43.1 0.6", "CIRCLE ICRS 259.9 44.1 0.6"]
+    overlay = mast_aladin.add_graphic_overlay_from_stcs(stcs, name="footprints", color="red")
+    mock_send.reset_mock()
+
+    restyled = overlay.update(color="blue", line_width=3)
+
+    assert restyled is overlay
+    assert mast_aladin._overlays_dict["footprints"] is overlay
+    assert overlay.options == {"name": "footprints", "color": "blue", "line_width": 3}
+    assert all(info["options"]["color"] == "blue" for info in overlay["regions_infos"])
+    mock_send.assert_called_once_with(
+        {
+            "event_name": "set_overlay_options",
+            "overlay_name": "footprints",
+            "options": {"color": "blue", "line_width": 3},
+        }
+    )
+
+    # updates that don't change any options send nothing:
+    mock_send.reset_mock()
+    assert overlay.update(color="blue") is overlay
+    mock_send.assert_not_called()
+
+    # options that Aladin Lite can't change on the layer are reported
+    # by the front end, and the overlay is sent again with them:
+    overlay.update(fill=True)
+    mock_send.reset_mock()
+    mast_aladin._handle_custom_message(
+        mast_aladin, {"event_type": "restyle_failed", "overlay_name": "footprints"}, []
+    )
+    overlay = mast_aladin._overlays_dict["footprints"]
+    assert overlay.options["fill"] is True
+    events = [call.args[0]["event_name"] for call in mock_send.call_args_list]
+    assert events == ["remove_overlay", "add_footprints"]
+
+    # renaming the overlay needs a new layer:
+    mock_send.reset_mock()
+    renamed = overlay.update(name="renamed")
+    assert renamed is not overlay
+    assert "footprints" not in mast_aladin._overlays_dict
+    assert "renamed" in mast_aladin._overlays_dict
+    assert mock_send.call_args_list[0].args[0]["event_name"] == "remove_overlay"
+
+    # the front end of ipyaladin is wrapped to handle the restyle messages:
+    assert mast_aladin._esm.startswith(f"const ipyaladinSource = {json.dumps(str(Aladin._esm))}")
+    assert "set_overlay_options" in mast_aladin._esm
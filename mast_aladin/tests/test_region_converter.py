@@ -0,0 +1,88 @@
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+import astropy.units as u
+from astropy.coordinates import Angle, SkyCoord
+from ipyaladin import Aladin
+from ipyaladin.utils._region_converter import RegionInfos
+from regions import (
+    CircleSkyRegion,
+    EllipseSkyRegion,
+    LineSkyRegion,
+    PolygonSkyRegion,
+    RectangleSkyRegion,
+)
+
+from mast_aladin import MastAladin
+from mast_aladin.overlay import mast_overlay
+from mast_aladin.overlay.region_converter import region_geometries, regions_infos
+
+
+def make_regions():
+    center = SkyCoord(258.9, 43.1, unit="deg")
+    end = SkyCoord(259.9, 44.1, unit="deg")
+
+    return [
+        CircleSkyRegion(center, 30 * u.arcsec, visual={"edgecolor": "red", "linewidth": 2}),
+        EllipseSkyRegion(center, 2 * u.arcmin, 1 * u.arcmin, 30 * u.deg),
+        LineSkyRegion(center, end, visual={"color": "blue", "facecolor": "red"}),
+        PolygonSkyRegion(SkyCoord([1, 2, 3], [4, 5, 7], unit="deg")),
+        RectangleSkyRegion(center, 0.1 * u.deg, 2 * u.arcmin, Angle(30, "deg")),
+        CircleSkyRegion(end, 0.01 * u.deg),
+    ]
+
+
+def test_regions_infos():
+    """Test that regions converted in groups match ipyaladin's conversion."""
+    regions = make_regions()
+    expected = [RegionInfos(region).to_clean_dict() for region in regions]
+
+    visuals = [region.visual for region in regions]
+    infos = regions_infos(visuals, region_geometries(regions))
+
+    for info, expected_info in zip(infos, expected):
+        assert info["region_type"] == expected_info["region_type"]
+        assert info["options"] == expected_info["options"]
+        assert info["infos"].keys() == expected_info["infos"].keys()
+        for key, value in info["infos"].items():
+            assert np.allclose(value, expected_info["infos"][key], rtol=0, atol=1e-10)
+
+    with pytest.raises(ValueError, match="Unsupported region type"):
+        region_geometries(["CIRCLE ICRS 1 2 3"])
+
+
+def test_region_overlay_update_reuses_geometry(monkeypatch, sent_messages):
+    """Test that restyling a region overlay only converts the visuals again."""
+    mast_aladin = MastAladin()
+    mock_send = Mock()
+    monkeypatch.setattr(Aladin, "send", mock_send)
+
+    overlay = mast_aladin.add_graphic_overlay_from_region(make_regions(), name="regions")
+    content = mock_send.call_args.args[0]
+    assert content["event_name"] == "add_overlay"
+    assert content["regions_infos"] == overlay["regions_infos"]
+    geometries = overlay["region_geometries"]
+
+    convert = Mock(side_effect=region_geometries)
+    monkeypatch.setattr(mast_overlay, "region_geometries", convert)
+
+    overlay = overlay.update(name="renamed", color="green")
+
+    convert.assert_not_called()
+    assert overlay["region_geometries"] is geometries
+    content = sent_messages(mock_send)[-1][0]
+    assert content["graphic_options"]["color"] == "green"
+    assert content["regions_infos"] == overlay["regions_infos"]
+
+    # restyling only sends the new options, which the
+    # front end applies to the overlay and each region:
+    mock_send.reset_mock()
+    assert overlay.update(color="blue") is overlay
+    mock_send.assert_called_once_with(
+        {"event_name": "set_overlay_options", "overlay_name": "renamed",
+         "options": {"color": "blue"}},
+        buffers=None,
+    )
+    convert.assert_not_called()
+    assert all(info["options"]["color"] == "blue" for info in overlay["regions_infos"])
@@ -0,0 +1,153 @@
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+import astropy.units as u
+from astropy.coordinates import SkyCoord
+from astropy.table import MaskedColumn, Table
+from ipyaladin import Aladin
+from regions import CircleSkyRegion, RectangleSkyRegion
+
+from mast_aladin import MastAladin
+
+
+def make_scene(mast_aladin):
+    mast_aladin.add_markers_from_arrays(
+        [10, 10.5, 11], [20, 20, 20], title=["a", "b", "a"], name="markers", color="red"
+    )
+    mast_aladin.add_markers_from_arrays(
+        np.arange(0, 40, 0.5), np.full(80, 20.0), cull=True, name="culled"
+    )
+    mast_aladin.add_catalog_from_URL("https://example.com/catalog.xml", {"name": "catalog"})
+
+    table = Table({"ra": [10.0, 10.1], "dec": [20.0, 20.1]})
+    table["ra"].unit = "deg"
+    table["flux"] = MaskedColumn([1.5, 2.5], mask=[False, True], description="flux")
+    table.meta["source"] = "test"
+    mast_aladin.add_table(table, shape="circle", name="table", color="blue")
+
+    center = SkyCoord(10, 20, unit="deg")
+    mast_aladin.add_graphic_overlay_from_region(
+        [
+            CircleSkyRegion(center, 30 * u.arcsec, visual={"edgecolor": "yellow"}),
+            RectangleSkyRegion(center, 0.1 * u.deg, 2 * u.arcmin, 30 * u.deg),
+        ],
+        name="regions",
+    )
+    mast_aladin.add_graphic_overlay_from_stcs(
+        ["CIRCLE ICRS 10 20 0.5", "POLYGON ICRS 10 20 10.1 20 10.1 20.1 BOX ICRS 11 21 1 1"],
+        lod=True,
+        name="footprints",
+    )
+
+
+def test_save_and_load_overlays(monkeypatch, tmp_path):
+    mock_send = Mock()
+    monkeypatch.setattr(Aladin, "send", mock_send)
+
+    mast_aladin = MastAladin(target="10 20", fov=2)
+    make_scene(mast_aladin)
+    sent = [call.args[0] for call in mock_send.call_args_list]
+
+    path = tmp_path / "overlays.npz"
+    mast_aladin.save_overlays(path)
+
+    restored_app = MastAladin(target="10 20", fov=2)
+    mock_send.reset_mock()
+    overlays = restored_app.load_overlays(path)
+
+    # the overlays are sent again together, with the same messages:
+    mock_send.assert_called_once()
+    content = mock_send.call_args.args[0]
+    assert content["event_name"] == "batch"
+    for message in content["messages"]:
+        message.pop("buffer_indices")
+    assert content["messages"] == sent
+
+    originals = mast_aladin._overlays_dict
+    restored = restored_app._overlays_dict
+    assert [overlay.name for overlay in overlays] == list(originals.keys())
+    assert list(restored.keys()) == list(originals.keys())
+
+    for name, overlay in originals.items():
+        assert restored[name].options == overlay.options
+
+    assert restored["markers"]["update_info"][1].title == "b"
+    assert "culling" in restored["culled"]
+    assert "lod" in restored["footprints"]
+    assert restored["footprints"]["update_info"] == originals["footprints"]["update_info"]
+    assert restored["regions"]["regions_infos"] == originals["regions"]["regions_infos"]
+
+    table = restored["table"]["table"]
+    assert table.meta == {"source": "test"}
+    assert table["ra"].unit == u.deg
+    assert table["flux"].mask.tolist() == [False, True]
+    assert table["flux"].description == "flux"
+    assert restored["table"]["shape"] == "circle"
+
+    # restored regions are created when they're first used:
+    region = restored["regions"]["update_info"][0]
+    assert isinstance(region, CircleSkyRegion)
+    assert region.visual["edgecolor"] == "yellow"
+
+
+def test_save_and_load_weak_tables(monkeypatch, tmp_path):
+    monkeypatch.setattr(Aladin, "send", Mock())
+
+    mast_aladin = MastAladin(target="10 20", fov=2)
+    table = Table({"ra": [10.0, 10.1], "dec": [20.0, 20.1]})
+    mast_aladin.add_table(table, weak_table=True, name="weak")
+    table_copy = table.copy()
+    mast_aladin.add_table(table_copy, weak_table=True, name="restored_copy")
+
+    path = tmp_path / "overlays.npz"
+    mast_aladin.save_overlays(path)
+    del table_copy
+
+    # tables that are passed in are held weakly again, and the
+    # restored copies of other tables are held by their overlays:
+    restored_app = MastAladin(target="10 20", fov=2)
+    restored_app.load_overlays(path, tables={"weak": table})
+    restored = restored_app._overlays_dict
+    assert "table" not in dict(restored["weak"])
+    assert restored["weak"]["table"] is table
+    assert dict(restored["restored_copy"])["table"]["ra"].tolist() == [10.0, 10.1]
+
+    # columns of Python objects are not converted to strings silently:
+    objects = Table({"ra": [10.0], "dec": [20.0]})
+    objects["info"] = np.array([{"a": 1}], dtype=object)
+    restored_app.add_table(objects, name="objects")
+    with pytest.raises(ValueError, match="holds Python objects"):
+        restored_app.save_overlays(tmp_path / "objects.npz")
+
+
+def test_save_masked_stcs_and_table_meta(monkeypatch, tmp_path):
+    monkeypatch.setattr(Aladin, "send", Mock())
+
+    mast_aladin = MastAladin(target="10 20", fov=2)
+    s_region = MaskedColumn(
+        ["CIRCLE ICRS 10 20 0.5", "", "POLYGON ICRS 10 20 10.1 20 10.1 20.1"],
+        mask=[False, True, False],
+    )
+    mast_aladin.add_graphic_overlay_from_stcs(s_region, name="footprints")
+
+    table = Table({"ra": [10.0], "dec": [20.0]})
+    table.meta["source"] = "test"
+    table.meta["resource"] = object()
+    mast_aladin.add_table(table, name="table")
+
+    # meta that can't be stored is left out, without failing the save:
+    path = tmp_path / "overlays.npz"
+    with pytest.warns(UserWarning, match="`resource`"):
+        mast_aladin.save_overlays(path)
+
+    restored_app = MastAladin(target="10 20", fov=2)
+    restored_app.load_overlays(path)
+    restored = restored_app._overlays_dict
+
+    # masked STC-S strings are restored as empty strings:
+    assert restored["footprints"]["update_info"] == [
+        "CIRCLE ICRS 10 20 0.5", "", "POLYGON ICRS 10 20 10.1 20 10.1 20.1"
+    ]
+    assert restored["footprints"]["footprints"].shape_rows.tolist() == [0, 2]
+    assert restored["table"]["table"].meta == {"source": "test"}
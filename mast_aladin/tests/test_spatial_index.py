@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from astropy.table import Table
+
+from mast_aladin.overlay.spatial_index import (
+    SpatialIndex,
+    angular_distance,
+    ang2pix,
+    pix2ang,
+    table_positions,
+)
+from mast_aladin.overlay.stcs import parse_stcs
+
+
+def random_positions(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0, 360, n), np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+
+
+@pytest.mark.parametrize("order", [0, 2, 9, 20])
+def test_healpix(order):
+    lon, lat = random_positions(10_000)
+    pix = ang2pix(order, lon, lat)
+
+    # cell centers are in their own cells, and cells are nested:
+    assert np.array_equal(ang2pix(order, *pix2ang(order, pix)), pix)
+    if order > 0:
+        assert np.array_equal(ang2pix(order - 1, lon, lat), pix >> 2)
+
+    assert pix.min() >= 0 and pix.max() < 12 * 4 ** order
+
+
+def test_cone_and_box():
+    lon, lat = random_positions(100_000)
+    index = SpatialIndex(lon, lat)
+
+    for center_lon, center_lat, radius in [(10, 20, 2), (0, 90, 5), (359.9, -10, 0.5)]:
+        expected = np.flatnonzero(angular_distance(lon, lat, center_lon, center_lat) <= radius)
+        assert np.array_equal(index.cone(center_lon, center_lat, radius), expected)
+
+    box = index.box(150, 2, 4, 2, rotation=30)
+    assert len(box) > 0
+    assert np.all(angular_distance(lon[box], lat[box], 150, 2) <= np.hypot(2, 1) + 1e-9)
+
+
+def test_polygon():
+    index = SpatialIndex([20, 20.5, 40, 12, np.nan], [18, 15, 18, 11, 0])
+    vertices = [[10, 10], [30, 12], [25, 30], [15, 20]]
+    assert index.polygon(vertices).tolist() == [0, 1, 3]
+
+    with pytest.raises(ValueError, match="3 or more vertices"):
+        index.polygon([[10, 10], [30, 12]])
+
+
+def test_footprint_index():
+    footprints = parse_stcs(["CIRCLE 10 20 1", "POLYGON 30 0 31 0 31 1 30 1"])
+    index = SpatialIndex.from_footprints(footprints)
+
+    # footprints are found when their bounding caps intersect the query:
+    assert index.cone(11.5, 20, 0.6).tolist() == [0]
+    assert index.cone(29.8, -0.2, 0.5).tolist() == [1]
+
+
+def test_table_positions():
+    table = Table({"targ_ra": [10.0, 20.0], "other": [1, 2]})
+    table["targ_dec"] = [1.0, 2.0]
+    table["targ_dec"].unit = "arcmin"
+
+    lon, lat = table_positions(table)
+    assert lon.tolist() == [10, 20]
+    assert np.allclose(lat, [1 / 60, 2 / 60])
+
+    with pytest.raises(ValueError, match="have no positions"):
+        table_positions(table[["other"]])
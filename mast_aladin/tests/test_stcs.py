@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from mast_aladin.overlay.lod import coverage
+from mast_aladin.overlay.spatial_index import SpatialIndex
+from mast_aladin.overlay.stcs import frame_names, parse_stcs, shape_names
+
+
+def test_parse_stcs():
+    stcs = np.ma.array(
+        [
+            "POLYGON ICRS 1.0 2.0 3.0 4.0 5.0 6.0",
+            "",
+            "Circle ICRS GEOCENTER 10.5 -20.25 1e-2",
+            "UNION J2000 (BOX 1 2 3 4 POLYGON 0 0 1 0 1 1 0 1)",
+            "CIRCLE 0 0 1",
+        ],
+        mask=[False, False, False, False, True],
+    )
+    footprints = parse_stcs(stcs)
+
+    assert footprints.n_rows == 5
+    assert len(footprints) == 4
+    assert [shape_names[code] for code in footprints.shape_types] == [
+        'polygon', 'circle', 'box', 'polygon'
+    ]
+    assert footprints.shape_rows.tolist() == [0, 2, 3, 3]
+    assert footprints.shape_values(1).tolist() == [10.5, -20.25, 0.01]
+    assert footprints.shape_values(2).tolist() == [1, 2, 3, 4]
+
+    vertices, offsets = footprints.polygon_vertices()
+    assert offsets.tolist() == [0, 3, 7]
+    assert vertices[:3].tolist() == [[1, 2], [3, 4], [5, 6]]
+    assert vertices[3:].tolist() == [[0, 0], [1, 0], [1, 1], [0, 1]]
+
+    assert [buffer.nbytes for buffer in footprints.to_buffers()] == [4, 16, 20, 168, 4]
+
+    # each shape keeps the frame that follows its keyword, or that comes before it:
+    assert [frame_names[code] for code in footprints.shape_frames] == [
+        'ICRS', 'ICRS', 'J2000', 'J2000'
+    ]
+
+
+def test_stcs_frames():
+    stcs = [
+        "CIRCLE GALACTIC 0 0 1",
+        "POLYGON SUPER_GALACTIC 1 2 3 4 5 6",
+        "BOX FK5 10 20 1 1",
+        "CIRCLE 10 20 1",
+    ]
+    footprints = parse_stcs(stcs)
+
+    # frames are written back when the shapes are formatted again:
+    assert footprints.to_stcs(precision=0) == [
+        "CIRCLE GALACTIC 0 0 1",
+        "POLYGON SUPER_GALACTIC 1 2 3 4 5 6",
+        "BOX FK5 10 20 1 1",
+        "CIRCLE 10 20 1",
+    ]
+    assert footprints.take([2, 0]).to_stcs(precision=0) == [stcs[2], stcs[0]]
+
+    # shapes are indexed in ICRS, like the viewport, so the galactic center
+    # is found near its ICRS position:
+    index = SpatialIndex.from_footprints(footprints)
+    assert index.cone(266.405, -28.936, 0.5).tolist() == [0]
+
+    # shapes in different frames aren't merged into the same coverage box:
+    boxes = coverage(footprints.take([2, 3]), 5)
+    assert sorted(frame_names[code] for code in boxes.shape_frames) == ['', 'FK5']
+
+
+@pytest.mark.parametrize(
+    "stcs, message",
+    [
+        ("CIRCLE ICRS 1 2", "has a circle with 2 values"),
+        ("POLYGON 1 2 3 4 5", "has a polygon with 5 values"),
+        ("1 2 CIRCLE 1 2 3", "values that don't follow a shape"),
+        ("ELLIPSE 1 2 3 4 5", "not supported"),
+        ("CIRCLE 1 2 3x", "not numbers"),
+    ],
+)
+def test_parse_stcs_errors(stcs, message):
+    with pytest.raises(ValueError, match=message):
+        parse_stcs(["CIRCLE 0 0 1", stcs])
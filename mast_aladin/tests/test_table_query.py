@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from astropy.table import Table, MaskedColumn
+from astropy.time import Time
+
+from mast_aladin.table.query import TableQuery, filter_mask
+
+
+@pytest.fixture
+def table():
+    return Table({
+        'id': np.arange(8),
+        'group': [2, 1, 2, 1, 3, 3, 1, 2],
+        'instrument': ['NIRCAM', 'NIRSPEC', 'MIRI', 'NIRCAM', 'MIRI', 'NIRISS', 'MIRI', 'NIRCAM'],
+        'exptime': MaskedColumn(
+            [10., 20., 30., 40., 50., 60., 70., 80.], mask=[0, 0, 0, 0, 0, 0, 0, 1]
+        ),
+    })
+
+
+@pytest.mark.parametrize('expression, expected', [
+    ('>= 30', [2, 3, 4, 5, 6]),
+    ('<20', [0]),
+    (40, [3]),
+    ('!=10', [1, 2, 3, 4, 5, 6]),
+    ([20, 70], [1, 6]),
+])
+def test_filter_mask_numeric(table, expression, expected):
+    assert np.flatnonzero(filter_mask(table['exptime'], expression)).tolist() == expected
+
+
+def test_filter_mask_string(table):
+    assert np.flatnonzero(filter_mask(table['instrument'], 'nir')).tolist() == [0, 1, 3, 5, 7]
+    assert np.flatnonzero(filter_mask(table['instrument'], '== MIRI')).tolist() == [2, 4, 6]
+
+    with pytest.raises(ValueError, match="Cannot compare"):
+        filter_mask(table['exptime'], 'long')
+
+
+def test_search_masked_and_multidimensional_columns():
+    table = Table({
+        'target': MaskedColumn(['M31', 'N/A', 'M33', 'm51'], mask=[0, 1, 0, 0]),
+        'vertices': np.array([['m3', 'x'], ['m3', 'x'], ['a', 'b'], ['c', 'd']]),
+        'date': Time(['2024-01-01', '2023-06-01', '2024-03-01', '2022-01-01']),
+    })
+    # the masked entry's underlying value would match the search:
+    table['target'].data.data[1] = 'M3 fill'
+    query = TableQuery(table)
+
+    # masked entries never match, 2-D columns are skipped, and
+    # mixin columns are searched as they're shown in the table:
+    assert query.rows(search='m3', search_columns=['target', 'vertices']).tolist() == [0, 2]
+    assert filter_mask(table['target'], 'm3').tolist() == [True, False, True, False]
+    assert not filter_mask(table['vertices'], 'm3').any()
+    assert query.rows(search='2024-0', search_columns=['date']).tolist() == [0, 2]
+
+    # masked entries sort last, in either direction:
+    assert query.argsort(['target']).tolist() == [0, 2, 3, 1]
+    assert query.argsort(['target'], [True]).tolist() == [3, 2, 0, 1]
+
+
+def test_table_query(table):
+    query = TableQuery(table)
+
+    # sorts are stable, and descending sorts keep ties in their original order:
+    assert query.argsort(['group']).tolist() == [1, 3, 6, 0, 2, 7, 4, 5]
+    assert query.argsort(['group'], [True]).tolist() == [4, 5, 0, 2, 7, 1, 3, 6]
+    assert query.argsort(['group', 'id'], [False, True]).tolist() == [6, 3, 1, 7, 2, 0, 5, 4]
+
+    # permutations are cached:
+    assert query.argsort(['group']) is query.argsort(['group'])
+
+    rows = query.rows(sort_by=['group'], filters={'instrument': 'NIR', 'exptime': '<= 60'})
+    assert rows.tolist() == [1, 3, 0, 5]
+
+    rows, n_rows = query.window(
+        page=2, items_per_page=2, sort_by=['exptime'], sort_desc=[True],
+        search='mir', search_columns=['instrument']
+    )
+    assert n_rows == 3
+    assert rows.tolist() == [2]
+
+    table['group'][0] = 0
+    query.invalidate(['group'])
+    assert query.argsort(['group'])[0] == 0
@@ -0,0 +1,23 @@
+from mast_aladin.table import validate
+
+
+def test_detect_mission(mast_observation_table):
+    assert validate.detect_mission_or_products(mast_observation_table) == 'jwst'
+
+    scores = validate.mission_scores(mast_observation_table)
+    assert scores['jwst'] == max(scores.values())
+
+    # metadata is loaded once per process:
+    assert validate.get_mission_metadata() is validate.get_mission_metadata()
+
+
+def test_column_descriptions(mast_observation_table):
+    colnames = mast_observation_table.colnames
+    descriptions = validate.get_column_descriptions('jwst', colnames)
+
+    # one description for each column in the table, in order:
+    assert [entry['name'] for entry in descriptions] == colnames
+    assert len(validate.get_column_descriptions('jwst')) > len(colnames)
+
+    # columns without descriptions get an empty one:
+    assert validate.get_column_descriptions('', ['a']) == [{'name': 'a', 'description': ''}]